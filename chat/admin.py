@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PrivateChat, GroupChat, Message, MessageReaction, ChatNotification
+from .models import PrivateChat, GroupChat, Message, MessageReaction, ChatInbox
 
 
 @admin.register(PrivateChat)
@@ -52,12 +52,8 @@ class MessageReactionAdmin(admin.ModelAdmin):
     get_message_sender.short_description = 'Message Sender'
 
 
-@admin.register(ChatNotification)
-class ChatNotificationAdmin(admin.ModelAdmin):
-    list_display = ('user', 'get_message_sender', 'is_read', 'created_at')
-    list_filter = ('is_read', 'created_at')
-    search_fields = ('user__username', 'message__sender__username')
-    
-    def get_message_sender(self, obj):
-        return obj.message.sender.username
-    get_message_sender.short_description = 'Message Sender'
+@admin.register(ChatInbox)
+class ChatInboxAdmin(admin.ModelAdmin):
+    list_display = ('user', 'private_chat', 'group_chat', 'last_message_at', 'last_read_message_id', 'unread_count')
+    search_fields = ('user__username',)
+    raw_id_fields = ('user', 'other_user', 'private_chat', 'group_chat', 'last_message')
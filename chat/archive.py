@@ -0,0 +1,214 @@
+"""
+Cold storage of old chat messages.
+
+Messages older than CHAT_ARCHIVE_AFTER_DAYS are moved, with their
+reactions, out of the Message table into gzipped segment files, one run of
+consecutive messages of a chat per file, under CHAT_ARCHIVE_ROOT:
+
+    chat_archive/p16/1200-1699.json.gz
+
+An ArchivedSegment row records each file (chat, message id range, sha256).
+The newest KEEP_HOT messages of a chat are never archived, so the chat
+pages and the chat list only ever read the Message table. The history
+endpoints carry on into the archive once they scroll past the hot rows
+(chat/history.py), reading a segment only when a page reaches it:
+
+    messages = archived_before(chat, before_id=1700, limit=50)   # newest first
+
+Archived messages are read only: they can't be edited or reacted to and
+aren't in the message search index. `python manage.py archive_chat_messages`
+archives what is due (incrementally, --max-segments per run) and
+`--verify` checks the files against their rows.
+"""
+import gzip
+import hashlib
+import os
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils import timezone
+
+from .inbox import chat_field
+from .models import ArchivedSegment, GroupChat, Message, MessageReaction, PrivateChat
+
+ARCHIVE_AFTER = timedelta(days=getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180))
+# Messages per segment file.
+SEGMENT_SIZE = 500
+# Fewer archivable messages than this in a chat wait for the next run, no tiny files.
+MIN_SEGMENT_SIZE = 50
+# The newest messages of every chat stay in the database, whatever their age.
+KEEP_HOT = 50
+# Decompressed segments kept in memory per process.
+CACHED_SEGMENTS = 16
+
+storage = FileSystemStorage(location=getattr(settings, 'CHAT_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'chat_archive')))
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _chat_key(chat):
+    return f"{'p' if isinstance(chat, PrivateChat) else 'g'}{chat.pk}"
+
+
+def segment_name(chat, first_id, last_id):
+    return f'{_chat_key(chat)}/{first_id}-{last_id}.json.gz'
+
+
+# WRITING
+
+
+def archivable(chat, cutoff):
+    """Ids of the messages of the chat due for the archive, oldest first."""
+    messages = Message.objects.filter(**{chat_field(chat): chat})
+    hot = list(messages.order_by('-id').values_list('id', flat=True)[KEEP_HOT - 1:KEEP_HOT])
+    if not hot:
+        return []
+    return list(messages.filter(pk__lt=hot[0], created_at__lt=cutoff).order_by('id').values_list('id', flat=True))
+
+
+def _encode(messages, reactions):
+    return gzip.compress(serializers.serialize('json', list(messages) + list(reactions)).encode(), mtime=0)
+
+
+def _decode(data):
+    messages, reactions = [], {}
+    for deserialized in serializers.deserialize('json', gzip.decompress(data).decode(), ignorenonexistent=True):
+        obj = deserialized.object
+        if isinstance(obj, Message):
+            messages.append(obj)
+        else:
+            reactions.setdefault(obj.message_id, []).append(obj)
+    return messages, reactions
+
+
+def archive_segment(chat, message_ids):
+    """Move the messages (ids of one chat, oldest first) to a new segment. Returns the ArchivedSegment."""
+    name = segment_name(chat, message_ids[0], message_ids[-1])
+    with transaction.atomic():
+        messages = list(Message.objects.filter(pk__in=message_ids).order_by('id'))
+        reactions = MessageReaction.objects.filter(message__in=message_ids).order_by('id')
+        data = _encode(messages, reactions)
+        # Left over by a run which failed before committing.
+        storage.delete(name)
+        saved = storage.save(name, ContentFile(data))
+        try:
+            segment = ArchivedSegment.objects.create(
+                **{chat_field(chat): chat},
+                first_message_id=messages[0].pk, last_message_id=messages[-1].pk,
+                message_count=len(messages),
+                first_message_at=messages[0].created_at, last_message_at=messages[-1].created_at,
+                file=saved, checksum=hashlib.sha256(data).hexdigest())
+            Message.objects.filter(pk__in=[message.pk for message in messages]).delete()
+        except Exception:
+            storage.delete(saved)
+            raise
+    return segment
+
+
+def archive_chat(chat, cutoff=None, max_segments=None):
+    """Archive the chat's messages older than `cutoff`. Returns the segments written."""
+    message_ids = archivable(chat, cutoff or timezone.now() - ARCHIVE_AFTER)
+    segments = []
+    for start in range(0, len(message_ids), SEGMENT_SIZE):
+        batch = message_ids[start:start + SEGMENT_SIZE]
+        if len(batch) < MIN_SEGMENT_SIZE or (max_segments is not None and len(segments) >= max_segments):
+            break
+        segments.append(archive_segment(chat, batch))
+    return segments
+
+
+def chats_to_archive(cutoff):
+    """Chats with messages older than `cutoff`."""
+    old = Message.objects.filter(created_at__lt=cutoff)
+    yield from PrivateChat.objects.filter(pk__in=old.values('private_chat')).order_by('pk').iterator()
+    yield from GroupChat.objects.filter(pk__in=old.values('group_chat')).order_by('pk').iterator()
+
+
+def verify_segment(segment):
+    """Raise ArchiveError if the file doesn't match its row or its messages are still in the database."""
+    try:
+        with storage.open(segment.file) as stored:
+            data = stored.read()
+    except OSError as e:
+        raise ArchiveError(f'{segment.file}: {e}')
+    if hashlib.sha256(data).hexdigest() != segment.checksum:
+        raise ArchiveError(f'{segment.file}: checksum mismatch')
+    messages, reactions = _decode(data)
+    if len(messages) != segment.message_count or (
+            messages and (messages[0].pk, messages[-1].pk) != (segment.first_message_id, segment.last_message_id)):
+        raise ArchiveError(f'{segment.file}: holds {len(messages)} messages, the row says {segment.message_count}')
+    left = Message.objects.filter(pk__in=[message.pk for message in messages]).count()
+    if left:
+        raise ArchiveError(f'{segment.file}: {left} archived messages are still in the database')
+
+
+# READING
+
+
+@lru_cache(maxsize=CACHED_SEGMENTS)
+def _segment_data(name, checksum):
+    with storage.open(name) as stored:
+        return stored.read()
+
+
+def _with_reactions(message, reactions):
+    # The way prefetch_related() hands its results to the related manager,
+    # message.reactions.all() then needs no query.
+    queryset = MessageReaction.objects.none()
+    queryset._result_cache = reactions
+    queryset._prefetch_done = True
+    message._prefetched_objects_cache = {'reactions': queryset}
+
+
+def segment_messages(segment):
+    """The messages of a segment, oldest first, with their reactions (unsaved instances)."""
+    messages, reactions = _decode(_segment_data(segment.file, segment.checksum))
+    for message in messages:
+        _with_reactions(message, reactions.get(message.pk, []))
+    return messages
+
+
+def _with_senders(messages):
+    senders = User.objects.select_related('profile').in_bulk({message.sender_id for message in messages})
+    found = []
+    for message in messages:
+        # Gone senders take their messages with them, as the CASCADE would have.
+        if message.sender_id in senders:
+            message.sender = senders[message.sender_id]
+            found.append(message)
+    return found
+
+
+def archived_before(chat, before_id=None, limit=50):
+    """Up to `limit` archived messages of the chat preceding `before_id`, newest first."""
+    segments = ArchivedSegment.objects.filter(**{chat_field(chat): chat})
+    if before_id is not None:
+        segments = segments.filter(first_message_id__lt=before_id)
+    messages = []
+    for segment in segments.order_by('-last_message_id'):
+        older = [message for message in reversed(segment_messages(segment))
+                 if before_id is None or message.pk < before_id]
+        messages.extend(older[:limit - len(messages)])
+        if len(messages) >= limit:
+            break
+    return _with_senders(messages)
+
+
+def archived_after(chat, after_id, limit=50):
+    """Up to `limit` archived messages of the chat following `after_id`, oldest first."""
+    segments = ArchivedSegment.objects.filter(**{chat_field(chat): chat}, last_message_id__gt=after_id)
+    messages = []
+    for segment in segments.order_by('last_message_id'):
+        newer = [message for message in segment_messages(segment) if message.pk > after_id]
+        messages.extend(newer[:limit - len(messages)])
+        if len(messages) >= limit:
+            break
+    return _with_senders(messages)
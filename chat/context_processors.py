@@ -1,11 +1,13 @@
-from chat.models import ChatNotification
+from chat.inbox import unread_total
+from main.lazy_context import lazy_context
 
 
+@lazy_context('countUnreadChats')
 def count_unread_chat_messages(request):
     """Context processor to count unread chat messages"""
     if request.user.is_authenticated:
         try:
-            unread_count = ChatNotification.objects.filter(user=request.user, is_read=False).count()
+            unread_count = unread_total(request.user)
             return {'countUnreadChats': unread_count}
         except Exception as e:
             return {'countUnreadChats': 0}
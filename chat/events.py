@@ -0,0 +1,173 @@
+"""
+Live chat events.
+
+The views publish what happened in a chat (a new message, a reaction, an
+edit, a link preview, unread count changes) to the in-process hub below, once the
+transaction commits. Every browser tab holds one Server-Sent Events stream
+(chat.views.event_stream, /chat/stream/) which is a subscription of the
+hub for its user:
+
+    publish_message(message)           # from send_message, send_image, ...
+    subscription = hub.subscribe(user_id)
+    event = await subscription.get()   # {'event': 'message', 'data': {...}}
+
+The hub lives in the process serving the streams, so this needs the ASGI
+server (main/asgi.py) running the views as well. Under WSGI the stream
+answers 204 and the pages keep polling /chat/unread-count/, which is also
+what they fall back to when the stream drops.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import ChatInbox
+
+# Events kept per subscriber while the client is slow, past that it is told
+# to resync (refetch the unread count) instead.
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event):
+        # Runs on the subscriber's event loop.
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'event': 'resync', 'data': {}})
+
+    def push(self, event):
+        """Queue an event from any thread."""
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The stream's loop is closed, it is being unsubscribed.
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class ChatEventHub:
+    """User id -> subscriptions of the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                return bool(self._subscriptions)
+            return any(user_id in self._subscriptions for user_id in user_ids)
+
+    def publish(self, user_ids, event, data):
+        with self._lock:
+            subscriptions = [subscription for user_id in user_ids
+                             for subscription in self._subscriptions.get(user_id, ())]
+        for subscription in subscriptions:
+            subscription.push({'event': event, 'data': data})
+
+
+hub = ChatEventHub()
+
+
+def _chat_of(message):
+    if message.private_chat_id:
+        return 'private', message.private_chat_id, {'private_chat_id': message.private_chat_id}
+    return 'group', message.group_chat_id, {'group_chat_id': message.group_chat_id}
+
+
+def _member_ids(message):
+    chat_type, chat_id, lookup = _chat_of(message)
+    return list(ChatInbox.objects.filter(**lookup).values_list('user_id', flat=True))
+
+
+def message_data(message):
+    chat_type, chat_id, lookup = _chat_of(message)
+    return {
+        'id': message.id,
+        'chat_type': chat_type,
+        'chat_id': chat_id,
+        'sender_id': message.sender_id,
+        'sender': message.sender.username,
+        'message_type': message.message_type,
+        'content': message.content,
+        'image_url': message.image_display_url if message.image else None,
+        'file_url': message.file.url if message.file else None,
+        'link_url': message.link_url,
+        'link_title': message.link_title,
+        'link_description': message.link_description,
+        'link_image': message.link_image,
+        'created_at': message.created_at.isoformat(),
+        'is_edited': message.is_edited,
+    }
+
+
+def _on_commit(function):
+    # Nobody listens in this process (WSGI workers): skip the member query.
+    if hub.has_subscribers():
+        transaction.on_commit(function)
+
+
+def publish_message(message):
+    """A new message to its chat's members, +1 unread to everyone but the sender."""
+    def publish():
+        member_ids = _member_ids(message)
+        data = message_data(message)
+        hub.publish(member_ids, 'message', data)
+        hub.publish([user_id for user_id in member_ids if user_id != message.sender_id], 'unread', {
+            'chat_type': data['chat_type'], 'chat_id': data['chat_id'], 'delta': 1})
+    _on_commit(publish)
+
+
+def publish_edit(message):
+    def publish():
+        hub.publish(_member_ids(message), 'edit', message_data(message))
+    _on_commit(publish)
+
+
+def publish_preview(message):
+    """The preview of a link message is ready (chat/link_previews.py)."""
+    def publish():
+        hub.publish(_member_ids(message), 'link_preview', message_data(message))
+    _on_commit(publish)
+
+
+def publish_reaction(message, user, reaction, action):
+    def publish():
+        chat_type, chat_id, lookup = _chat_of(message)
+        hub.publish(_member_ids(message), 'reaction', {
+            'message_id': message.id, 'chat_type': chat_type, 'chat_id': chat_id,
+            'user_id': user.id, 'user': user.username, 'reaction': reaction, 'action': action})
+    _on_commit(publish)
+
+
+def publish_read(user, chat_type, chat_id, unread_before):
+    """The user read a chat, their other tabs drop its unread messages."""
+    if unread_before:
+        _on_commit(lambda: hub.publish([user.id], 'unread', {
+            'chat_type': chat_type, 'chat_id': chat_id, 'delta': -unread_before}))
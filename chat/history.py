@@ -0,0 +1,76 @@
+"""
+Chat history, read by message id instead of by page number.
+
+Messages are fetched with a range on the (chat, id) indexes of Message, so
+every page costs the same whatever its place in the conversation and no
+COUNT runs:
+
+    page = messages_before(chat, before_id=None, limit=50)   # the newest 50
+    page = messages_before(chat, before_id=page.messages[0].id)  # older ones
+    page = messages_after(chat, after_id=last_seen_id)       # what's new
+
+The senders (with their profiles) come with the messages, the reactions of
+a page in one more query. Past the oldest message left in the table the
+pages carry on into the chat archive (chat/archive.py). The chat pages
+render the newest page and scroll back through the JSON endpoints
+(chat.views.chat_history) with history_entry().
+"""
+from collections import namedtuple
+
+from django.db.models import Prefetch
+
+from .archive import archived_after, archived_before
+from .events import message_data
+from .inbox import chat_field
+from .models import Message, MessageReaction
+
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 100
+
+HistoryPage = namedtuple('HistoryPage', ['messages', 'has_more'])
+
+
+def _chat_messages(chat):
+    return Message.objects.filter(**{chat_field(chat): chat}).select_related('sender__profile').prefetch_related(
+        Prefetch('reactions', queryset=MessageReaction.objects.order_by('id')))
+
+
+def messages_before(chat, before_id=None, limit=HISTORY_PAGE_SIZE):
+    """The `limit` messages preceding `before_id` (the newest without it), oldest first."""
+    messages = _chat_messages(chat)
+    if before_id is not None:
+        messages = messages.filter(pk__lt=before_id)
+    messages = list(messages.order_by('-id')[:limit + 1])
+    if len(messages) <= limit:
+        # Out of rows, the older messages may be archived.
+        messages += archived_before(chat, messages[-1].pk if messages else before_id, limit + 1 - len(messages))
+    return HistoryPage(messages[:limit][::-1], len(messages) > limit)
+
+
+def messages_after(chat, after_id, limit=HISTORY_PAGE_SIZE):
+    """The `limit` messages following `after_id`, oldest first."""
+    messages = archived_after(chat, after_id, limit + 1)
+    messages += _chat_messages(chat).filter(pk__gt=after_id).order_by('id')[:limit + 1 - len(messages)]
+    return HistoryPage(messages[:limit], len(messages) > limit)
+
+
+def reactions_of(message, user):
+    """[{'reaction': '👍', 'count': 2, 'mine': True}, ...] from the prefetched reactions."""
+    summary = {}
+    for reaction in message.reactions.all():
+        entry = summary.setdefault(reaction.reaction, {'reaction': reaction.reaction, 'count': 0, 'mine': False})
+        entry['count'] += 1
+        entry['mine'] = entry['mine'] or reaction.user_id == user.id
+    return list(summary.values())
+
+
+def history_entry(message, user):
+    """What the history endpoints return for a message."""
+    profile = getattr(message.sender, 'profile', None)
+    return dict(
+        message_data(message),
+        sender_name=(profile.full_name if profile and profile.full_name else None)
+        or message.sender.get_full_name() or message.sender.username,
+        sender_photo=profile.profile_photo_thumb_url if profile and profile.profile_photo else None,
+        reactions=reactions_of(message, user),
+        is_own=message.sender_id == user.id)
@@ -0,0 +1,183 @@
+"""
+Chat inbox.
+
+ChatInbox has one row per member of every private and group chat, holding
+what the chat list shows for it: the last message (id, preview, time), the
+member's read cursor (last_read_message_id) and how many messages of the
+others come after it. The chat list is a single indexed query on it:
+
+    ChatInbox.objects.filter(user=user).order_by('-last_message_at', '-id')
+
+The rows are written by chat/signals.py: a new message moves every row of
+its chat with one UPDATE, whatever the size of the group, joining or
+leaving a chat adds or drops rows. Reading a chat moves the reader's cursor
+to the last message, a single row UPDATE. Send messages inside
+transaction.atomic() so the inbox moves in the same transaction.
+
+rebuild_inbox() rebuilds every row from the chat tables keeping the read
+cursors, the unread counts are counted again from them. It is used by the
+rebuild_chat_inbox command.
+"""
+from django.db.models import BigIntegerField, Case, Count, F, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import ChatInbox, Message, PrivateChat
+
+PREVIEW_LENGTH = 100
+
+
+def chat_field(chat):
+    """Name of the Message/ChatInbox foreign key pointing to this chat."""
+    return 'private_chat' if isinstance(chat, PrivateChat) else 'group_chat'
+
+
+def preview_of(message):
+    if message.content:
+        return message.content[:PREVIEW_LENGTH]
+    return f'{message.message_type.capitalize()} message'
+
+
+def _last_message_fields(message, chat):
+    # New members start with everything already sent marked as read.
+    if message is None:
+        return {'last_message': None, 'preview': '', 'last_message_at': chat.created_at, 'last_read_message_id': 0}
+    return {'last_message': message, 'preview': preview_of(message), 'last_message_at': message.created_at,
+            'last_read_message_id': message.pk}
+
+
+def sync_members(chat):
+    """Give every member of the chat an inbox row, dropping the ones who left."""
+    field = chat_field(chat)
+    members = chat.participants if field == 'private_chat' else chat.members
+    member_ids = set(members.values_list('pk', flat=True))
+    rows = ChatInbox.objects.filter(**{field: chat})
+    rows.exclude(user_id__in=member_ids).delete()
+
+    existing = set(rows.values_list('user_id', flat=True))
+    last = _last_message_fields(Message.objects.filter(**{field: chat}).order_by('-id').first(), chat)
+    ChatInbox.objects.bulk_create([
+        ChatInbox(user_id=user_id, **{field: chat}, **last) for user_id in member_ids - existing],
+        ignore_conflicts=True)
+
+    if field == 'private_chat':
+        for user_id in member_ids:
+            other_ids = member_ids - {user_id}
+            rows.filter(user_id=user_id).update(other_user_id=min(other_ids) if other_ids else None)
+
+
+def message_posted(message):
+    """Move the inbox rows of the message's chat to it, one UPDATE."""
+    field = 'private_chat' if message.private_chat_id else 'group_chat'
+    chat_id = message.private_chat_id or message.group_chat_id
+    if chat_id is None:
+        return
+    rows = ChatInbox.objects.filter(**{f'{field}_id': chat_id})
+    # The sender has read everything up to the own message.
+    update = dict(
+        last_message=message,
+        preview=preview_of(message),
+        last_message_at=message.created_at,
+        last_read_message_id=Case(When(user_id=message.sender_id, then=Value(message.pk)),
+                                  default=F('last_read_message_id'), output_field=BigIntegerField()),
+        unread_count=Case(When(user_id=message.sender_id, then=Value(0)),
+                          default=F('unread_count') + 1))
+    if not rows.update(**update):
+        # A chat from before the inbox existed, create its rows first.
+        sync_members(message.private_chat or message.group_chat)
+        rows.update(**update)
+
+
+def mark_read(user, chat):
+    """Move the user's read cursor to the last message of the chat."""
+    ChatInbox.objects.filter(user=user, **{chat_field(chat): chat}).update(
+        last_read_message_id=Coalesce(F('last_message_id'), F('last_read_message_id'), output_field=BigIntegerField()),
+        unread_count=0)
+
+
+def unread_total(user):
+    return ChatInbox.objects.filter(user=user).aggregate(total=Sum('unread_count'))['total'] or 0
+
+
+def inbox_of(user):
+    """The chats listed for the user, most recent first."""
+    return ChatInbox.objects.filter(user=user).filter(
+        # Private chats which were only opened, nothing sent yet, aren't listed.
+        Q(group_chat__isnull=False) | Q(last_message__isnull=False, other_user__isnull=False)
+    ).select_related('group_chat', 'other_user__profile').order_by('-last_message_at', '-id')
+
+
+def chat_counts(user):
+    """(private chats, group chats) of the user, one query."""
+    counts = ChatInbox.objects.filter(user=user).aggregate(
+        private=Count('pk', filter=Q(private_chat__isnull=False)),
+        group=Count('pk', filter=Q(group_chat__isnull=False)))
+    return counts['private'], counts['group']
+
+
+def _unread_after_cursor(Message, field):
+    unread = Message.objects.filter(
+        **{field: OuterRef(field)}, pk__gt=OuterRef('last_read_message_id')
+    ).exclude(sender=OuterRef('user')).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+
+
+def recount_unread(Message, ChatInbox, rows=None):
+    """Count the unread messages of inbox rows again from their cursors."""
+    if rows is None:
+        rows = ChatInbox.objects.all()
+    return rows.update(
+        unread_count=_unread_after_cursor(Message, 'private_chat') + _unread_after_cursor(Message, 'group_chat'))
+
+
+def rebuild_inbox(PrivateChat, GroupChat, Message, ChatInbox, read_cursors=None):
+    """
+    Recreate every inbox row from the chat tables.
+
+    The read cursors are taken from `read_cursors`, {(user id, 'private_chat'
+    or 'group_chat', chat id): message id}, then from the current rows; a
+    member without either has read the whole chat. Returns the number of
+    rows written.
+    """
+    last_ids = [row['last_id'] for field in ('private_chat', 'group_chat') for row in Message.objects.filter(
+        **{f'{field}__isnull': False}).order_by().values(field).annotate(last_id=Max('id'))]
+    last_messages = {}
+    for message in Message.objects.filter(pk__in=last_ids).only(
+            'private_chat', 'group_chat', 'content', 'message_type', 'created_at'):
+        last_messages[('private_chat', message.private_chat_id) if message.private_chat_id
+                      else ('group_chat', message.group_chat_id)] = message
+
+    cursors = {}
+    for user_id, private_chat_id, group_chat_id, cursor in ChatInbox.objects.values_list(
+            'user_id', 'private_chat_id', 'group_chat_id', 'last_read_message_id'):
+        key = ('private_chat', private_chat_id) if private_chat_id else ('group_chat', group_chat_id)
+        cursors[(user_id,) + key] = cursor
+    cursors.update(read_cursors or {})
+
+    members = {}
+    for chat_id, user_id in PrivateChat.participants.through.objects.values_list('privatechat_id', 'user_id'):
+        members.setdefault(('private_chat', chat_id), []).append(user_id)
+    for chat_id, user_id in GroupChat.members.through.objects.values_list('groupchat_id', 'user_id'):
+        members.setdefault(('group_chat', chat_id), []).append(user_id)
+    created = {}
+    for field, Chat in (('private_chat', PrivateChat), ('group_chat', GroupChat)):
+        for chat_id, created_at in Chat.objects.values_list('pk', 'created_at'):
+            created[(field, chat_id)] = created_at
+
+    rows = []
+    for (field, chat_id), user_ids in members.items():
+        message = last_messages.get((field, chat_id))
+        for user_id in user_ids:
+            others = [other for other in user_ids if other != user_id]
+            rows.append(ChatInbox(
+                user_id=user_id,
+                other_user_id=min(others) if field == 'private_chat' and others else None,
+                last_message=message,
+                preview=preview_of(message) if message else '',
+                last_message_at=message.created_at if message else created[(field, chat_id)],
+                last_read_message_id=cursors.get((user_id, field, chat_id), message.pk if message else 0),
+                **{f'{field}_id': chat_id}))
+
+    ChatInbox.objects.all().delete()
+    ChatInbox.objects.bulk_create(rows, batch_size=1000)
+    recount_unread(Message, ChatInbox)
+    return len(rows)
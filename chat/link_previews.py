@@ -0,0 +1,192 @@
+"""
+Link previews.
+
+A link message is stored straight away with the URL as its title; its
+preview (title, description, image) is fetched afterwards by a small pool
+of background threads and pushed to the chat as a 'link_preview' event
+(chat/events.py) once it is on the message:
+
+    message = Message.objects.create(..., **preview_fields(link_url))
+    fetch_preview_later(message)
+
+Previews are cached per URL in LinkPreview, PREVIEW_TTL when the fetch
+worked and FAILURE_TTL when it didn't, so posting a URL again costs no
+request at all while the cache holds it. Fetches of the same URL running
+at the same time are done once.
+
+The HTTP request goes through a transport, a callable
+
+    transport(url, timeout, max_bytes) -> (status code, content type, body)
+
+requests_transport() by default. LinkPreviewFetcher takes another one, to
+fetch through a proxy or from a local stub server.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .events import publish_preview
+from .models import LinkPreview, Message
+from .search import index_message
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_TTL = timedelta(days=7)
+FAILURE_TTL = timedelta(hours=1)
+FETCH_TIMEOUT = 5
+# Only the head of the page is needed, don't download more than this.
+MAX_PAGE_BYTES = 512 * 1024
+# Fetches running at the same time per process.
+MAX_FETCHERS = 4
+
+TITLE_LENGTH = LinkPreview._meta.get_field('title').max_length
+IMAGE_LENGTH = Message._meta.get_field('link_image').max_length
+
+
+def requests_transport(url, timeout, max_bytes):
+    """`timeout` bounds the whole fetch: requests only applies it to each socket read."""
+    deadline = time.monotonic() + timeout
+    with requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=timeout, stream=True) as response:
+        body = b''
+        while len(body) < max_bytes:
+            # read1() returns what has arrived, a server trickling bytes can't hold the read.
+            chunk = response.raw.read1(16 * 1024, decode_content=True)
+            if not chunk:
+                break
+            body += chunk
+            if time.monotonic() > deadline:
+                raise requests.Timeout(f'Fetching {url} took more than {timeout}s')
+        return response.status_code, response.headers.get('Content-Type', ''), body[:max_bytes]
+
+
+def url_hash(url):
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def parse_preview(url, html):
+    """{'title', 'description', 'image'} of a page, from its Open Graph tags or <title>."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    def meta(name):
+        tag = soup.find('meta', property=f'og:{name}')
+        return (tag.get('content') or '').strip() if tag else ''
+
+    title = meta('title') or (soup.title.string.strip() if soup.title and soup.title.string else '') or url
+    image = meta('image')
+    return {
+        'title': title[:TITLE_LENGTH],
+        'description': meta('description'),
+        'image': urljoin(url, image) if image else None,
+    }
+
+
+def cached_preview(url):
+    """The LinkPreview of the URL if it hasn't expired."""
+    return LinkPreview.objects.filter(url_hash=url_hash(url), expires_at__gt=timezone.now()).first()
+
+
+def preview_fields(url):
+    """Link fields of a new message: the cached preview or, until it is fetched, the URL alone."""
+    preview = cached_preview(url)
+    if preview is None or preview.status != 'ok':
+        return {'link_url': url, 'link_title': url[:TITLE_LENGTH], 'link_description': '', 'link_image': None}
+    return {
+        'link_url': url,
+        'link_title': preview.title,
+        'link_description': preview.description,
+        # Message.link_image is shorter than the cache column.
+        'link_image': preview.image if preview.image and len(preview.image) <= IMAGE_LENGTH else None,
+    }
+
+
+class LinkPreviewFetcher:
+    """Fetches previews in a bounded thread pool, one fetch per URL at a time."""
+
+    def __init__(self, transport=None, max_workers=MAX_FETCHERS, timeout=FETCH_TIMEOUT):
+        self.transport = transport or requests_transport
+        self.timeout = timeout
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._running = {}
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix='link-preview')
+            return self._executor
+
+    def fetch(self, url):
+        """Fetch the URL and store its preview, a failed one on any error. Returns the LinkPreview."""
+        fields = {'status': 'failed', 'title': '', 'description': '', 'image': None}
+        try:
+            status, content_type, body = self.transport(url, self.timeout, MAX_PAGE_BYTES)
+            if status == 200 and 'html' in content_type.lower():
+                fields = dict(parse_preview(url, body), status='ok')
+        except Exception as e:
+            logger.info(f"Link preview of {url} failed: {e}")
+        now = timezone.now()
+        fields.update(url=url, fetched_at=now, expires_at=now + (PREVIEW_TTL if fields['status'] == 'ok' else FAILURE_TTL))
+        preview, created = LinkPreview.objects.update_or_create(url_hash=url_hash(url), defaults=fields)
+        return preview
+
+    def preview_of(self, url):
+        """The cached preview of the URL, fetched if needed; waits for a fetch already running."""
+        with self._lock:
+            event = self._running.get(url)
+            owner = event is None
+            if owner:
+                event = self._running[url] = threading.Event()
+        if not owner:
+            event.wait(self.timeout * 2)
+            return cached_preview(url)
+        try:
+            return cached_preview(url) or self.fetch(url)
+        finally:
+            with self._lock:
+                del self._running[url]
+            event.set()
+
+    def resolve(self, message_id):
+        """Put the preview of its URL on a link message and publish it."""
+        try:
+            message = Message.objects.filter(pk=message_id, message_type='link').first()
+            if message is None or not message.link_url:
+                return
+            preview = self.preview_of(message.link_url)
+            if preview is None or preview.status != 'ok':
+                return
+            fields = preview_fields(message.link_url)
+            Message.objects.filter(pk=message_id).update(**fields)
+            for field, value in fields.items():
+                setattr(message, field, value)
+            # update() sends no post_save, index the new title here.
+            index_message(message)
+            publish_preview(message)
+        except Exception:
+            logger.exception(f"Link preview of message {message_id} failed")
+        finally:
+            # The pool threads outlive requests, give their connection back.
+            close_old_connections()
+
+    def submit(self, message):
+        """Resolve the message in the background once the transaction commits."""
+        transaction.on_commit(lambda: self._pool().submit(self.resolve, message.pk))
+
+
+fetcher = LinkPreviewFetcher()
+
+
+def fetch_preview_later(message):
+    """Fetch the preview of a link message sent without one."""
+    if message.link_title == message.link_url[:TITLE_LENGTH] and not message.link_description:
+        fetcher.submit(message)
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.archive import ARCHIVE_AFTER, ArchiveError, archivable, archive_chat, chats_to_archive, verify_segment
+from chat.models import ArchivedSegment
+
+
+class Command(BaseCommand):
+    help = 'Move chat messages older than CHAT_ARCHIVE_AFTER_DAYS out of the database into the chat archive, or check the archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive the messages older than this many days instead')
+        parser.add_argument('--max-segments', type=int, help='Stop after writing this many segment files')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the messages due for the archive')
+        parser.add_argument('--verify', action='store_true', help='Check every segment file against its row instead')
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+
+        cutoff = timezone.now() - (timedelta(days=options['days']) if options['days'] is not None else ARCHIVE_AFTER)
+        remaining = options['max_segments']
+        segments = messages = 0
+        for chat in chats_to_archive(cutoff):
+            if options['dry_run']:
+                messages += len(archivable(chat, cutoff))
+                continue
+            written = archive_chat(chat, cutoff, max_segments=remaining)
+            segments += len(written)
+            messages += sum(segment.message_count for segment in written)
+            if remaining is not None:
+                remaining -= len(written)
+                if remaining <= 0:
+                    break
+
+        if options['dry_run']:
+            self.stdout.write(f'{messages} messages older than {cutoff:%Y-%m-%d} are due for the archive')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Archived {messages} messages in {segments} segments'))
+
+    def verify(self):
+        checked = failed = 0
+        for segment in ArchivedSegment.objects.order_by('pk').iterator():
+            try:
+                verify_segment(segment)
+                checked += 1
+            except ArchiveError as e:
+                failed += 1
+                self.stderr.write(str(e))
+        if failed:
+            self.stdout.write(self.style.ERROR(f'{failed} of {checked + failed} segments failed verification'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{checked} segments verified'))
@@ -0,0 +1,65 @@
+import json
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from chat.membership import is_member
+from chat.models import GroupChat
+from chat.views import send_message
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Measure group chat sends per second by group size, and the membership check alone: '
+            'loading the member list as the views used to, against chat.membership.is_member. Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[2, 10, 50, 300, 1000])
+        parser.add_argument('--messages', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['sizes'], options['messages'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def rate(self, count, function):
+        started = time.perf_counter()
+        for i in range(count):
+            function(i)
+        return count / (time.perf_counter() - started)
+
+    def run(self, sizes, count):
+        users = User.objects.bulk_create([
+            User(username=f'chat_membership_benchmark_{i}') for i in range(max(sizes))])
+        # The sender joins last, the member list has to be read to the end.
+        sender = users[-1]
+        factory = RequestFactory()
+
+        def send(group):
+            def post(i):
+                request = factory.post('/chat/send-message/', json.dumps(
+                    {'chat_type': 'group', 'chat_id': group.id, 'content': f'Benchmark {i}'}),
+                    content_type='application/json')
+                request.user = sender
+                send_message(request)
+            return post
+
+        self.stdout.write(f"{'members':>8} {'member list checks/s':>21} {'is_member checks/s':>19} {'sends/s':>8}")
+        for size in sizes:
+            group = GroupChat.objects.create(name=f'Benchmark {size}', creator=sender)
+            group.members.add(*users[-size:])
+
+            listed = self.rate(count, lambda i: sender in group.members.all())
+            checked = self.rate(count, lambda i: is_member(sender, group))
+            sends = self.rate(count, send(group))
+            self.stdout.write(f'{size:>8} {listed:>21.0f} {checked:>19.0f} {sends:>8.0f}')
+        self.stdout.write(self.style.SUCCESS('Done, the seeded rows were rolled back'))
@@ -0,0 +1,49 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from chat.models import GroupChat, Message
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Measure the latency and queries of sending a group chat message by group size. '
+            'Before the read cursors every send also ran one INSERT per recipient. Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[2, 10, 50, 300, 1000])
+        parser.add_argument('--messages', type=int, default=50)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['sizes'], options['messages'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, sizes, count):
+        users = User.objects.bulk_create([
+            User(username=f'chat_send_benchmark_{i}') for i in range(max(sizes))])
+        sender = users[0]
+        self.stdout.write(f"{'members':>8} {'ms/send':>9} {'queries/send':>13}")
+        for size in sizes:
+            group = GroupChat.objects.create(name=f'Benchmark {size}', creator=sender)
+            group.members.add(*users[:size])
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                for i in range(count):
+                    with transaction.atomic():
+                        Message.objects.create(sender=sender, group_chat=group, content=f'Benchmark {i}')
+                elapsed = (time.perf_counter() - started) * 1000
+            # SAVEPOINT/RELEASE of the atomic blocks aren't work of the send.
+            sent = [query for query in queries.captured_queries if 'SAVEPOINT' not in query['sql']]
+            self.stdout.write(f'{size:>8} {elapsed / count:>9.2f} {len(sent) / count:>13.1f}')
+        self.stdout.write(self.style.SUCCESS('Done, the seeded rows were rolled back'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat.models import PrivateChat, GroupChat, Message, ChatInbox
+from chat.inbox import rebuild_inbox
+
+
+class Command(BaseCommand):
+    help = 'Recreate the chat inbox rows (last message, read cursor and unread count per member and chat) from the chat tables'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rows = rebuild_inbox(PrivateChat, GroupChat, Message, ChatInbox)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} chat inbox rows'))
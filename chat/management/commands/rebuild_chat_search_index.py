@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat.models import Message
+from chat.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of chat messages'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index(Message)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} chat messages'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from chat.models import UserInteraction
+from chat.suggestions import rebuild_interaction_graph
+from qa.models import Answer, CommentQ, QUpvote
+
+
+class Command(BaseCommand):
+    help = 'Recompute the user interaction graph (comments, answers and upvotes between users) behind the chat suggestions, run it on a schedule'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            edges = rebuild_interaction_graph(Answer, CommentQ, QUpvote, UserInteraction)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {edges} user interaction edges'))
@@ -0,0 +1,105 @@
+"""
+Chat membership checks.
+
+The chat views ask is_member(user, chat) instead of loading the member list
+(`user in chat.members.all()`). A check is one EXISTS on the unique
+(chat, user) index of the participants/members table, and its answer is
+kept by the process:
+
+    if not is_member(request.user, group):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+Every chat has a generation number in the cache, moved by the m2m_changed
+signals of chat/signals.py whenever its members change; a kept answer of
+an older generation is asked again. So a check costs one cache read, and
+the EXISTS query only the first time or after a change. The generation is
+moved again once the change commits, and when the cache is down every
+check asks the database.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import GroupChat, PrivateChat
+
+logger = logging.getLogger(__name__)
+
+# Answers kept per process, the least recently used go first.
+MAX_CACHED_CHECKS = 10000
+GENERATION_KEY = 'chat_membership:{}:{}'
+
+
+def _chat_key(chat):
+    return ('private_chat', chat.pk) if isinstance(chat, PrivateChat) else ('group_chat', chat.pk)
+
+
+def _new_generation():
+    # Never reuse a number a process may still hold after the key was evicted.
+    return time.time_ns() // 1000
+
+
+def _generation(field, chat_id):
+    return cache.get_or_set(GENERATION_KEY.format(field, chat_id), _new_generation, None)
+
+
+def _bump_generations(field, chat_ids):
+    for chat_id in chat_ids:
+        key = GENERATION_KEY.format(field, chat_id)
+        try:
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Never checked, or evicted from the cache.
+                cache.set(key, _new_generation(), None)
+        except Exception:
+            logger.warning('Moving the membership generation of %s %s failed', field, chat_id, exc_info=True)
+
+
+def invalidate_membership(field, chat_ids):
+    """The members of these chats ('private_chat' or 'group_chat' ids) changed."""
+    chat_ids = list(chat_ids)
+    _bump_generations(field, chat_ids)
+    # Again once committed: a check between the two bumps ran its EXISTS on
+    # the rows from before and kept the answer under the new generation.
+    transaction.on_commit(lambda: _bump_generations(field, chat_ids))
+
+
+_lock = threading.Lock()
+_checks = OrderedDict()
+
+
+def _exists(chat, user_id):
+    if isinstance(chat, PrivateChat):
+        return PrivateChat.participants.through.objects.filter(privatechat_id=chat.pk, user_id=user_id).exists()
+    return GroupChat.members.through.objects.filter(groupchat_id=chat.pk, user_id=user_id).exists()
+
+
+def is_member(user, chat):
+    """Whether the user takes part in the private chat or belongs to the group."""
+    if not user.is_authenticated:
+        return False
+    field, chat_id = _chat_key(chat)
+    key = (field, chat_id, user.pk)
+    try:
+        generation = _generation(field, chat_id)
+    except Exception:
+        # Without the cache nothing kept can be trusted, ask the database.
+        logger.warning('Membership generation of %s %s unavailable', field, chat_id, exc_info=True)
+        return _exists(chat, user.pk)
+    with _lock:
+        cached = _checks.get(key)
+        if cached is not None and cached[0] == generation:
+            _checks.move_to_end(key)
+            return cached[1]
+
+    member = _exists(chat, user.pk)
+    with _lock:
+        _checks[key] = (generation, member)
+        _checks.move_to_end(key)
+        while len(_checks) > MAX_CACHED_CHECKS:
+            _checks.popitem(last=False)
+    return member
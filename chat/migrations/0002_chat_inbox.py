@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+PREVIEW_LENGTH = 100
+
+
+def fill_chat_inbox(apps, schema_editor):
+    # Frozen copy of chat.inbox.rebuild_inbox() as it was with ChatNotification.
+    PrivateChat = apps.get_model('chat', 'PrivateChat')
+    GroupChat = apps.get_model('chat', 'GroupChat')
+    Message = apps.get_model('chat', 'Message')
+    ChatNotification = apps.get_model('chat', 'ChatNotification')
+    ChatInbox = apps.get_model('chat', 'ChatInbox')
+
+    last_ids = [row['last_id'] for field in ('private_chat', 'group_chat') for row in Message.objects.filter(
+        **{f'{field}__isnull': False}).order_by().values(field).annotate(last_id=Max('id'))]
+    last_messages = {}
+    for message in Message.objects.filter(pk__in=last_ids).only(
+            'private_chat', 'group_chat', 'content', 'message_type', 'created_at'):
+        last_messages[('private_chat', message.private_chat_id) if message.private_chat_id
+                      else ('group_chat', message.group_chat_id)] = message
+
+    unread = {}
+    for row in ChatNotification.objects.filter(is_read=False).order_by().values(
+            'user', 'message__private_chat', 'message__group_chat').annotate(count=Count('id')):
+        key = ('private_chat', row['message__private_chat']) if row['message__private_chat'] else (
+            'group_chat', row['message__group_chat'])
+        unread[(row['user'],) + key] = row['count']
+
+    members = {}
+    for chat_id, user_id in PrivateChat.participants.through.objects.values_list('privatechat_id', 'user_id'):
+        members.setdefault(('private_chat', chat_id), []).append(user_id)
+    for chat_id, user_id in GroupChat.members.through.objects.values_list('groupchat_id', 'user_id'):
+        members.setdefault(('group_chat', chat_id), []).append(user_id)
+    created = {}
+    for field, Chat in (('private_chat', PrivateChat), ('group_chat', GroupChat)):
+        for chat_id, created_at in Chat.objects.values_list('pk', 'created_at'):
+            created[(field, chat_id)] = created_at
+
+    rows = []
+    for (field, chat_id), user_ids in members.items():
+        message = last_messages.get((field, chat_id))
+        if message is None:
+            preview = ''
+        elif message.content:
+            preview = message.content[:PREVIEW_LENGTH]
+        else:
+            preview = f'{message.message_type.capitalize()} message'
+        for user_id in user_ids:
+            others = [other for other in user_ids if other != user_id]
+            rows.append(ChatInbox(
+                user_id=user_id,
+                other_user_id=min(others) if field == 'private_chat' and others else None,
+                last_message=message,
+                preview=preview,
+                last_message_at=message.created_at if message else created[(field, chat_id)],
+                unread_count=unread.get((user_id, field, chat_id), 0),
+                **{f'{field}_id': chat_id}))
+
+    ChatInbox.objects.all().delete()
+    ChatInbox.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('preview', models.CharField(blank=True, default='', max_length=255)),
+                ('last_message_at', models.DateTimeField()),
+                ('unread_count', models.IntegerField(default=0)),
+                ('group_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inbox_rows', to='chat.groupchat')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message')),
+                ('other_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('private_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inbox_rows', to='chat.privatechat')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_inbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_message_at', '-id'], name='chat_inbox_recent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'private_chat'), name='chat_inbox_private_unique'), models.UniqueConstraint(fields=('user', 'group_chat'), name='chat_inbox_group_unique')],
+            },
+        ),
+        migrations.RunPython(fill_chat_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _unread_after_cursor(Message, field):
+    unread = Message.objects.filter(
+        **{field: OuterRef(field)}, pk__gt=OuterRef('last_read_message_id')
+    ).exclude(sender=OuterRef('user')).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(unread, output_field=IntegerField()), Value(0))
+
+
+def notifications_to_cursors(apps, schema_editor):
+    """
+    A member's cursor is just before the first message still unread in
+    ChatNotification, members without unread notifications read the chat.
+    The unread counts are then counted again from the cursors.
+    """
+    ChatNotification = apps.get_model('chat', 'ChatNotification')
+    ChatInbox = apps.get_model('chat', 'ChatInbox')
+    Message = apps.get_model('chat', 'Message')
+    read_cursors = {}
+    for row in ChatNotification.objects.filter(is_read=False).order_by().values(
+            'user', 'message__private_chat', 'message__group_chat').annotate(first_unread=Min('message')):
+        if row['message__private_chat']:
+            key = (row['user'], 'private_chat', row['message__private_chat'])
+        else:
+            key = (row['user'], 'group_chat', row['message__group_chat'])
+        read_cursors[key] = row['first_unread'] - 1
+
+    rows = list(ChatInbox.objects.only('user', 'private_chat', 'group_chat', 'last_message', 'last_read_message_id'))
+    for row in rows:
+        key = (row.user_id, 'private_chat', row.private_chat_id) if row.private_chat_id else (
+            row.user_id, 'group_chat', row.group_chat_id)
+        row.last_read_message_id = read_cursors.get(key, row.last_message_id or 0)
+    ChatInbox.objects.bulk_update(rows, ['last_read_message_id'], batch_size=1000)
+    ChatInbox.objects.update(
+        unread_count=_unread_after_cursor(Message, 'private_chat') + _unread_after_cursor(Message, 'group_chat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_chat_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatinbox',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(notifications_to_cursors, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ChatNotification',
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chat_read_cursors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['private_chat', 'id'], name='chat_message_private_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['group_chat', 'id'], name='chat_message_group_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_message_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkPreview',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_hash', models.CharField(max_length=64, unique=True)),
+                ('url', models.TextField()),
+                ('status', models.CharField(choices=[('ok', 'Fetched'), ('failed', 'Failed')], default='ok', max_length=10)),
+                ('title', models.CharField(blank=True, default='', max_length=255)),
+                ('description', models.TextField(blank=True, default='')),
+                ('image', models.URLField(blank=True, max_length=500, null=True)),
+                ('fetched_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
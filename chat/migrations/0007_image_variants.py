@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_user_interactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,53 @@
+import os
+
+from django.db import migrations
+
+# Frozen copy of the FTS5 table of chat.search, filled the way its
+# rebuild_index() does. Other databases search without an index.
+TABLE = 'chat_message_search'
+
+
+def _documents(Message):
+    """(rowid, chat, content, link title, file name) of every message."""
+    for message in Message.objects.filter(is_deleted=False).only(
+            'private_chat', 'group_chat', 'message_type', 'content', 'link_title', 'file').iterator():
+        if message.private_chat_id:
+            chat = f'p{message.private_chat_id}'
+        elif message.group_chat_id:
+            chat = f'g{message.group_chat_id}'
+        else:
+            continue
+        content = '' if message.message_type in ('image', 'file') else message.content or ''
+        yield (message.pk, chat, content, message.link_title or '',
+               os.path.basename(message.file.name) if message.file else '')
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "chat UNINDEXED, content, link_title, file_name, tokenize='porter unicode61')")
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, chat, content, link_title, file_name) VALUES (%s, %s, %s, %s, %s)',
+            list(_documents(apps.get_model('chat', 'Message'))))
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0008_message_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.BigIntegerField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('message_count', models.IntegerField()),
+                ('first_message_at', models.DateTimeField()),
+                ('last_message_at', models.DateTimeField()),
+                ('file', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('group_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_segments', to='chat.groupchat')),
+                ('private_chat', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_segments', to='chat.privatechat')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['private_chat', 'last_message_id'], name='chat_archive_private_idx'), models.Index(fields=['group_chat', 'last_message_id'], name='chat_archive_group_idx')],
+            },
+        ),
+    ]
@@ -1,8 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+
+from main.media import rendition_url
 
 
 class PrivateChat(models.Model):
@@ -67,6 +67,8 @@ class Message(models.Model):
     
     # Media
     image = models.ImageField(upload_to='chat_images', null=True, blank=True)
+    # Smaller renditions of the image, made in the background, see main/media.py.
+    image_variants = models.JSONField(default=dict, blank=True)
     file = models.FileField(upload_to='chat_files', null=True, blank=True)
     
     # Link metadata
@@ -85,6 +87,11 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Chat history is read by id ranges, see chat/history.py.
+            models.Index(fields=['private_chat', 'id'], name='chat_message_private_id_idx'),
+            models.Index(fields=['group_chat', 'id'], name='chat_message_group_id_idx'),
+        ]
 
     def __str__(self):
         # Return just the content preview instead of sender info
@@ -92,6 +99,11 @@ class Message(models.Model):
             return self.content[:50] + ('...' if len(self.content) > 50 else '')
         return f"{self.message_type.capitalize()} message"
 
+    @property
+    def image_display_url(self):
+        """The image as shown in a chat bubble (300px wide, 2x)."""
+        return rendition_url(self.image, self.image_variants, 'medium')
+
     def mark_as_edited(self):
         """Mark message as edited"""
         self.is_edited = True
@@ -122,32 +134,107 @@ class MessageReaction(models.Model):
         return f"{self.user.username} reacted {self.reaction} to message"
 
 
-class ChatNotification(models.Model):
-    """Model for tracking unread messages"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_notifications')
-    message = models.ForeignKey(Message, on_delete=models.CASCADE)
-    is_read = models.BooleanField(default=False)
+class ChatInbox(models.Model):
+    """
+    One row per member of a chat: what the chat list shows for it and how
+    far the member has read. Kept up to date by chat/signals.py when
+    messages are sent, chats are read and members join or leave, see
+    chat/inbox.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_inbox')
+    private_chat = models.ForeignKey(PrivateChat, on_delete=models.CASCADE, related_name='inbox_rows', null=True, blank=True)
+    group_chat = models.ForeignKey(GroupChat, on_delete=models.CASCADE, related_name='inbox_rows', null=True, blank=True)
+    # The other participant of a private chat.
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    last_message = models.ForeignKey(Message, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    preview = models.CharField(max_length=255, blank=True, default='')
+    # Time of the last message, of the chat creation before the first one.
+    last_message_at = models.DateTimeField()
+    # Read cursor: every message of the chat with a higher id is unread.
+    last_read_message_id = models.BigIntegerField(default=0)
+    # Messages of the others after the cursor.
+    unread_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'private_chat'], name='chat_inbox_private_unique'),
+            models.UniqueConstraint(fields=['user', 'group_chat'], name='chat_inbox_group_unique'),
+        ]
+        indexes = [models.Index(fields=['user', '-last_message_at', '-id'], name='chat_inbox_recent_idx')]
+
+    def __str__(self):
+        return f"Inbox of {self.user_id} - {'private' if self.private_chat_id else 'group'} {self.private_chat_id or self.group_chat_id} - {self.unread_count} unread"
+
+
+class LinkPreview(models.Model):
+    """
+    Title, description and image of a URL, shared by every message linking
+    to it. Failed fetches are kept too, for a shorter time, so a dead link
+    isn't fetched again for each message. See chat/link_previews.py.
+    """
+    STATUS_CHOICES = [
+        ('ok', 'Fetched'),
+        ('failed', 'Failed'),
+    ]
+
+    # sha256 of the URL, URLs can be longer than an indexable column.
+    url_hash = models.CharField(max_length=64, unique=True)
+    url = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ok')
+    title = models.CharField(max_length=255, blank=True, default='')
+    description = models.TextField(blank=True, default='')
+    image = models.URLField(max_length=500, null=True, blank=True)
+    fetched_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.url} ({self.status})"
+
+
+class UserInteraction(models.Model):
+    """
+    Edge of the interaction graph: how much `other_user` and `user` dealt
+    with each other's posts (comments, answers, upvotes), stored in both
+    directions. Rebuilt by the rebuild_interaction_graph command, read by
+    the chat suggestions, see chat/suggestions.py.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='interactions')
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    weight = models.IntegerField(default=0)
+    last_interaction_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'other_user'], name='user_interaction_unique')]
+        indexes = [models.Index(fields=['user', '-weight'], name='user_interaction_top_idx')]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.other_user_id}: {self.weight}"
+
+
+class ArchivedSegment(models.Model):
+    """
+    A run of old messages of a chat moved out of the Message table into a
+    compressed file of the chat archive, message ids first_message_id to
+    last_message_id. The history endpoints read them back, see
+    chat/archive.py.
+    """
+    private_chat = models.ForeignKey(PrivateChat, on_delete=models.CASCADE, related_name='archived_segments', null=True, blank=True)
+    group_chat = models.ForeignKey(GroupChat, on_delete=models.CASCADE, related_name='archived_segments', null=True, blank=True)
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    message_count = models.IntegerField()
+    first_message_at = models.DateTimeField()
+    last_message_at = models.DateTimeField()
+    # Name of the file in the archive storage and sha256 of its content.
+    file = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'message')
+        indexes = [
+            models.Index(fields=['private_chat', 'last_message_id'], name='chat_archive_private_idx'),
+            models.Index(fields=['group_chat', 'last_message_id'], name='chat_archive_group_idx'),
+        ]
 
     def __str__(self):
-        return f"Notification for {self.user.username}"
-
-
-@receiver(post_save, sender=Message)
-def create_chat_notifications(sender, instance, created, **kwargs):
-    """Create notifications for all recipients when a message is sent"""
-    if created:
-        if instance.private_chat:
-            # For private chats, notify the other participant
-            recipients = instance.private_chat.participants.exclude(id=instance.sender.id)
-        elif instance.group_chat:
-            # For group chats, notify all members except sender
-            recipients = instance.group_chat.members.exclude(id=instance.sender.id)
-        else:
-            recipients = []
-
-        for recipient in recipients:
-            ChatNotification.objects.create(user=recipient, message=instance)
+        return f"{'private' if self.private_chat_id else 'group'} {self.private_chat_id or self.group_chat_id}: messages {self.first_message_id}-{self.last_message_id}"
@@ -0,0 +1,173 @@
+"""
+Full-text search of chat messages.
+
+Every message is a row of one SQLite FTS5 table, rowid = message id, with
+its text, link title and file name, plus the chat it belongs to (unindexed)
+so a search only returns the chats of the user who runs it:
+
+    hits, has_more = search_messages(request.user, 'exam schedule', offset=0, limit=20)
+
+Hits are ranked by BM25 and come with a highlighted snippet and the chat
+they are in; history_cursor() turns a hit into the ?before= cursor of the
+history endpoints (chat/history.py) for the page ending with the message.
+
+The index follows the messages through chat/signals.py (send, edit,
+delete, soft delete). `python manage.py rebuild_chat_search_index`
+rebuilds it. On other databases than SQLite search falls back to a
+scoped icontains query, without ranking.
+"""
+import json
+import os
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+
+from qa.search import MARK_END, MARK_START, highlight
+from qa.search.sqlite import match_expression
+
+from .models import ChatInbox, Message
+
+TABLE = 'chat_message_search'
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "chat UNINDEXED, content, link_title, file_name, tokenize='porter unicode61')")
+DROP_TABLE = f'DROP TABLE IF EXISTS {TABLE}'
+
+# bm25() weights of the chat, content, link title and file name columns.
+WEIGHTS = '0.0, 1.0, 2.0, 2.0'
+
+MessageHit = namedtuple('MessageHit', ['message_id', 'chat_type', 'chat_id', 'score', 'snippet'])
+
+
+def chat_key(chat_type, chat_id):
+    return f'{chat_type[0]}{chat_id}'
+
+
+def message_document(message):
+    """(rowid, chat, content, link title, file name) of a message."""
+    chat_type = 'private' if message.private_chat_id else 'group'
+    content = message.content or ''
+    if message.message_type in ('image', 'file'):
+        # "Sent an image", "Sent a file: x.pdf": the file name is indexed on its own.
+        content = ''
+    return (message.pk, chat_key(chat_type, message.private_chat_id or message.group_chat_id), content,
+            message.link_title or '', os.path.basename(message.file.name) if message.file else '')
+
+
+def _fts():
+    return connection.vendor == 'sqlite'
+
+
+def create_index():
+    if _fts():
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE)
+
+
+def drop_index():
+    if _fts():
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_TABLE)
+
+
+def _insert(cursor, documents):
+    cursor.executemany(
+        f'INSERT OR REPLACE INTO {TABLE} (rowid, chat, content, link_title, file_name) VALUES (%s, %s, %s, %s, %s)',
+        documents)
+    return len(documents)
+
+
+def index_message(message):
+    if not _fts():
+        return
+    with connection.cursor() as cursor:
+        if message.is_deleted or not (message.private_chat_id or message.group_chat_id):
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [message.pk])
+        else:
+            _insert(cursor, [message_document(message)])
+
+
+def remove_message(message_id):
+    if _fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [message_id])
+
+
+def rebuild_index(Message, batch_size=1000):
+    """Index every message again. Returns the number of messages indexed."""
+    if not _fts():
+        return 0
+    indexed = 0
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_TABLE)
+        cursor.execute(CREATE_TABLE)
+        batch = []
+        for message in Message.objects.filter(is_deleted=False).only(
+                'private_chat', 'group_chat', 'message_type', 'content', 'link_title', 'file').iterator():
+            if not (message.private_chat_id or message.group_chat_id):
+                continue
+            batch.append(message_document(message))
+            if len(batch) >= batch_size:
+                indexed += _insert(cursor, batch)
+                batch = []
+        indexed += _insert(cursor, batch)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return indexed
+
+
+def _chats_of(user):
+    chats = {}
+    for private_chat_id, group_chat_id in ChatInbox.objects.filter(user=user).values_list(
+            'private_chat_id', 'group_chat_id'):
+        chat_type, chat_id = ('private', private_chat_id) if private_chat_id else ('group', group_chat_id)
+        chats[chat_key(chat_type, chat_id)] = (chat_type, chat_id)
+    return chats
+
+
+def _search_fts(chats, query, offset, limit):
+    expression = match_expression(query)
+    if not expression:
+        return []
+    # The chats are joined from a json_each() list rather than bound one by one,
+    # a user can be in more chats than SQLite takes parameters.
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT rowid, chat, bm25({TABLE}, {WEIGHTS}) AS score,
+                   snippet({TABLE}, -1, %s, %s, '…', 16)
+            FROM {TABLE}
+            WHERE {TABLE} MATCH %s AND chat IN (SELECT value FROM json_each(%s))
+            ORDER BY score
+            LIMIT %s OFFSET %s""", [MARK_START, MARK_END, expression, json.dumps(list(chats)), limit, offset])
+        rows = cursor.fetchall()
+    return [MessageHit(message_id, *chats[key], -score, highlight(snippet))
+            for message_id, key, score, snippet in rows]
+
+
+def _search_scan(chats, query, offset, limit):
+    private_ids = [chat_id for chat_type, chat_id in chats.values() if chat_type == 'private']
+    group_ids = [chat_id for chat_type, chat_id in chats.values() if chat_type == 'group']
+    messages = Message.objects.filter(
+        Q(private_chat_id__in=private_ids) | Q(group_chat_id__in=group_ids), is_deleted=False
+    ).filter(Q(content__icontains=query) | Q(link_title__icontains=query)).order_by('-id')
+    return [MessageHit(message.pk, *(('private', message.private_chat_id) if message.private_chat_id
+                                     else ('group', message.group_chat_id)), 0.0, highlight(message.content[:200]))
+            for message in messages[offset:offset + limit]]
+
+
+def search_messages(user, query, offset=0, limit=20):
+    """Return ([MessageHit], has_more) over the chats of the user, best first."""
+    if not query or not query.strip():
+        return [], False
+    chats = _chats_of(user)
+    if not chats:
+        return [], False
+    search = _search_fts if _fts() else _search_scan
+    hits = search(chats, query.strip(), offset, limit + 1)
+    return hits[:limit], len(hits) > limit
+
+
+def history_cursor(hit):
+    """?before= of the history page ending with the hit, see chat/history.py."""
+    return hit.message_id + 1
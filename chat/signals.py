@@ -0,0 +1,114 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db import transaction
+from django.dispatch import receiver
+from .models import PrivateChat, GroupChat, Message, ChatInbox, ArchivedSegment
+from .inbox import message_posted, sync_members
+from .events import publish_edit
+from .membership import invalidate_membership
+from .search import index_message, remove_message
+from .archive import storage as archive_storage
+
+# CHAT INBOX - START
+# Keep ChatInbox (chat/inbox.py) in step with the messages and the members.
+
+
+@receiver(post_save, sender=Message)
+def inbox_message_posted(sender, instance, created, **kwargs):
+    if created:
+        message_posted(instance)
+
+
+def _members_changed(Chat, field, instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        sync_members(instance)
+    elif action == 'post_clear':
+        # user.group_chats.clear(), we don't know which chats it left.
+        ChatInbox.objects.filter(user=instance, **{f'{field}__isnull': False}).delete()
+    else:
+        for chat in Chat.objects.filter(pk__in=pk_set):
+            sync_members(chat)
+
+
+@receiver(m2m_changed, sender=PrivateChat.participants.through)
+def inbox_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _members_changed(PrivateChat, 'private_chat', instance, action, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=GroupChat.members.through)
+def inbox_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _members_changed(GroupChat, 'group_chat', instance, action, reverse, pk_set)
+
+# CHAT INBOX - END
+
+
+# CHAT EVENTS - START
+# New messages and reactions are published by the views, see chat/events.py.
+
+
+@receiver(post_save, sender=Message)
+def events_message_edited(sender, instance, created, **kwargs):
+    # Message.mark_as_edited() saves the new content with is_edited set.
+    if not created and instance.is_edited:
+        publish_edit(instance)
+
+# CHAT EVENTS - END
+
+
+# CHAT MEMBERSHIP - START
+# Forget the membership checks of chats whose members change, see chat/membership.py.
+
+
+def _membership_changed(instance, action, reverse, pk_set, field, related_name):
+    if action == 'pre_clear' and reverse:
+        # user.group_chats.clear(), note the chats before they are gone.
+        instance._cleared_chat_ids = list(getattr(instance, related_name).values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_membership(field, [instance.pk])
+    elif action == 'post_clear':
+        invalidate_membership(field, getattr(instance, '_cleared_chat_ids', []))
+    else:
+        invalidate_membership(field, pk_set)
+
+
+@receiver(m2m_changed, sender=PrivateChat.participants.through)
+def membership_participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _membership_changed(instance, action, reverse, pk_set, 'private_chat', 'private_chats')
+
+
+@receiver(m2m_changed, sender=GroupChat.members.through)
+def membership_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    _membership_changed(instance, action, reverse, pk_set, 'group_chat', 'group_chats')
+
+# CHAT MEMBERSHIP - END
+
+
+# CHAT SEARCH - START
+# Keep the message search index (chat/search.py) in step with the messages,
+# soft deleted messages are taken out of it.
+
+
+@receiver(post_save, sender=Message)
+def search_index_message(sender, instance, **kwargs):
+    index_message(instance)
+
+
+@receiver(post_delete, sender=Message)
+def search_unindex_message(sender, instance, **kwargs):
+    remove_message(instance.pk)
+
+# CHAT SEARCH - END
+
+
+# CHAT ARCHIVE - START
+# A segment row going away (its chat was deleted) takes its file with it.
+
+
+@receiver(post_delete, sender=ArchivedSegment)
+def archive_segment_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: archive_storage.delete(instance.file))
+
+# CHAT ARCHIVE - END
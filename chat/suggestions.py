@@ -0,0 +1,200 @@
+"""
+"Start a conversation" suggestions of the chat list.
+
+Suggestions come from two precomputed lists, so a chat list load doesn't
+join the forum tables:
+
+- the interaction graph, UserInteraction rows weighted by the comments,
+  answers and upvotes two users gave each other's posts. It is rebuilt
+  from the forum tables by rebuild_interaction_graph(), run on a schedule
+  (the rebuild_interaction_graph command, hourly from cron). The top
+  INTERACTION_CANDIDATES edges of a user are cached for SUGGESTIONS_TTL;
+- the users most recently active on the site (logged in, asked or
+  answered), one list for everybody, cached for ACTIVE_USERS_TTL.
+
+suggested_users() ranks them the way the chat list always did: people the
+user interacted with (the recently active ones first), then the recently
+active users, then the others; minus the people the user already chats
+with, read from the inbox at every call. Without the cache both lists are
+read from the database.
+"""
+import logging
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.utils import timezone
+
+from .models import ChatInbox, UserInteraction
+
+logger = logging.getLogger(__name__)
+
+COMMENT_WEIGHT = 3
+ANSWER_WEIGHT = 2
+UPVOTE_WEIGHT = 1
+
+INTERACTION_CANDIDATES = 30
+ACTIVE_USERS = 200
+
+SUGGESTIONS_TTL = 60 * 60
+ACTIVE_USERS_TTL = 60 * 10
+GRAPH_GENERATION_KEY = 'chat_suggestions:generation'
+CANDIDATES_KEY = 'chat_suggestions:{}:{}'
+ACTIVE_USERS_KEY = 'chat_suggestions:active_users'
+
+
+def interaction_sources(Answer, CommentQ, QUpvote):
+    """(queryset of actor/owner/at rows, weight) of every kind of interaction."""
+    return [
+        (CommentQ.objects.filter(question_comment__isnull=False).values(
+            actor=F('commented_by'), owner=F('question_comment__post_owner')), COMMENT_WEIGHT),
+        (CommentQ.objects.filter(answer_comment__isnull=False).values(
+            actor=F('commented_by'), owner=F('answer_comment__answer_owner')), COMMENT_WEIGHT),
+        (Answer.objects.values(actor=F('answer_owner'), owner=F('questionans__post_owner')), ANSWER_WEIGHT),
+        (QUpvote.objects.values(actor=F('upvote_by_q'), owner=F('upvote_question_of__post_owner')), UPVOTE_WEIGHT),
+    ]
+
+
+def rebuild_interaction_graph(Answer, CommentQ, QUpvote, UserInteraction):
+    """
+    Recompute every UserInteraction edge from the forum tables, one grouped
+    query per kind of interaction. Returns the number of edges written.
+    """
+    edges = {}
+    for rows, weight in interaction_sources(Answer, CommentQ, QUpvote):
+        for row in rows.order_by().annotate(count=Count('pk'), at=Max('date')):
+            actor, owner = row['actor'], row['owner']
+            if actor == owner or actor is None or owner is None:
+                continue
+            # Both of them get the edge.
+            for key in ((actor, owner), (owner, actor)):
+                edge = edges.setdefault(key, [0, None])
+                edge[0] += row['count'] * weight
+                if edge[1] is None or row['at'] > edge[1]:
+                    edge[1] = row['at']
+
+    UserInteraction.objects.all().delete()
+    UserInteraction.objects.bulk_create([
+        UserInteraction(user_id=user_id, other_user_id=other_id, weight=weight, last_interaction_at=at)
+        for (user_id, other_id), (weight, at) in edges.items()], batch_size=1000)
+    invalidate_suggestions()
+    return len(edges)
+
+
+def invalidate_suggestions():
+    try:
+        try:
+            cache.incr(GRAPH_GENERATION_KEY)
+        except ValueError:
+            cache.set(GRAPH_GENERATION_KEY, 1, None)
+    except Exception:
+        # Best effort, the cached candidates expire after SUGGESTIONS_TTL.
+        logger.warning('Invalidating the chat suggestions failed', exc_info=True)
+
+
+def _cached(key, compute, timeout):
+    """compute() through the cache, straight from the database when the cache is down."""
+    try:
+        value = cache.get(key)
+    except Exception:
+        logger.warning('Chat suggestions cache unavailable', exc_info=True)
+        return compute()
+    if value is None:
+        value = compute()
+        try:
+            cache.set(key, value, timeout)
+        except Exception:
+            logger.warning('Chat suggestions cache unavailable', exc_info=True)
+    return value
+
+
+def _load_interaction_candidates(user):
+    return list(UserInteraction.objects.filter(
+        user=user, other_user__is_active=True, other_user__is_superuser=False
+    ).order_by('-weight').values_list('other_user_id', flat=True)[:INTERACTION_CANDIDATES])
+
+
+def interaction_candidates(user):
+    """Ids of the users the user interacted with most, heaviest first."""
+    try:
+        key = CANDIDATES_KEY.format(cache.get_or_set(GRAPH_GENERATION_KEY, 1, None), user.id)
+    except Exception:
+        logger.warning('Chat suggestions cache unavailable', exc_info=True)
+        return _load_interaction_candidates(user)
+    return _cached(key, lambda: _load_interaction_candidates(user), SUGGESTIONS_TTL)
+
+
+def _load_active_users():
+    from qa.models import Question, Answer
+
+    since = timezone.now() - timedelta(hours=48)
+    latest = dict(User.objects.filter(is_active=True, is_superuser=False).exclude(
+        last_login=None).order_by('-last_login').values_list('pk', 'last_login')[:ACTIVE_USERS])
+    posts = Question.objects.filter(date__gte=since).values_list('post_owner').annotate(at=Max('date'))
+    answers = Answer.objects.filter(date__gte=since).values_list('answer_owner').annotate(at=Max('date'))
+    for rows in (posts, answers):
+        for user_id, at in rows.order_by():
+            if user_id not in latest or at > latest[user_id]:
+                latest[user_id] = at
+    eligible = set(User.objects.filter(pk__in=latest, is_active=True, is_superuser=False).values_list('pk', flat=True))
+    return sorted(((user_id, at) for user_id, at in latest.items() if user_id in eligible),
+                  key=lambda entry: entry[1], reverse=True)[:ACTIVE_USERS]
+
+
+def active_users():
+    """[(user id, last activity)] of the most recently active users, most recent first."""
+    return _cached(ACTIVE_USERS_KEY, _load_active_users, ACTIVE_USERS_TTL)
+
+
+def suggested_users(user, limit=10):
+    """Up to `limit` users, with their profiles, the user may want to message."""
+    now = timezone.now()
+    recent_24h = now - timedelta(hours=24)
+    recent_48h = now - timedelta(hours=48)
+
+    # Users already chatted with, only those with actual messages
+    excluded = set(ChatInbox.objects.filter(
+        user=user, private_chat__isnull=False, last_message__isnull=False, other_user__isnull=False
+    ).values_list('other_user_id', flat=True))
+    excluded.add(user.id)
+
+    mutual = [user_id for user_id in interaction_candidates(user) if user_id not in excluded]
+    active = [(user_id, at) for user_id, at in active_users() if user_id not in excluded]
+    active_at = dict(active)
+
+    suggested = []
+
+    def add(user_ids, up_to):
+        for user_id in user_ids:
+            if len(suggested) >= up_to:
+                return
+            if user_id not in suggested:
+                suggested.append(user_id)
+
+    # Mutual interaction users, the recently active ones first
+    add([user_id for user_id in mutual if user_id in active_at and active_at[user_id] >= recent_24h], 3)
+    add(mutual[:5], limit)
+    add([user_id for user_id, at in active if at >= recent_24h], limit)
+    add([user_id for user_id, at in active if at >= recent_48h], limit)
+    add([user_id for user_id, at in active], limit)
+
+    users = User.objects.select_related('profile').in_bulk(suggested)
+    mutual = set(mutual)
+    result = []
+    for user_id in suggested:
+        u = users.get(user_id)
+        if u is None:
+            continue
+        profile = getattr(u, 'profile', None)
+        result.append({
+            'id': u.id,
+            'username': u.username,
+            'full_name': profile.full_name if profile and profile.full_name else u.get_full_name(),
+            'photo': profile.profile_photo_thumb_url if profile and profile.profile_photo else None,
+            'user_type': profile.user_type if profile else 'Student',
+            'is_very_active': bool(u.last_login and u.last_login >= recent_24h),
+            'has_mutual_interaction': u.id in mutual,
+            'last_seen': u.last_login,
+        })
+    return result
@@ -0,0 +1,128 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .link_previews import LinkPreviewFetcher, requests_transport
+from .models import LinkPreview, Message, PrivateChat
+
+PAGE = (b'<html><head><title>Plain title</title>'
+        b'<meta property="og:title" content="Stub page">'
+        b'<meta property="og:description" content="Served by the stub">'
+        b'<meta property="og:image" content="/cover.png"></head><body></body></html>')
+
+
+class StubTransport:
+    """A transport answering every URL with the same response, counting the calls."""
+
+    def __init__(self, status=200, content_type='text/html; charset=utf-8', body=PAGE, error=None):
+        self.response = (status, content_type, body)
+        self.error = error
+        self.calls = []
+
+    def __call__(self, url, timeout, max_bytes):
+        self.calls.append(url)
+        if self.error:
+            raise self.error
+        return self.response
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.end_headers()
+        if self.path == '/slow':
+            # Every write comes well within the read timeout, the whole page doesn't.
+            try:
+                for i in range(40):
+                    self.wfile.write(b'<!-- trickle -->')
+                    self.wfile.flush()
+                    time.sleep(0.1)
+            except (BrokenPipeError, ConnectionResetError):
+                # The transport gave up, as it should.
+                pass
+        else:
+            self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class LinkPreviewFetcherTests(TestCase):
+    url = 'http://stub.test/page'
+
+    def test_fetch_stores_the_preview(self):
+        fetcher = LinkPreviewFetcher(transport=StubTransport())
+        preview = fetcher.preview_of(self.url)
+        self.assertEqual(preview.status, 'ok')
+        self.assertEqual(preview.title, 'Stub page')
+        self.assertEqual(preview.description, 'Served by the stub')
+        self.assertEqual(preview.image, 'http://stub.test/cover.png')
+
+    def test_cached_url_is_not_fetched_again(self):
+        transport = StubTransport()
+        fetcher = LinkPreviewFetcher(transport=transport)
+        fetcher.preview_of(self.url)
+        fetcher.preview_of(self.url)
+        self.assertEqual(transport.calls, [self.url])
+
+    def test_failures_are_cached_too(self):
+        transport = StubTransport(error=requests.ConnectionError('refused'))
+        fetcher = LinkPreviewFetcher(transport=transport)
+        self.assertEqual(fetcher.preview_of(self.url).status, 'failed')
+        self.assertEqual(fetcher.preview_of(self.url).status, 'failed')
+        self.assertEqual(len(transport.calls), 1)
+
+    def test_non_html_is_a_failed_preview(self):
+        fetcher = LinkPreviewFetcher(transport=StubTransport(content_type='application/pdf', body=b'%PDF'))
+        self.assertEqual(fetcher.preview_of(self.url).status, 'failed')
+
+    def test_resolve_puts_the_preview_on_the_message(self):
+        sender = User.objects.create_user('preview_sender', password='password')
+        chat = PrivateChat.objects.create()
+        chat.participants.add(sender)
+        message = Message.objects.create(
+            sender=sender, private_chat=chat, message_type='link', link_url=self.url, link_title=self.url)
+        LinkPreviewFetcher(transport=StubTransport()).resolve(message.pk)
+        message.refresh_from_db()
+        self.assertEqual(message.link_title, 'Stub page')
+        self.assertEqual(message.link_description, 'Served by the stub')
+        self.assertTrue(LinkPreview.objects.filter(url=self.url, status='ok').exists())
+
+
+class RequestsTransportTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def test_fetches_from_a_local_stub_server(self):
+        status, content_type, body = requests_transport(f'{self.base_url}/page', 2, 1024 * 1024)
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, 'text/html')
+        self.assertEqual(body, PAGE)
+
+    def test_body_is_cut_at_max_bytes(self):
+        status, content_type, body = requests_transport(f'{self.base_url}/page', 2, 10)
+        self.assertEqual(body, PAGE[:10])
+
+    def test_timeout_bounds_the_whole_fetch(self):
+        start = time.monotonic()
+        with self.assertRaises(requests.Timeout):
+            requests_transport(f'{self.base_url}/slow', 0.5, 1024 * 1024)
+        self.assertLess(time.monotonic() - start, 2)
@@ -9,6 +9,13 @@ urlpatterns = [
     path('private/<int:user_id>/', views.private_chat, name='private_chat'),
     path('group/<int:group_id>/', views.group_chat, name='group_chat'),
     
+    # Message history, by message id
+    path('history/private/<int:chat_id>/', views.chat_history, {'chat_type': 'private'}, name='private_history'),
+    path('history/group/<int:chat_id>/', views.chat_history, {'chat_type': 'group'}, name='group_history'),
+    
+    # Message search
+    path('search/', views.search_chat_messages, name='search_messages'),
+    
     # Message operations
     path('send-message/', views.send_message, name='send_message'),
     path('send-image/', views.send_image, name='send_image'),
@@ -27,6 +34,7 @@ urlpatterns = [
     
     # Notifications
     path('unread-count/', views.get_unread_count, name='unread_count'),
+    path('stream/', views.event_stream, name='event_stream'),
     
     # Users
     path('get-users/', views.get_users, name='get_users'),
@@ -1,143 +1,109 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.db.models import Q
 from django.core.paginator import Paginator
 from django.utils import timezone
+import asyncio
 import json
-import requests
 import logging
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 
-from .models import PrivateChat, GroupChat, Message, MessageReaction, ChatNotification
+from .models import PrivateChat, GroupChat, Message, MessageReaction, ChatInbox
+from .inbox import chat_field, inbox_of, mark_read, unread_total, chat_counts
+from .events import hub, publish_message, publish_reaction, publish_read
+from .link_previews import fetch_preview_later, preview_fields
+from .membership import is_member
+from main.media import process_later, store_image
+from .search import history_cursor, search_messages
+from .suggestions import suggested_users
+from .history import MAX_HISTORY_PAGE_SIZE, HISTORY_PAGE_SIZE, history_entry, messages_after, messages_before
+from profile.user_directory import search_users
+from django.db import transaction
 from django.db.models import Count
+from asgiref.sync import sync_to_async
 
+# Users listed by the group creation dialog per search.
+GROUP_MEMBER_SEARCH_LIMIT = 50
 
-def get_suggested_users(user, limit=10):
-    """
-    Get suggested users for messaging based on priority:
-    1. Users with mutual interactions (commented on user's posts, upvoted, etc.)
-    2. Recently active users (posted or logged in within last 24-48 hours)
-    3. Other active users
-    
-    Excludes:
-    - The current user
-    - Users already in active chats with messages
-    - Superusers (admin accounts)
-    """
-    from datetime import timedelta
-    from qa.models import Question, Answer, CommentQ, QUpvote
-    
-    # Get users already chatted with (to exclude) - only those with actual messages
-    chatted_user_ids = set()
-    for chat in PrivateChat.objects.filter(participants=user):
-        # Only exclude if there are actual messages
-        if chat.messages.exists():
-            other_users = chat.participants.exclude(id=user.id)
-            chatted_user_ids.update(other_users.values_list('id', flat=True))
-    
-    # Time thresholds for recent activity
-    recent_24h = timezone.now() - timedelta(hours=24)
-    recent_48h = timezone.now() - timedelta(hours=48)
-    
-    # Priority 1: Users with mutual interactions
-    # Users who commented on current user's questions
-    user_questions = Question.objects.filter(post_owner=user, is_deleted=False)
-    commenters_on_my_posts = User.objects.filter(
-        commentq__question_comment__in=user_questions
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).distinct()
-    
-    # Users who upvoted current user's questions
-    upvoters_on_my_posts = User.objects.filter(
-        qupvote__upvote_question_of__in=user_questions
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).distinct()
-    
-    # Users whose posts current user has interacted with
-    my_comments = CommentQ.objects.filter(commented_by=user)
-    users_i_commented_on = User.objects.filter(
-        Q(question__commentq__in=my_comments) | Q(answer__commentq__in=my_comments)
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).distinct()
-    
-    # Combine mutual interaction users
-    mutual_interaction_users = (
-        commenters_on_my_posts | upvoters_on_my_posts | users_i_commented_on
-    ).distinct()
-    
-    # Priority 2: Recently active users (24 hours)
-    recently_active_24h = User.objects.filter(
-        Q(last_login__gte=recent_24h) |
-        Q(question__date__gte=recent_24h) |
-        Q(answer__date__gte=recent_24h)
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).distinct()
-    
-    # Priority 3: Recently active users (48 hours)
-    recently_active_48h = User.objects.filter(
-        Q(last_login__gte=recent_48h) |
-        Q(question__date__gte=recent_48h) |
-        Q(answer__date__gte=recent_48h)
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).distinct()
-    
-    # Priority 4: Other active users
-    other_active_users = User.objects.filter(
-        is_active=True
-    ).exclude(id=user.id).exclude(id__in=chatted_user_ids).exclude(is_superuser=True).order_by('-last_login')
-    
-    # Build prioritized list
-    suggested_user_ids = []
-    
-    # Add mutual interaction users first (with recent activity preference)
-    for u in mutual_interaction_users.filter(last_login__gte=recent_24h)[:3]:
-        if u.id not in suggested_user_ids:
-            suggested_user_ids.append(u.id)
-    
-    # Add more mutual interaction users
-    for u in mutual_interaction_users[:5]:
-        if u.id not in suggested_user_ids and len(suggested_user_ids) < limit:
-            suggested_user_ids.append(u.id)
-    
-    # Add recently active users (24h)
-    for u in recently_active_24h[:limit]:
-        if u.id not in suggested_user_ids and len(suggested_user_ids) < limit:
-            suggested_user_ids.append(u.id)
-    
-    # Add recently active users (48h)
-    for u in recently_active_48h[:limit]:
-        if u.id not in suggested_user_ids and len(suggested_user_ids) < limit:
-            suggested_user_ids.append(u.id)
-    
-    # Fill remaining slots with other active users
-    for u in other_active_users[:limit * 2]:
-        if u.id not in suggested_user_ids and len(suggested_user_ids) < limit:
-            suggested_user_ids.append(u.id)
-    
-    # Get user objects with profiles
-    suggested_users = User.objects.filter(
-        id__in=suggested_user_ids
-    ).select_related('profile')
-    
-    # Build result with additional metadata
-    result = []
-    for u in suggested_users:
-        # Determine activity status
-        is_very_active = u.last_login and u.last_login >= recent_24h
-        has_mutual_interaction = u.id in [mu.id for mu in mutual_interaction_users]
-        
-        result.append({
-            'id': u.id,
-            'username': u.username,
-            'full_name': u.profile.full_name if hasattr(u, 'profile') and u.profile.full_name else u.get_full_name(),
-            'photo': u.profile.profile_photo.url if hasattr(u, 'profile') and u.profile.profile_photo else None,
-            'user_type': u.profile.user_type if hasattr(u, 'profile') else 'Student',
-            'is_very_active': is_very_active,
-            'has_mutual_interaction': has_mutual_interaction,
-            'last_seen': u.last_login,
-        })
-    
-    return result
+# Chats per page of the chat list, and chats in the sidebar of a chat.
+CHAT_LIST_PAGE_SIZE = 30
+CHAT_SIDEBAR_SIZE = 30
+
+# Hits per page of the message search.
+CHAT_SEARCH_PAGE_SIZE = 20
+
+# Seconds between keepalive comments of the event stream, and how long the
+# browser waits before reconnecting a dropped one (milliseconds).
+STREAM_KEEPALIVE = 25
+STREAM_RETRY_MS = 5000
+
+
+def inbox_entry(row):
+    """What the chat list and the chat sidebar show for a ChatInbox row."""
+    if row.group_chat_id:
+        group = row.group_chat
+        return {
+            'type': 'group',
+            'id': group.id,
+            'user_id': None,
+            'group_id': group.id,
+            'name': group.name,
+            'username': None,
+            'photo': group.profile_photo.url if group.profile_photo else None,
+            'is_teacher': False,
+            'latest_message': row.preview if row.last_message_id else 'No messages yet',
+            'latest_message_time': row.last_message_at if row.last_message_id else None,
+            'last_message_time': row.last_message_at,
+            'unread_count': row.unread_count,
+        }
+
+    other_user = row.other_user
+    profile = getattr(other_user, 'profile', None)
+    # Get user's full name safely
+    if profile and profile.full_name:
+        display_name = profile.full_name
+    else:
+        display_name = other_user.get_full_name() or other_user.username
+    return {
+        'type': 'private',
+        'id': row.private_chat_id,
+        'user_id': other_user.id,  # Add other user's ID for URL
+        'group_id': None,
+        'name': display_name,
+        'username': other_user.username,
+        'photo': profile.profile_photo_thumb_url if profile and profile.profile_photo else None,
+        'is_teacher': bool(profile and profile.is_teacher),
+        'latest_message': row.preview,
+        'latest_message_time': row.last_message_at,
+        'last_message_time': row.last_message_at,
+        'unread_count': row.unread_count,
+    }
+
+
+def recent_chats_of(user, current_field, current_id):
+    """The chat sidebar, most recent first, the open chat marked as current."""
+    recent_chats = []
+    for row in inbox_of(user)[:CHAT_SIDEBAR_SIZE]:
+        entry = inbox_entry(row)
+        entry['is_current'] = getattr(row, f'{current_field}_id') == current_id
+        recent_chats.append(entry)
+    return recent_chats
+
+
+def read_chat(user, chat, chat_type):
+    """Mark the chat as read, the user's open streams drop its unread count."""
+    unread = 0
+    if hub.has_subscribers([user.id]):
+        unread = ChatInbox.objects.filter(user=user, **{chat_field(chat): chat}).values_list(
+            'unread_count', flat=True).first() or 0
+    mark_read(user, chat)
+    publish_read(user, chat_type, chat.id, unread)
 
 
 @login_required
@@ -145,69 +111,20 @@ def chat_list(request):
     """Display list of all chats (private and group)"""
     user = request.user
     
-    # Get all private chats for the user
-    private_chats = PrivateChat.objects.filter(participants=user).prefetch_related('participants')
-    
-    # Get all group chats for the user
-    group_chats = GroupChat.objects.filter(members=user)
-    
-    # Combine and sort by most recent activity
-    all_chats = []
-    
-    for chat in private_chats:
-        other_user = chat.get_other_user(user)
-        if not other_user:
-            continue  # Skip chats with no other participant
-        # Skip private chats that have no messages (chat box opened only)
-        latest_msg = chat.get_latest_message()
-        if not latest_msg:
-            continue
-        
-        # Get user's full name safely
-        if hasattr(other_user, 'profile') and other_user.profile and other_user.profile.full_name:
-            display_name = other_user.profile.full_name
-        else:
-            display_name = other_user.get_full_name() or other_user.username
-        
-        # Get profile photo safely
-        photo_url = None
-        if hasattr(other_user, 'profile') and other_user.profile and other_user.profile.profile_photo:
-            photo_url = other_user.profile.profile_photo.url
-        
-        all_chats.append({
-            'type': 'private',
-            'id': chat.id,
-            'user_id': other_user.id,  # Add other user's ID for URL
-            'name': display_name,
-            'photo': photo_url,
-            'latest_message': latest_msg.content if latest_msg else 'No messages yet',
-            'latest_message_time': latest_msg.created_at if latest_msg else None,
-            'unread_count': ChatNotification.objects.filter(user=user, message__private_chat=chat, is_read=False).count(),
-        })
-    
-    for chat in group_chats:
-        latest_msg = chat.get_latest_message()
-        all_chats.append({
-            'type': 'group',
-            'id': chat.id,
-            'name': chat.name,
-            'photo': chat.profile_photo.url if chat.profile_photo else None,
-            'latest_message': latest_msg.content if latest_msg else 'No messages yet',
-            'latest_message_time': latest_msg.created_at if latest_msg else None,
-            'unread_count': ChatNotification.objects.filter(user=user, message__group_chat=chat, is_read=False).count(),
-        })
-    
-    # Sort by latest message time
-    all_chats.sort(key=lambda x: x['latest_message_time'] or timezone.now(), reverse=True)
+    # One row per chat from the inbox, already ordered by the latest message
+    chats_page = Paginator(inbox_of(user), CHAT_LIST_PAGE_SIZE).get_page(request.GET.get('page', 1))
+    all_chats = [inbox_entry(row) for row in chats_page]
+    private_chats_count, group_chats_count = chat_counts(user)
     
     # Get suggested users for messaging (show 5-10 based on availability)
-    suggested_users = get_suggested_users(user, limit=10)
+    suggestions = suggested_users(user, limit=10)
     
     context = {
         'chats': all_chats,
-        'private_chats_count': private_chats.count(),
-        'group_chats_count': group_chats.count(),
-        'suggested_users': suggested_users,
+        'chats_page': chats_page,
+        'private_chats_count': private_chats_count,
+        'group_chats_count': group_chats_count,
+        'suggested_users': suggestions,
     }
     
     return render(request, 'chat/chat_list.html', context)
@@ -236,74 +153,25 @@ def private_chat(request, user_id):
         chat = PrivateChat.objects.create()
         chat.participants.add(user, other_user)
     
-    # Get chat messages
-    chat_messages = chat.messages.all()
-    
-    # Mark notifications as read
-    ChatNotification.objects.filter(user=user, message__private_chat=chat).update(is_read=True)
+    # The newest messages, older ones are fetched while scrolling back
+    history = messages_before(chat)
     
-    # Paginate messages
-    paginator = Paginator(chat_messages, 50)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Mark the chat as read
+    read_chat(user, chat, 'private')
     
     # Get recent chats for sidebar (both private and group)
-    private_chats = PrivateChat.objects.filter(participants=user).prefetch_related('participants')
-    group_chats = GroupChat.objects.filter(members=user)
-    recent_chats = []
-    
-    # Add private chats with their latest message time
-    for pc in private_chats:
-        other = pc.get_other_user(user)
-        if not other:
-            continue
-        # Only include private chats that already have messages
-        latest_msg = pc.get_latest_message()
-        if not latest_msg:
-            continue
-
-        display_name = other.get_full_name() or other.username
-        photo_url = None
-        if hasattr(other, 'profile') and other.profile and other.profile.profile_photo:
-            photo_url = other.profile.profile_photo.url
-        
-        recent_chats.append({
-            'type': 'private',
-            'user_id': other.id,
-            'group_id': None,
-            'name': display_name,
-            'username': other.username,
-            'photo': photo_url,
-            'is_current': other.id == other_user.id,
-            'last_message_time': latest_msg.created_at,
-        })
-    
-    # Add group chats with their latest message time
-    for gc in group_chats:
-        latest_msg = gc.get_latest_message()
-        recent_chats.append({
-            'type': 'group',
-            'user_id': None,
-            'group_id': gc.id,
-            'name': gc.name,
-            'username': None,
-            'photo': gc.profile_photo.url if gc.profile_photo else None,
-            'is_current': False,
-            'last_message_time': latest_msg.created_at if latest_msg else gc.created_at,
-        })
-    
-    # Sort by most recent message first
-    recent_chats.sort(key=lambda x: x['last_message_time'], reverse=True)
+    recent_chats = recent_chats_of(user, 'private_chat', chat.id)
     
     # Get other user's photo
     other_photo = None
     if hasattr(other_user, 'profile') and other_user.profile and other_user.profile.profile_photo:
-        other_photo = other_user.profile.profile_photo.url
+        other_photo = other_user.profile.profile_photo_thumb_url
     
     context = {
         'chat': chat,
         'other_user': other_user,
-        'messages': page_obj,
+        'messages': history.messages,
+        'has_older_messages': history.has_more,
         'chat_type': 'private',
         'recent_chats': recent_chats,
         'chat_name': other_user.get_full_name() or other_user.username,
@@ -326,72 +194,23 @@ def group_chat(request, group_id):
         messages.error(request, f"Group chat with ID {group_id} does not exist or has been deleted.")
         return redirect('chat:chat_list')
     
-    if user not in group.members.all():
+    if not is_member(user, group):
         messages.error(request, "You are not a member of this group.")
         return redirect('chat:chat_list')
     
-    # Get chat messages
-    chat_messages = group.messages.all()
+    # The newest messages, older ones are fetched while scrolling back
+    history = messages_before(group)
     
-    # Mark notifications as read
-    ChatNotification.objects.filter(user=user, message__group_chat=group).update(is_read=True)
-    
-    # Paginate messages
-    paginator = Paginator(chat_messages, 50)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Mark the chat as read
+    read_chat(user, group, 'group')
     
     # Get recent chats for sidebar (both private and group)
-    private_chats = PrivateChat.objects.filter(participants=user).prefetch_related('participants')
-    group_chats = GroupChat.objects.filter(members=user)
-    recent_chats = []
-    
-    # Add private chats with their latest message time
-    for pc in private_chats:
-        other = pc.get_other_user(user)
-        if not other:
-            continue
-        # Only include private chats that already have messages
-        latest_msg = pc.get_latest_message()
-        if not latest_msg:
-            continue
-
-        display_name = other.get_full_name() or other.username
-        photo_url = None
-        if hasattr(other, 'profile') and other.profile and other.profile.profile_photo:
-            photo_url = other.profile.profile_photo.url
-        
-        recent_chats.append({
-            'type': 'private',
-            'user_id': other.id,
-            'group_id': None,
-            'name': display_name,
-            'username': other.username,
-            'photo': photo_url,
-            'is_current': False,
-            'last_message_time': latest_msg.created_at,
-        })
-    
-    # Add group chats with their latest message time
-    for gc in group_chats:
-        latest_msg = gc.get_latest_message()
-        recent_chats.append({
-            'type': 'group',
-            'user_id': None,
-            'group_id': gc.id,
-            'name': gc.name,
-            'username': None,
-            'photo': gc.profile_photo.url if gc.profile_photo else None,
-            'is_current': gc.id == group_id,  # Mark current group
-            'last_message_time': latest_msg.created_at if latest_msg else gc.created_at,
-        })
-    
-    # Sort by most recent message first
-    recent_chats.sort(key=lambda x: x['last_message_time'], reverse=True)
+    recent_chats = recent_chats_of(user, 'group_chat', group.id)
     
     context = {
         'group': group,
-        'messages': page_obj,
+        'messages': history.messages,
+        'has_older_messages': history.has_more,
         'chat_type': 'group',
         'members': group.members.all(),
         'recent_chats': recent_chats,
@@ -402,6 +221,63 @@ def group_chat(request, group_id):
     return render(request, 'chat/private_chat.html', context)
 
 
+@login_required
+@require_http_methods(["GET"])
+def chat_history(request, chat_type, chat_id):
+    """Messages of a chat after ?after=<id> or before ?before=<id>, ?limit= at a time"""
+    chat = get_object_or_404(PrivateChat if chat_type == 'private' else GroupChat, id=chat_id)
+    if not is_member(request.user, chat):
+        return JsonResponse({'error': 'Unauthorized'}, status=403)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', HISTORY_PAGE_SIZE)), 1), MAX_HISTORY_PAGE_SIZE)
+        after = request.GET.get('after')
+        before = request.GET.get('before')
+        if after is not None:
+            page = messages_after(chat, int(after), limit)
+        else:
+            page = messages_before(chat, int(before) if before is not None else None, limit)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid message id or limit'}, status=400)
+
+    return JsonResponse({
+        'messages': [history_entry(message, request.user) for message in page.messages],
+        'has_more': page.has_more,
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def search_chat_messages(request):
+    """Messages of the user's chats matching ?q=, best first, ?offset= and ?limit= to page"""
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+        limit = min(max(int(request.GET.get('limit', CHAT_SEARCH_PAGE_SIZE)), 1), CHAT_SEARCH_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid offset or limit'}, status=400)
+
+    hits, has_more = search_messages(request.user, request.GET.get('q', ''), offset=offset, limit=limit)
+    messages_by_id = Message.objects.select_related('sender').in_bulk([hit.message_id for hit in hits])
+    results = []
+    for hit in hits:
+        message = messages_by_id.get(hit.message_id)
+        if message is None:
+            continue
+        history = reverse(f'chat:{hit.chat_type}_history', args=[hit.chat_id])
+        results.append({
+            'message_id': hit.message_id,
+            'chat_type': hit.chat_type,
+            'chat_id': hit.chat_id,
+            'sender': message.sender.username,
+            'created_at': message.created_at.isoformat(),
+            'snippet': str(hit.snippet),
+            'score': hit.score,
+            # The history page ending with the message, to jump to it
+            'history_url': f'{history}?before={history_cursor(hit)}',
+        })
+    return JsonResponse({'results': results, 'has_more': has_more})
+
+
 @login_required
 @require_http_methods(["POST"])
 def send_message(request):
@@ -415,29 +291,33 @@ def send_message(request):
             chat_id = data.get('chat_id')
             chat = get_object_or_404(PrivateChat, id=chat_id)
             
-            if request.user not in chat.participants.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                private_chat=chat,
-                message_type='text',
-                content=content
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    private_chat=chat,
+                    message_type='text',
+                    content=content
+                )
+                publish_message(message)
         
         elif chat_type == 'group':
             chat_id = data.get('chat_id')
             chat = get_object_or_404(GroupChat, id=chat_id)
             
-            if request.user not in chat.members.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                group_chat=chat,
-                message_type='text',
-                content=content
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    group_chat=chat,
+                    message_type='text',
+                    content=content
+                )
+                publish_message(message)
         
         else:
             return JsonResponse({'error': 'Invalid chat type'}, status=400)
@@ -469,31 +349,41 @@ def send_image(request):
             chat_id = request.POST.get('chat_id')
             chat = get_object_or_404(PrivateChat, id=chat_id)
             
-            if request.user not in chat.participants.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                private_chat=chat,
-                message_type='image',
-                image=image,
-                content='Sent an image'
-            )
+            # Outside the transaction, decoding a photo takes a while
+            image_name = store_image(image, 'chat_images')
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    private_chat=chat,
+                    message_type='image',
+                    image=image_name,
+                    content='Sent an image'
+                )
+                process_later(message, 'image')
+                publish_message(message)
         
         elif chat_type == 'group':
             chat_id = request.POST.get('chat_id')
             chat = get_object_or_404(GroupChat, id=chat_id)
             
-            if request.user not in chat.members.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                group_chat=chat,
-                message_type='image',
-                image=image,
-                content='Sent an image'
-            )
+            # Outside the transaction, decoding a photo takes a while
+            image_name = store_image(image, 'chat_images')
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    group_chat=chat,
+                    message_type='image',
+                    image=image_name,
+                    content='Sent an image'
+                )
+                process_later(message, 'image')
+                publish_message(message)
         
         else:
             return JsonResponse({'error': 'Invalid chat type'}, status=400)
@@ -525,31 +415,35 @@ def send_file(request):
             chat_id = request.POST.get('chat_id')
             chat = get_object_or_404(PrivateChat, id=chat_id)
             
-            if request.user not in chat.participants.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                private_chat=chat,
-                message_type='file',
-                file=file,
-                content=f'Sent a file: {file.name}'
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    private_chat=chat,
+                    message_type='file',
+                    file=file,
+                    content=f'Sent a file: {file.name}'
+                )
+                publish_message(message)
         
         elif chat_type == 'group':
             chat_id = request.POST.get('chat_id')
             chat = get_object_or_404(GroupChat, id=chat_id)
             
-            if request.user not in chat.members.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                group_chat=chat,
-                message_type='file',
-                file=file,
-                content=f'Sent a file: {file.name}'
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    group_chat=chat,
+                    message_type='file',
+                    file=file,
+                    content=f'Sent a file: {file.name}'
+                )
+                publish_message(message)
         
         else:
             return JsonResponse({'error': 'Invalid chat type'}, status=400)
@@ -579,61 +473,44 @@ def send_link(request):
         if not link_url:
             return JsonResponse({'error': 'No URL provided'}, status=400)
         
-        # Fetch link metadata
-        try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            response = requests.get(link_url, headers=headers, timeout=5)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            link_title = soup.find('meta', property='og:title')
-            link_title = link_title['content'] if link_title else soup.title.string if soup.title else link_url
-            
-            link_description = soup.find('meta', property='og:description')
-            link_description = link_description['content'] if link_description else ''
-            
-            link_image = soup.find('meta', property='og:image')
-            link_image = link_image['content'] if link_image else None
-        
-        except:
-            link_title = link_url
-            link_description = ''
-            link_image = None
+        # The cached preview, or the URL alone until it is fetched
+        link_fields = preview_fields(link_url)
         
         if chat_type == 'private':
             chat_id = data.get('chat_id')
             chat = get_object_or_404(PrivateChat, id=chat_id)
             
-            if request.user not in chat.participants.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                private_chat=chat,
-                message_type='link',
-                link_url=link_url,
-                link_title=link_title,
-                link_description=link_description,
-                link_image=link_image,
-                content=link_url
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    private_chat=chat,
+                    message_type='link',
+                    content=link_url,
+                    **link_fields
+                )
+                publish_message(message)
+                fetch_preview_later(message)
         
         elif chat_type == 'group':
             chat_id = data.get('chat_id')
             chat = get_object_or_404(GroupChat, id=chat_id)
             
-            if request.user not in chat.members.all():
+            if not is_member(request.user, chat):
                 return JsonResponse({'error': 'Unauthorized'}, status=403)
             
-            message = Message.objects.create(
-                sender=request.user,
-                group_chat=chat,
-                message_type='link',
-                link_url=link_url,
-                link_title=link_title,
-                link_description=link_description,
-                link_image=link_image,
-                content=link_url
-            )
+            with transaction.atomic():
+                message = Message.objects.create(
+                    sender=request.user,
+                    group_chat=chat,
+                    message_type='link',
+                    content=link_url,
+                    **link_fields
+                )
+                publish_message(message)
+                fetch_preview_later(message)
         
         else:
             return JsonResponse({'error': 'Invalid chat type'}, status=400)
@@ -740,7 +617,7 @@ def add_group_member(request, group_id):
     try:
         group = get_object_or_404(GroupChat, id=group_id)
         
-        if request.user != group.creator and request.user not in group.members.all():
+        if request.user != group.creator and not is_member(request.user, group):
             return JsonResponse({'error': 'Unauthorized'}, status=403)
         
         data = json.loads(request.body)
@@ -828,10 +705,10 @@ def react_to_message(request, message_id):
         reaction = data.get('reaction')
         
         # Check if user has access to this message
-        if message.private_chat and request.user not in message.private_chat.participants.all():
+        if message.private_chat and not is_member(request.user, message.private_chat):
             return JsonResponse({'error': 'Unauthorized'}, status=403)
         
-        if message.group_chat and request.user not in message.group_chat.members.all():
+        if message.group_chat and not is_member(request.user, message.group_chat):
             return JsonResponse({'error': 'Unauthorized'}, status=403)
         
         # Create or delete reaction
@@ -843,20 +720,59 @@ def react_to_message(request, message_id):
         
         if not created:
             reaction_obj.delete()
+            publish_reaction(message, request.user, reaction, 'removed')
             return JsonResponse({'success': True, 'action': 'removed'})
         
+        publish_reaction(message, request.user, reaction, 'added')
         return JsonResponse({'success': True, 'action': 'added'})
     
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
 
+def sse(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+@login_required
+@require_http_methods(["GET"])
+async def event_stream(request):
+    """Server-Sent Events of the user's chats, see chat/events.py"""
+    if not isinstance(request, ASGIRequest):
+        # The hub lives in the ASGI process only, the page keeps polling.
+        return HttpResponse(status=204)
+    user = await request.auser()
+
+    async def events():
+        subscription = hub.subscribe(user.id)
+        try:
+            # Counted once subscribed, so no message falls in between.
+            unread = await sync_to_async(unread_total)(user)
+            yield f'retry: {STREAM_RETRY_MS}\n\n'
+            yield sse('unread', {'total': unread})
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                yield sse(event['event'], event['data'])
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @require_http_methods(["GET"])
 def get_unread_count(request):
     """Get count of unread messages"""
     try:
-        unread_count = ChatNotification.objects.filter(user=request.user, is_read=False).count()
+        unread_count = unread_total(request.user)
         return JsonResponse({'unread_count': unread_count})
     except Exception as e:
         # Return 0 if there's a database lock or other error
@@ -868,21 +784,15 @@ def get_unread_count(request):
 @login_required
 @require_http_methods(["GET"])
 def get_users(request):
-    """Get list of all users except current user for group creation"""
+    """Users matching ?q= (all users without it) except current user for group creation"""
     try:
-        users = User.objects.exclude(id=request.user.id).values('id', 'username')
+        users = search_users(request.GET.get('q', ''), limit=GROUP_MEMBER_SEARCH_LIMIT, exclude_ids=[request.user.id])
         users_list = []
         for user in users:
-            try:
-                profile = user.profile if hasattr(user, 'profile') else None
-                full_name = profile.full_name if profile else None
-            except:
-                full_name = None
-            
             users_list.append({
-                'id': user['id'],
-                'username': user['username'],
-                'full_name': full_name or user['username']
+                'id': user.id,
+                'username': user.username,
+                'full_name': user.full_name or user.username
             })
         
         return JsonResponse({'users': users_list})
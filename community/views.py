@@ -11,6 +11,7 @@ from .models import Community, CommunityMember, CommunityJoinRequest
 from qa.models import Question
 from .forms import CommunityForm
 from notification.models import Notification
+from notification.feed import notify
 
 @login_required
 def community_list(request):
@@ -208,13 +209,12 @@ def join_community(request, slug):
         )
         
         # Create notification for community creator
-        Notification.objects.create(
-            noti_receiver=community.creator,
-            noti_sender=request.user,
-            type_of_noti='community_join_request',
-            url=f'/community/{community.slug}/join-requests/',
+        notify(
+            community.creator,
+            'community_join_request',
+            f'/community/{community.slug}/join-requests/',
+            sender=request.user,
             extra_data=community.name,
-            is_read=False
         )
         
         # Also notify admins (if any)
@@ -225,13 +225,12 @@ def join_community(request, slug):
         ).exclude(user=community.creator)
         
         for admin_member in admins:
-            Notification.objects.create(
-                noti_receiver=admin_member.user,
-                noti_sender=request.user,
-                type_of_noti='community_join_request',
-                url=f'/community/{community.slug}/join-requests/',
+            notify(
+                admin_member.user,
+                'community_join_request',
+                f'/community/{community.slug}/join-requests/',
+                sender=request.user,
                 extra_data=community.name,
-                is_read=False
             )
         
         return JsonResponse({
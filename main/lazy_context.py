@@ -0,0 +1,118 @@
+"""
+Lazy context processors.
+
+A context processor decorated with @lazy_context(...) no longer runs when a
+template is rendered. Instead every key it provides is handed to the template
+as a lazy value, the processor runs (once per request) the first time a
+template actually reads one of them. Templates which never use the values,
+ajax partials, error pages and so on, cost no queries at all.
+
+    @lazy_context('notifications', 'countUnreadNotifications')
+    def notificationViewer(request):
+        ...
+        return {'notifications': ..., 'countUnreadNotifications': ...}
+
+LazyContextReportMiddleware logs which processors were evaluated for each
+request and how many queries they ran. With DEBUG on the same report is
+sent back in the X-Lazy-Context-* response headers.
+"""
+import logging
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.utils.functional import SimpleLazyObject
+
+logger = logging.getLogger(__name__)
+
+
+class LazyContextReport:
+    """Which lazy context processors a request registered and evaluated."""
+
+    def __init__(self):
+        self.registered = []
+        self.evaluated = {}
+        self.results = {}
+
+    def register(self, name):
+        if name not in self.registered:
+            self.registered.append(name)
+
+    @property
+    def skipped(self):
+        return [name for name in self.registered if name not in self.evaluated]
+
+    def evaluate(self, name, processor, request):
+        """Run the processor the first time one of its values is read."""
+        if name not in self.results:
+            queries = [0]
+
+            def count_queries(execute, sql, params, many, context):
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            started = time.monotonic()
+            with connection.execute_wrapper(count_queries):
+                self.results[name] = processor(request)
+            self.evaluated[name] = {
+                'queries': queries[0],
+                'ms': round((time.monotonic() - started) * 1000, 2),
+            }
+        return self.results[name]
+
+    def summary(self):
+        evaluated = ', '.join(
+            f"{name} ({stats['queries']} queries, {stats['ms']} ms)"
+            for name, stats in self.evaluated.items())
+        return f"evaluated {len(self.evaluated)}/{len(self.registered)}: {evaluated or '-'}"
+
+
+def get_report(request):
+    report = getattr(request, '_lazy_context_report', None)
+    if report is None:
+        report = LazyContextReport()
+        request._lazy_context_report = report
+    return report
+
+
+def lazy_context(*keys):
+    """
+    Make a context processor lazy. keys are the context names the processor
+    returns, they have to be known before the processor runs.
+    """
+    def decorator(processor):
+        name = f'{processor.__module__}.{processor.__name__}'
+
+        @wraps(processor)
+        def wrapper(request):
+            report = get_report(request)
+            report.register(name)
+
+            def resolve(key):
+                return lambda: report.evaluate(name, processor, request)[key]
+
+            return {key: SimpleLazyObject(resolve(key)) for key in keys}
+
+        wrapper.lazy_keys = keys
+        return wrapper
+
+    return decorator
+
+
+class LazyContextReportMiddleware:
+    """Report which lazy context processors a request actually evaluated."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        report = getattr(request, '_lazy_context_report', None)
+        if report is not None and report.registered:
+            logger.debug('%s %s - lazy context %s', request.method, request.path, report.summary())
+            if settings.DEBUG:
+                response['X-Lazy-Context-Evaluated'] = ','.join(
+                    f"{name}:{stats['queries']}" for name, stats in report.evaluated.items())
+                response['X-Lazy-Context-Skipped'] = ','.join(report.skipped)
+        return response
@@ -0,0 +1,184 @@
+"""
+Upload pipeline for images: chat images, profile photos and the images of
+question and answer bodies (martor).
+
+store_image() saves an upload under the sha256 of its content, so the same
+file uploaded again is stored once, and re-encodes it without its metadata
+(EXIF, GPS position, camera, comments) after applying the EXIF rotation:
+
+    name = store_image(request.FILES['image'], 'chat_images')   # chat_images/3f/3fa4….jpg
+
+Smaller WebP renditions (VARIANTS, by longest side) are made in a pool of
+background threads once the owning row is saved, and their names are
+written to a JSON field next to the image field, '<field>_variants':
+
+    message.image = name
+    message.save()
+    process_later(message, 'image')      # fills message.image_variants
+
+rendition_url() gives the URL of the smallest rendition at least as large
+as asked for, the original until the renditions exist. The process_media
+command makes the missing renditions of the images uploaded before.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels, smallest first.
+VARIANTS = {'thumb': 160, 'medium': 640, 'large': 1280}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 88
+# Image processing is CPU bound, keep it from starving the request threads.
+MAX_WORKERS = 2
+
+SAVE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class NotAnImage(ValueError):
+    pass
+
+
+def content_name(folder, data, extension):
+    digest = hashlib.sha256(data).hexdigest()
+    return f'{folder}/{digest[:2]}/{digest}.{extension}'
+
+
+def _open(data):
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise NotAnImage(f'The file is not a valid image: {e}')
+    if image.format not in SAVE_FORMATS:
+        raise NotAnImage(f'{image.format} images are not accepted')
+    return image
+
+
+def strip_metadata(data):
+    """(bytes of the image re-encoded without metadata, extension)."""
+    image = _open(data)
+    image_format = image.format
+    if getattr(image, 'n_frames', 1) > 1:
+        # Animations are kept as they are, re-encoding frames loses them.
+        return data, SAVE_FORMATS[image_format]
+    image = ImageOps.exif_transpose(image)
+    output = io.BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(output, 'WEBP', quality=WEBP_QUALITY)
+    else:
+        image.save(output, image_format, optimize=True)
+    return output.getvalue(), SAVE_FORMATS[image_format]
+
+
+def store_file(upload, folder):
+    """Save an upload under the hash of its content, once. Returns its storage name."""
+    data = upload.read()
+    extension = os.path.splitext(upload.name)[1].lstrip('.').lower() or 'bin'
+    name = content_name(folder, data, extension)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
+
+
+def store_image(upload, folder):
+    """Save an image upload without its metadata, once per content. Raises NotAnImage."""
+    data = upload.read()
+    # Named after what was uploaded: the same upload is recognised before decoding it.
+    image = _open(data)
+    name = content_name(folder, data, SAVE_FORMATS[image.format])
+    if not default_storage.exists(name):
+        cleaned, extension = strip_metadata(data)
+        name = default_storage.save(name, ContentFile(cleaned))
+    return name
+
+
+def variant_name(name, variant):
+    return f'{os.path.splitext(name)[0]}.{variant}.webp'
+
+
+def make_variants(name):
+    """Create the missing renditions of a stored image, {variant: storage name}."""
+    with default_storage.open(name) as stored:
+        image = _open(stored.read())
+    if getattr(image, 'n_frames', 1) > 1:
+        return {}
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'P') else 'RGB')
+
+    variants = {}
+    for variant, size in VARIANTS.items():
+        if max(image.size) <= size:
+            # The original is already this small, larger renditions would be the same.
+            break
+        target = variant_name(name, variant)
+        if not default_storage.exists(target):
+            resized = image.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            output = io.BytesIO()
+            resized.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+            target = default_storage.save(target, ContentFile(output.getvalue()))
+        variants[variant] = target
+    return variants
+
+
+def rendition_url(field_file, variants, variant):
+    """URL of the smallest rendition at least as large as `variant`, else of the original."""
+    if not field_file:
+        return ''
+    sizes = list(VARIANTS)
+    for name in sizes[sizes.index(variant):]:
+        if name in (variants or {}):
+            return default_storage.url(variants[name])
+    return field_file.url
+
+
+def process_image(model, pk, field):
+    """Make the renditions of a row's image and record them on the row."""
+    instance = model.objects.filter(pk=pk).only(field).first()
+    if instance is None or not getattr(instance, field):
+        return {}
+    name = getattr(instance, field).name
+    variants = make_variants(name)
+    # Only if the image wasn't replaced meanwhile.
+    model.objects.filter(pk=pk, **{field: name}).update(**{f'{field}_variants': variants})
+    return variants
+
+
+_lock = threading.Lock()
+_executor = None
+
+
+def _pool():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(MAX_WORKERS, thread_name_prefix='media')
+        return _executor
+
+
+def _process_in_background(model, pk, field):
+    try:
+        process_image(model, pk, field)
+    except Exception:
+        logger.exception(f'Renditions of {model.__name__} {pk} {field} failed')
+    finally:
+        close_old_connections()
+
+
+def process_later(instance, field):
+    """Make the renditions of the instance's image in the background, once the transaction commits."""
+    model, pk = type(instance), instance.pk
+    transaction.on_commit(lambda: _pool().submit(_process_in_background, model, pk, field))
@@ -76,6 +76,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'online_users.middleware.OnlineNowMiddleware',
+    'main.lazy_context.LazyContextReportMiddleware',
     # 'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -94,24 +95,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'review.context_processors.reviewAnswer_cp',
-                'review.context_processors.returnTrue',
-                'review.context_processors.reviewQuestion_cp',
-                'review.context_processors.returnTrue_or_False',
-                'review.context_processors.reviewLateAnswer_cp',
-                'review.context_processors.returnLateReview_True_or_False',
-                'review.context_processors.reviewClosedQuestions',
-                'review.context_processors.returnTrue_or_FalseClosedQuestions',
-                'review.context_processors.reviewReOpenQuestion_sVotes',
-                'review.context_processors.returnTrue_or_FalseUnCloseQuestion_s',
-                'review.context_processors.reviewEditedPosts',
-                'review.context_processors.returnTrue_or_FalseEditPosts',
-                'review.context_processors.reviewLowQualityPosts',
-                'review.context_processors.returnTrue_or_FalseLowPosts',
-                'review.context_processors.reviewFlagPosts',
-                'review.context_processors.returnTrue_or_FalseFlagPosts',
-                'review.context_processors.reviewFlagComments',
-                'review.context_processors.returnTrue_or_FalseFlagComments',
+                'review.context_processors.review_queues',
                 'notification.context_processors.privNotificationViewer',
                 'notification.context_processors.notificationViewer',
                 'profile.context_processors.top_questions',
@@ -184,6 +168,14 @@ CACHES = {
 }
 CACHE_TTL = 60 * 15
 
+# Seconds a user's review inbox (review.queues) is served from cache.
+REVIEW_QUEUES_CACHE_TTL = 30
+
+# Question views (qa.view_tracking) are buffered per process and written once
+# the buffer holds VIEW_BUFFER_SIZE views or after VIEW_BUFFER_FLUSH_INTERVAL seconds.
+VIEW_BUFFER_SIZE = 200
+VIEW_BUFFER_FLUSH_INTERVAL = 10
+
 # Internationalization
 
 LANGUAGE_CODE = 'en-us'
@@ -224,6 +216,38 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Old chat messages moved out of the database (chat/archive.py). Not served
+# like MEDIA_ROOT, the history endpoints read it.
+CHAT_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'chat_archive')
+# Messages older than this many days are archived by archive_chat_messages.
+CHAT_ARCHIVE_AFTER_DAYS = 180
+
+# Ages in days after which the prune_notifications command deletes read
+# notifications, compacts unread ones and archives the rest, see
+# notification/retention.py.
+NOTIFICATION_RETENTION = {
+    'delete_read_after_days': 90,
+    'compact_unread_after_days': 30,
+    'archive_after_days': 365,
+}
+
+# Notification emails of the users who opted in are queued and sent as one
+# digest per user at most every this many minutes, by send_email_digests
+# (notification/emails.py).
+NOTIFICATION_EMAIL_DIGEST_MINUTES = 30
+
+# Outgoing email, from the environment. Without EMAIL_HOST the emails are
+# printed to the console instead (development).
+EMAIL_HOST = os.environ.get('EMAIL_HOST', '')
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND',
+    'django.core.mail.backends.smtp.EmailBackend' if EMAIL_HOST else 'django.core.mail.backends.console.EmailBackend')
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
+EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+
 # Heroku setting
 # Serving the statics through Whitenoise in Heroku
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
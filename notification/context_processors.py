@@ -2,11 +2,22 @@ from django.shortcuts import render
 from .models import PrivRepNotification,Notification
 from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
 from django.db.models import Count,BooleanField, ExpressionWrapper, Q,Exists, OuterRef,Avg, Min,Max, Sum,F, IntegerField, FloatField,Case, Value, When
+from main.lazy_context import lazy_context
+from .counters import unread_counts
+from .feed import recent_notifications
 
+def _counter(request):
+	# Both processors read it, look it up once per request.
+	if not hasattr(request, '_notification_counter'):
+		request._notification_counter = unread_counts(request.user)
+	return request._notification_counter
+
+@lazy_context('notifications', 'hasMoreNotifications', 'countUnreadNotifications', 'showAlert')
 def notificationViewer(request):
 	if request.user.is_authenticated:
-		notifications = Notification.objects.filter(noti_receiver=request.user).order_by('-date_created')
-		countUnreadNotifications = Notification.objects.filter(noti_receiver=request.user, is_read=False).count()
+		# The most recent ones only, older ones are loaded from notification:feed.
+		notifications, hasMoreNotifications = recent_notifications(request.user)
+		countUnreadNotifications = _counter(request).unread
 		if countUnreadNotifications >= 1:
 			showAlert = True
 		else:
@@ -14,22 +25,26 @@ def notificationViewer(request):
 
 	else:
 		notifications = ''
+		hasMoreNotifications = False
 		countUnreadNotifications = ''
 		showAlert = False
 
 
 	return {
 		'notifications':notifications,
+		'hasMoreNotifications':hasMoreNotifications,
 		'countUnreadNotifications':countUnreadNotifications,
 		'showAlert':showAlert,
 	}
 
+@lazy_context('privNotifications', 'countUnreadPrivNotifications', 'countUnreadPrivNotifications_1')
 def privNotificationViewer(request):
 	if request.user.is_authenticated:
 		privNotifications = PrivRepNotification.objects.filter(for_user=request.user).order_by('-date_created_PrivNotify')
-		countUnreadPrivNotifications_1 = PrivRepNotification.objects.filter(
-											for_user=request.user, is_read=False).count()
-		countUnreadPrivNotifications = PrivRepNotification.objects.filter(for_user=request.user, is_read=False).aggregate(countTheUnRead_Rep=Sum('missingReputation'))
+		# Both from the user's NotificationCounter, see notification/counters.py.
+		counter = _counter(request)
+		countUnreadPrivNotifications_1 = counter.priv_unread
+		countUnreadPrivNotifications = {'countTheUnRead_Rep': counter.priv_unread_reputation}
 		# if countUnreadPrivNotifications >= 1:
 		# 	showPrivAlert = True
 		# else:
@@ -0,0 +1,115 @@
+"""
+Unread notification counters.
+
+NotificationCounter holds per user the number of unread Notification rows,
+of unread PrivRepNotification rows and the sum of their missingReputation,
+which is what the header shows on every page:
+
+    counter = unread_counts(request.user)   # one primary key lookup
+
+The counters move with a single UPDATE ... SET x = x + 1 when a
+notification is created, read or deleted (notification/signals.py).
+bulk_create() and update() send no signals: call notifications_created()
+after bulk creating, and mark notifications read with mark_all_read() and
+mark_all_priv_read(), which update only the unread rows, once.
+
+recompute_notification_counters() rebuilds every counter from the
+notification tables, it is used by the repair_notification_counters
+command.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .feed import invalidate_feed
+from .models import Notification, NotificationCounter, PrivRepNotification
+
+
+def _counted(user_id):
+    unread = Notification.objects.filter(noti_receiver_id=user_id, is_read=False).count()
+    priv = PrivRepNotification.objects.filter(for_user_id=user_id, is_read=False).aggregate(
+        count=Count('pk'), reputation=Sum('missingReputation'))
+    return {'unread': unread, 'priv_unread': priv['count'], 'priv_unread_reputation': priv['reputation'] or 0}
+
+
+def unread_counts(user):
+    """The NotificationCounter of the user, counted the first time."""
+    counter = NotificationCounter.objects.filter(user_id=user.pk).first()
+    if counter is None:
+        counter, created = NotificationCounter.objects.get_or_create(
+            user_id=user.pk, defaults=_counted(user.pk))
+    return counter
+
+
+def bump_notification_counters(user_id, **deltas):
+    """bump_notification_counters(user.id, priv_unread=1, priv_unread_reputation=10)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if user_id is None or not deltas:
+        return
+    # Without a counter row there is nothing to adjust, unread_counts() counts the rows when it's needed.
+    NotificationCounter.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def priv_unread_of(is_read, missing_reputation):
+    """What a PrivRepNotification adds to (priv_unread, priv_unread_reputation)."""
+    return (0, 0) if is_read else (1, missing_reputation or 0)
+
+
+def notifications_created(notifications):
+    """Count in notifications created without signals (bulk_create)."""
+    deltas = {}
+    for notification in notifications:
+        if isinstance(notification, PrivRepNotification):
+            count, reputation = priv_unread_of(notification.is_read, notification.missingReputation)
+            user_deltas = deltas.setdefault(notification.for_user_id, {})
+            user_deltas['priv_unread'] = user_deltas.get('priv_unread', 0) + count
+            user_deltas['priv_unread_reputation'] = user_deltas.get('priv_unread_reputation', 0) + reputation
+        elif not notification.is_read:
+            user_deltas = deltas.setdefault(notification.noti_receiver_id, {})
+            user_deltas['unread'] = user_deltas.get('unread', 0) + 1
+    for user_id, user_deltas in deltas.items():
+        bump_notification_counters(user_id, **user_deltas)
+
+
+def mark_all_read(user):
+    """Mark the user's unread notifications read. Returns how many were."""
+    with transaction.atomic():
+        updated = Notification.objects.filter(noti_receiver=user, is_read=False).update(is_read=True)
+        bump_notification_counters(user.pk, unread=-updated)
+        if updated:
+            invalidate_feed(user.pk)
+    return updated
+
+
+def mark_all_priv_read(user):
+    """Mark the user's unread reputation and privilege notifications read. Returns how many were."""
+    with transaction.atomic():
+        # The rows unread now, those created meanwhile stay unread and counted.
+        seen = dict(PrivRepNotification.objects.select_for_update().filter(
+            for_user=user, is_read=False).values_list('pk', 'missingReputation'))
+        if not seen:
+            return 0
+        updated = PrivRepNotification.objects.filter(pk__in=list(seen), is_read=False).update(is_read=True)
+        if updated == len(seen):
+            bump_notification_counters(
+                user.pk, priv_unread=-updated, priv_unread_reputation=-sum(reputation or 0 for reputation in seen.values()))
+        else:
+            # Some were read meanwhile (no row locks on this database): which ones is unknown, count again.
+            NotificationCounter.objects.filter(user_id=user.pk).update(**_counted(user.pk))
+    return updated
+
+
+def recompute_notification_counters(Notification, PrivRepNotification, NotificationCounter):
+    """Recompute every counter from the notification tables. Returns the number of counters written."""
+    counters = {}
+    for user_id, unread in Notification.objects.filter(is_read=False).values_list(
+            'noti_receiver').annotate(unread=Count('pk')).order_by():
+        counters.setdefault(user_id, {})['unread'] = unread
+    for user_id, count, reputation in PrivRepNotification.objects.filter(is_read=False).values_list(
+            'for_user').annotate(count=Count('pk'), reputation=Sum('missingReputation')).order_by():
+        counters.setdefault(user_id, {}).update(priv_unread=count, priv_unread_reputation=reputation or 0)
+    with transaction.atomic():
+        NotificationCounter.objects.all().delete()
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id, **fields) for user_id, fields in counters.items()], batch_size=500)
+    return len(counters)
@@ -0,0 +1,186 @@
+"""
+Notification emails.
+
+Users with Profile.send_email_notifications get their notifications by
+email too, but never from inside a request: creating a notification only
+queues a QueuedEmail row (notification/signals.py), or directly
+
+    queue_email(user, 'Your question was closed', body, url=question_url)
+
+Notifications written without post_save queue theirs explicitly: notify()
+when it folds an event into an existing row, and award_badges() with
+queue_emails() after its bulk_create().
+
+`python manage.py send_email_digests` sends them. It claims the users who
+have an email due (DIGEST_DELAY after the first one queued) and sends each
+of them a single digest with every email pending for them. The digests of a
+batch are split among at most MAX_WORKERS threads, each sending its share
+over one SMTP connection. A digest which fails goes back to pending with
+backoff and is given up after MAX_ATTEMPTS; a runner which died leaves its
+claim to expire after LEASE, like the scheduled jobs (qa/jobs.py).
+"""
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from profile.models import Profile
+from .models import QueuedEmail
+
+logger = logging.getLogger(__name__)
+
+DIGEST_DELAY = timedelta(minutes=getattr(settings, 'NOTIFICATION_EMAIL_DIGEST_MINUTES', 30))
+# Users whose digests are sent per batch.
+BATCH_SIZE = 100
+# Threads, and so SMTP connections, sending a batch.
+MAX_WORKERS = 4
+LEASE = timedelta(minutes=10)
+MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled after each failure.
+RETRY_DELAY = timedelta(minutes=5)
+
+
+def email_of(user):
+    """The address notifications of the user go to, None if they didn't opt in."""
+    profile = getattr(user, 'profile', None)
+    if profile is None or not profile.send_email_notifications:
+        return None
+    return profile.email or user.email or None
+
+
+def queue_email(user, subject, body='', url=''):
+    """Queue an email for the next digest of the user if they want them. Returns the QueuedEmail or None."""
+    if email_of(user) is None:
+        return None
+    pending = QueuedEmail.objects.filter(user=user, status='pending').values_list('send_after', flat=True).first()
+    return QueuedEmail.objects.create(
+        user=user, subject=subject[:200], body=body, url=url or '',
+        send_after=pending or timezone.now() + DIGEST_DELAY)
+
+
+def queue_emails(emails):
+    """
+    Bulk queue_email() for [(user id, subject, body, url)], for notifications
+    created without signals (bulk_create). Returns the number queued.
+    """
+    user_ids = {user_id for user_id, subject, body, url in emails}
+    wanting = {user_id for user_id, email, user_email in Profile.objects.filter(
+        user_id__in=user_ids, send_email_notifications=True).values_list('user_id', 'email', 'user__email')
+        if email or user_email}
+    if not wanting:
+        return 0
+    # Join the digest a user already has pending: the earliest send_after wins the dict.
+    pending = dict(QueuedEmail.objects.filter(user_id__in=wanting, status='pending').order_by(
+        '-send_after').values_list('user_id', 'send_after'))
+    send_after = timezone.now() + DIGEST_DELAY
+    queued = QueuedEmail.objects.bulk_create([
+        QueuedEmail(user_id=user_id, subject=subject[:200], body=body, url=url or '',
+                    send_after=pending.get(user_id, send_after))
+        for user_id, subject, body, url in emails if user_id in wanting])
+    return len(queued)
+
+
+def claim_digests(batch_size=BATCH_SIZE, now=None):
+    """Claim the emails of up to `batch_size` users with a digest due. Returns {user id: [QueuedEmail]}."""
+    now = now or timezone.now()
+    due = QueuedEmail.objects.filter(
+        Q(status='pending') | Q(status='sending', locked_until__lt=now), send_after__lte=now)
+    user_ids = list(due.values_list('user_id', flat=True).order_by('user_id').distinct()[:batch_size])
+    if not user_ids:
+        return {}
+    token = uuid.uuid4().hex
+    # Everything pending of those users goes in their digest, due or not yet.
+    # Conditional UPDATE: of two runners claiming the same rows only one matches them.
+    QueuedEmail.objects.filter(
+        Q(status='pending') | Q(status='sending', locked_until__lt=now), user_id__in=user_ids
+    ).update(status='sending', claimed_by=token, locked_until=now + LEASE, attempts=F('attempts') + 1)
+    digests = {}
+    for email in QueuedEmail.objects.filter(claimed_by=token, status='sending').select_related(
+            'user__profile').order_by('created_at', 'pk'):
+        digests.setdefault(email.user_id, []).append(email)
+    return digests
+
+
+def digest_message(user, emails):
+    """The EmailMessage of a digest, None if the user doesn't want emails anymore."""
+    to = email_of(user)
+    if to is None:
+        return None
+    subject = emails[0].subject if len(emails) == 1 else f'{len(emails)} new notifications'
+    body = render_to_string('notification/email_digest.txt', {'user': user, 'emails': emails})
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [to])
+
+
+def _send_share(messages):
+    """Send (key, message) pairs over one connection. Returns {key: error or None}. No database access here."""
+    results = {}
+    try:
+        with get_connection() as connection:
+            for key, message in messages:
+                message.connection = connection
+                try:
+                    message.send()
+                    results[key] = None
+                except Exception as e:
+                    logger.info(f'Notification digest to {message.to} failed: {e}')
+                    results[key] = e
+    except Exception as e:
+        # Opening or closing the connection failed: what wasn't sent yet failed with it.
+        logger.info(f'Notification email connection failed: {e}')
+        for key, message in messages:
+            results.setdefault(key, e)
+    return results
+
+
+def send_messages(messages, max_workers=MAX_WORKERS):
+    """Send {key: EmailMessage} on at most `max_workers` connections at once. Returns {key: error or None}."""
+    items = list(messages.items())
+    if not items:
+        return {}
+    workers = min(max_workers, len(items))
+    shares = [items[i::workers] for i in range(workers)]
+    if workers == 1:
+        return _send_share(shares[0])
+    results = {}
+    with ThreadPoolExecutor(workers, thread_name_prefix='notification-email') as executor:
+        for share_results in executor.map(_send_share, shares):
+            results.update(share_results)
+    return results
+
+
+def _finish(emails, error):
+    claimed = QueuedEmail.objects.filter(pk__in=[email.pk for email in emails], claimed_by=emails[0].claimed_by)
+    now = timezone.now()
+    if error is None:
+        claimed.update(status='sent', sent_at=now, locked_until=None, last_error='')
+        return
+    claimed.filter(attempts__gte=MAX_ATTEMPTS).update(status='failed', locked_until=None, last_error=str(error))
+    retried = [email.attempts for email in emails if email.attempts < MAX_ATTEMPTS]
+    if retried:
+        claimed.filter(attempts__lt=MAX_ATTEMPTS).update(
+            status='pending', locked_until=None, last_error=str(error),
+            send_after=now + RETRY_DELAY * 2 ** (max(retried) - 1))
+
+
+def send_digests(batch_size=BATCH_SIZE, max_workers=MAX_WORKERS):
+    """Claim and send one batch of digests. Returns (sent, failed)."""
+    digests = claim_digests(batch_size)
+    messages = {}
+    for user_id, emails in digests.items():
+        message = digest_message(emails[0].user, emails)
+        if message is None:
+            # Opted out since: drop what was queued.
+            QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).delete()
+        else:
+            messages[user_id] = message
+    results = send_messages(messages, max_workers)
+    for user_id, error in results.items():
+        _finish(digests[user_id], error)
+    failed = sum(error is not None for error in results.values())
+    return len(results) - failed, failed
@@ -0,0 +1,164 @@
+"""
+Notification pipeline and the inbox dropdown feed.
+
+Notifications are created through notify(), which folds repeated events
+into the receiver's unread notification of the same type and target made
+within COALESCE_WINDOW instead of adding rows:
+
+    notify(question.post_owner, 'NEW_ANSWER', url, question=question, answer=answer)
+
+A second answer to the question makes it "2 New Answers to the Question"
+(Notification.count), the same answer notified again changes nothing.
+Types which aren't coalesced (COALESCED) are only deduplicated: an event
+identical to an unread one of the window is dropped.
+
+The dropdown shows the DROPDOWN_SIZE most recent notifications of the
+user, cached per user until one of them changes (notification/signals.py);
+older ones are fetched by the "load more" endpoint page by page:
+
+    notifications, has_more = recent_notifications(request.user)
+    page, has_more = notifications_before(request.user, before_id=notifications[-1].id)
+"""
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .emails import queue_email
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW = timedelta(hours=12)
+DROPDOWN_SIZE = 20
+FEED_PAGE_SIZE = 20
+FEED_TTL = 60 * 60
+
+# type: (field of the target notifications are coalesced on, field telling
+# two events apart or None if every call is a new event)
+COALESCED = {
+    'NEW_ANSWER': ('question_noti', 'answer_noti'),
+    'question_comment': ('question_noti', None),
+    'comment_answer': ('answer_noti', None),
+}
+
+LABELS = {
+    'comment_answer': 'Comment on Answer',
+    'question_comment': 'Comment on Question',
+    'community_message': 'Community Message',
+    'question_edit': 'Edit Suggessted',
+    'question_reopen_voted': 'Question ReOpen Vote Raises',
+    'NEW_ANSWER': 'New Answer to the Question',
+    'community_join_request': 'Community Join Request',
+}
+
+
+def _feed_key(user_id):
+    return f'notification_feed:{user_id}'
+
+
+def _drop_feed(user_id):
+    try:
+        cache.delete(_feed_key(user_id))
+    except Exception:
+        # Best effort, the write which changed the feed goes through; the
+        # cached dropdown is stale for up to FEED_TTL.
+        logger.warning('Dropping the notification feed of user %s failed', user_id, exc_info=True)
+
+
+def invalidate_feed(user_id):
+    _drop_feed(user_id)
+    # Again once committed, a request may have cached the rows from before meanwhile.
+    transaction.on_commit(lambda: _drop_feed(user_id))
+
+
+def notify(receiver, type_of_noti, url=None, question=None, answer=None, sender=None, extra_data=None):
+    """Notify `receiver`, coalesced or deduplicated with its recent unread notifications. Returns the Notification."""
+    fields = {'question_noti': question, 'answer_noti': answer, 'noti_sender': sender, 'extra_data': extra_data}
+    recent = Notification.objects.filter(
+        noti_receiver=receiver, type_of_noti=type_of_noti, is_read=False,
+        date_created__gte=timezone.now() - COALESCE_WINDOW).order_by('-date_created')
+
+    if type_of_noti not in COALESCED:
+        existing = recent.filter(**fields).first()
+        return existing or Notification.objects.create(noti_receiver=receiver, type_of_noti=type_of_noti, url=url, **fields)
+
+    target, event = COALESCED[type_of_noti]
+    existing = recent.filter(**{target: fields[target]}).first()
+    if existing is None:
+        return Notification.objects.create(noti_receiver=receiver, type_of_noti=type_of_noti, url=url, **fields)
+    if event is not None and getattr(existing, f'{event}_id') == getattr(fields[event], 'pk', None):
+        return existing
+
+    # The row stays unread, the unread counters don't move.
+    latest = {field: value for field, value in fields.items() if value is not None}
+    Notification.objects.filter(pk=existing.pk).update(
+        count=F('count') + 1, url=url or existing.url, date_created=timezone.now(), **latest)
+    invalidate_feed(existing.noti_receiver_id)
+    existing.refresh_from_db()
+    # update() sends no post_save: the new event is emailed from here.
+    queue_email(receiver, label_of(existing), feed_entry(existing)['text'], existing.url)
+    return existing
+
+
+def _feed(user):
+    return Notification.objects.filter(noti_receiver=user).select_related(
+        'question_noti', 'answer_noti', 'noti_sender').order_by('-date_created', '-id')
+
+
+def recent_notifications(user):
+    """(the DROPDOWN_SIZE most recent notifications of the user, whether there are older ones)"""
+    try:
+        cached = cache.get(_feed_key(user.pk))
+    except Exception:
+        logger.warning('Notification feed cache unavailable', exc_info=True)
+        cached = None
+    if cached is None:
+        notifications = list(_feed(user)[:DROPDOWN_SIZE + 1])
+        cached = (notifications[:DROPDOWN_SIZE], len(notifications) > DROPDOWN_SIZE)
+        try:
+            cache.set(_feed_key(user.pk), cached, FEED_TTL)
+        except Exception:
+            logger.warning('Notification feed cache unavailable', exc_info=True)
+    return cached
+
+
+def notifications_before(user, before_id, limit=FEED_PAGE_SIZE):
+    """(the `limit` notifications following the notification `before_id` in the feed, whether there are more)"""
+    cursor = Notification.objects.filter(noti_receiver=user, pk=before_id).values('date_created', 'pk').first()
+    if cursor is None:
+        return [], False
+    notifications = list(_feed(user).filter(
+        Q(date_created__lt=cursor['date_created']) | Q(date_created=cursor['date_created'], pk__lt=cursor['pk'])
+    )[:limit + 1])
+    return notifications[:limit], len(notifications) > limit
+
+
+def label_of(notification):
+    label = LABELS.get(notification.type_of_noti, '')
+    if notification.type_of_noti == 'NEW_ANSWER' and notification.count > 1:
+        return f'{notification.count} New Answers to the Question'
+    return label
+
+
+def feed_entry(notification):
+    """What the "load more" endpoint returns for a notification."""
+    if notification.type_of_noti == 'community_join_request':
+        text = f'{notification.noti_sender.username if notification.noti_sender else ""} wants to join {notification.extra_data}'
+    elif notification.question_noti:
+        text = notification.question_noti.title
+    else:
+        text = str(notification.answer_noti or '')
+    return {
+        'id': notification.id,
+        'type': notification.type_of_noti,
+        'label': label_of(notification),
+        'text': text,
+        'url': notification.url,
+        'count': notification.count,
+        'is_read': notification.is_read,
+        'date_created': notification.date_created.isoformat(),
+    }
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from notification.retention import (
+    BATCH_PAUSE, BATCH_SIZE, RETENTION, archive_old, compact_unread, compactable, delete_read, lookup_latency,
+    read_to_delete, table_report, to_archive)
+
+
+class Command(BaseCommand):
+    help = 'Delete old read notifications, compact old unread ones and archive the rest (settings.NOTIFICATION_RETENTION)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count what each policy would touch')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per batch')
+        parser.add_argument('--pause', type=float, default=BATCH_PAUSE, help='Seconds between batches')
+        parser.add_argument('--no-report', action='store_true', help="Don't measure the tables before and after")
+
+    def handle(self, *args, **options):
+        if not options['no_report']:
+            self.report('Before')
+
+        if options['dry_run']:
+            notifications, priv_notifications = read_to_delete()
+            groups = sum(groups.count() for type_of_noti, target, rows, groups in compactable())
+            self.stdout.write(
+                f"Read older than {RETENTION['delete_read_after_days']} days: {notifications.count()} notifications, "
+                f"{priv_notifications.count()} reputation notifications")
+            self.stdout.write(f"Unread older than {RETENTION['compact_unread_after_days']} days: {groups} groups to compact")
+            self.stdout.write(f"Older than {RETENTION['archive_after_days']} days: {to_archive().count()} notifications to archive")
+            return
+
+        batches = {'batch_size': options['batch_size'], 'pause': options['pause']}
+        deleted, priv_deleted = delete_read(**batches)
+        self.stdout.write(f'Deleted {deleted} read notifications and {priv_deleted} read reputation notifications')
+        folded = compact_unread(**batches)
+        self.stdout.write(f'Folded {folded} unread notifications into others')
+        archived = archive_old(**batches)
+        self.stdout.write(f'Archived {archived} notifications')
+
+        if not options['no_report']:
+            self.report('After')
+        self.stdout.write(self.style.SUCCESS('Notification retention done'))
+
+    def report(self, title):
+        self.stdout.write(f'{title}:')
+        for table, (rows, size) in table_report().items():
+            size = f', {size / 1024:.0f} KB' if size is not None else ''
+            self.stdout.write(f'  {table}: {rows} rows{size}')
+        for lookup, median in lookup_latency().items():
+            self.stdout.write(f'  {lookup}: ' + (f'{median:.2f} ms median' if median is not None else 'no rows'))
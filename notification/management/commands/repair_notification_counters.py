@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from notification.models import Notification, PrivRepNotification, NotificationCounter
+from notification.counters import recompute_notification_counters
+
+COUNTER_FIELDS = ('unread', 'priv_unread', 'priv_unread_reputation')
+
+
+class Command(BaseCommand):
+    help = 'Recompute the unread notification counters of every user from the notification tables'
+
+    def handle(self, *args, **options):
+        before = {row[0]: row[1:] for row in NotificationCounter.objects.values_list('user_id', *COUNTER_FIELDS)}
+        written = recompute_notification_counters(Notification, PrivRepNotification, NotificationCounter)
+        after = {row[0]: row[1:] for row in NotificationCounter.objects.values_list('user_id', *COUNTER_FIELDS)}
+
+        # Users without unread notifications have no row after the rebuild.
+        zero = (0,) * len(COUNTER_FIELDS)
+        drifted = sum(1 for user_id, counts in before.items() if after.get(user_id, zero) != counts)
+        missing = len(after.keys() - before.keys())
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {written} notification counters, {drifted} were out of sync, {missing} were missing'))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notification.emails import BATCH_SIZE, MAX_WORKERS, send_digests
+
+
+class Command(BaseCommand):
+    help = 'Send the queued notification emails as one digest per user, polling for new ones until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due now and exit')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Users whose digests are claimed at a time')
+        parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='SMTP connections used at once')
+        parser.add_argument('--interval', type=float, default=60, help='Seconds between polls when nothing is due')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_digests(options['batch_size'], options['workers'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'{sent} digests sent, {failed} failed')
+            if options['once']:
+                if not (sent or failed):
+                    break
+                continue
+            if not (sent or failed):
+                close_old_connections()
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'{total_sent} digests sent, {total_failed} failed'))
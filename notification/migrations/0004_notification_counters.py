@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_notification_counters(apps, schema_editor):
+    # Frozen copy of notification.counters.recompute_notification_counters().
+    Notification = apps.get_model('notification', 'Notification')
+    PrivRepNotification = apps.get_model('notification', 'PrivRepNotification')
+    NotificationCounter = apps.get_model('notification', 'NotificationCounter')
+    counters = {}
+    for user_id, unread in Notification.objects.filter(is_read=False).values_list(
+            'noti_receiver').annotate(unread=Count('pk')).order_by():
+        counters.setdefault(user_id, {})['unread'] = unread
+    for user_id, count, reputation in PrivRepNotification.objects.filter(is_read=False).values_list(
+            'for_user').annotate(count=Count('pk'), reputation=Sum('missingReputation')).order_by():
+        counters.setdefault(user_id, {}).update(priv_unread=count, priv_unread_reputation=reputation or 0)
+    NotificationCounter.objects.all().delete()
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, **fields) for user_id, fields in counters.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('notification', '0003_notification_extra_data_notification_noti_sender_and_more'),
+        ('qa', '0009_scheduled_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_counter', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('unread', models.IntegerField(default=0)),
+                ('priv_unread', models.IntegerField(default=0)),
+                ('priv_unread_reputation', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['noti_receiver', '-date_created'], name='notification_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['noti_receiver', 'is_read', '-date_created'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='privrepnotification',
+            index=models.Index(fields=['for_user', '-date_created_PrivNotify'], name='priv_notification_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='privrepnotification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['for_user', 'is_read', '-date_created_PrivNotify'], name='priv_notification_unread_idx'),
+        ),
+        migrations.RunPython(fill_notification_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0004_notification_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.IntegerField(default=1),
+        ),
+    ]
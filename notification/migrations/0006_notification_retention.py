@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0005_notification_count'),
+        ('qa', '0009_scheduled_jobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('noti_receiver_id', models.IntegerField(db_index=True)),
+                ('type_of_noti', models.CharField(max_length=30)),
+                ('url', models.URLField(blank=True, null=True)),
+                ('date_created', models.DateTimeField()),
+                ('is_read', models.BooleanField(default=False)),
+                ('question_noti_id', models.BigIntegerField(blank=True, null=True)),
+                ('answer_noti_id', models.BigIntegerField(blank=True, null=True)),
+                ('noti_sender_id', models.IntegerField(blank=True, null=True)),
+                ('extra_data', models.CharField(blank=True, max_length=500, null=True)),
+                ('count', models.IntegerField(default=1)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='privrepnotification',
+            index=models.Index(fields=['for_user', 'type_of_PrivNotify', 'for_if'], name='priv_notification_lookup_idx'),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from qa.models import Question,Answer
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from model_utils import FieldTracker
 
 TYPE_OF_NOTI = [
 
@@ -29,6 +31,18 @@ class Notification(models.Model):
 	# Generic fields for additional notification data
 	noti_sender = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True, related_name='noti_sender')
 	extra_data = models.CharField(max_length=500, blank=True, null=True)  # For storing community name, etc.
+	# Events coalesced into this notification, see notification/feed.py.
+	count = models.IntegerField(default=1)
+
+	tracker = FieldTracker(fields=['is_read'])
+
+	class Meta:
+		indexes = [
+			# The inbox dropdown, newest first.
+			models.Index(fields=['noti_receiver', '-date_created'], name='notification_recent_idx'),
+			# The unread ones only, for "mark all read".
+			models.Index(fields=['noti_receiver', 'is_read', '-date_created'], name='notification_unread_idx', condition=Q(is_read=False)),
+		]
 
 	def __str__(self):
 		return f"{self.type_of_noti} - [USER] {self.noti_receiver} - [READED?] - {self.is_read}"
@@ -59,9 +73,93 @@ class PrivRepNotification(models.Model):
 	question_priv_noti = models.ForeignKey(Question, on_delete=models.CASCADE, blank=True, null=True)
 	answer_priv_noti = models.ForeignKey(Answer, on_delete=models.CASCADE, blank=True, null=True)
 
+	tracker = FieldTracker(fields=['is_read', 'missingReputation'])
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['for_user', '-date_created_PrivNotify'], name='priv_notification_recent_idx'),
+			models.Index(fields=['for_user', 'is_read', '-date_created_PrivNotify'], name='priv_notification_unread_idx', condition=Q(is_read=False)),
+			# The get_or_create() lookups which keep a notification from being sent twice.
+			models.Index(fields=['for_user', 'type_of_PrivNotify', 'for_if'], name='priv_notification_lookup_idx'),
+		]
+
 	def __str__(self):
 		return self.type_of_PrivNotify
 
+
+class NotificationArchive(models.Model):
+	"""
+	Notifications moved out of Notification by the retention job once
+	they are old, see notification/retention.py. Plain ids instead of
+	foreign keys: the rows they point to may be gone since.
+	"""
+	original_id = models.BigIntegerField(unique=True)
+	noti_receiver_id = models.IntegerField(db_index=True)
+	type_of_noti = models.CharField(max_length=30)
+	url = models.URLField(null=True, blank=True)
+	date_created = models.DateTimeField()
+	is_read = models.BooleanField(default=False)
+	question_noti_id = models.BigIntegerField(null=True, blank=True)
+	answer_noti_id = models.BigIntegerField(null=True, blank=True)
+	noti_sender_id = models.IntegerField(null=True, blank=True)
+	extra_data = models.CharField(max_length=500, blank=True, null=True)
+	count = models.IntegerField(default=1)
+	archived_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self):
+		return f"{self.type_of_noti} - [USER] {self.noti_receiver_id} - archived {self.archived_at}"
+
+
+class NotificationCounter(models.Model):
+	"""
+	Unread notifications of a user, kept up to date as they are created,
+	read and deleted so the header doesn't count them on every page. See
+	notification/counters.py.
+	"""
+	user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+	unread = models.IntegerField(default=0)
+	priv_unread = models.IntegerField(default=0)
+	# Sum of missingReputation over the unread PrivRepNotification rows.
+	priv_unread_reputation = models.IntegerField(default=0)
+
+	def __str__(self):
+		return f"{self.user_id} - {self.unread} unread - {self.priv_unread} unread (+{self.priv_unread_reputation})"
+
+EMAIL_STATUS_CHOICES = [
+	('pending', 'Pending'),
+	('sending', 'Sending'),
+	('sent', 'Sent'),
+	('failed', 'Failed'),
+]
+
+class QueuedEmail(models.Model):
+	"""
+	A notification to email, sent with the others of the user in a digest
+	by the send_email_digests command. See notification/emails.py.
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='queued_emails')
+	subject = models.CharField(max_length=200)
+	body = models.TextField(blank=True, default='')
+	url = models.CharField(max_length=500, blank=True, default='')
+	created_at = models.DateTimeField(auto_now_add=True)
+	# The digest holding it goes out from then on, retries move it later.
+	send_after = models.DateTimeField()
+	status = models.CharField(max_length=10, choices=EMAIL_STATUS_CHOICES, default='pending')
+	attempts = models.IntegerField(default=0)
+	claimed_by = models.CharField(max_length=32, blank=True, default='')
+	locked_until = models.DateTimeField(null=True, blank=True)
+	sent_at = models.DateTimeField(null=True, blank=True)
+	last_error = models.TextField(blank=True, default='')
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['status', 'send_after'], name='queued_email_due_idx'),
+			models.Index(fields=['user', 'status'], name='queued_email_user_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.subject} - [USER] {self.user_id} - {self.status}"
+
 # PRIV_NOTIFY_CHOICES = [
 
 # 	('QUESTION_EDIT_REP_P', 'Question edit Rep Plus'),
@@ -0,0 +1,183 @@
+"""
+Notification retention.
+
+Three policies, by age (days, settings.NOTIFICATION_RETENTION), run in this
+order by `python manage.py prune_notifications`:
+
+    delete_read_after_days      read notifications are deleted
+    compact_unread_after_days   old unread notifications of the same
+                                receiver, type and target are folded into
+                                the newest one (Notification.count), like
+                                notify() does for new ones
+    archive_after_days          what is left is moved to NotificationArchive
+
+Every policy works in batches of `batch_size` rows with a pause in between
+so the site keeps the database while it runs. The delete and archive
+policies go through QuerySet.delete(), so the unread counters and cached
+dropdowns follow (notification/signals.py).
+
+PrivRepNotification rows are only deleted once read, and never those of
+KEEP_PRIV_TYPES: the get_or_create() calls awarding badges and privileges
+look them up to notify each award once.
+
+table_report() and lookup_latency() measure the tables before and after.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .feed import COALESCED, DROPDOWN_SIZE
+from .models import Notification, NotificationArchive, PrivRepNotification
+
+RETENTION = {
+    'delete_read_after_days': 90,
+    'compact_unread_after_days': 30,
+    'archive_after_days': 365,
+    **getattr(settings, 'NOTIFICATION_RETENTION', {}),
+}
+BATCH_SIZE = 500
+# Seconds between two batches.
+BATCH_PAUSE = 0.2
+KEEP_PRIV_TYPES = ('BADGE_EARNED', 'Privilege_Earned')
+
+ARCHIVED_FIELDS = ('noti_receiver_id', 'type_of_noti', 'url', 'date_created', 'is_read', 'question_noti_id',
+                   'answer_noti_id', 'noti_sender_id', 'extra_data', 'count')
+
+
+def _cutoff(policy, now=None):
+    return (now or timezone.now()) - timedelta(days=RETENTION[policy])
+
+
+def _in_batches(queryset, action, batch_size, pause):
+    """Run action(primary keys) on the queryset batch by batch until it is empty. The action has to take the rows out of it."""
+    done = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return done
+        done += action(pks)
+        if len(pks) < batch_size:
+            return done
+        time.sleep(pause)
+
+
+def _delete(model):
+    def delete(pks):
+        with transaction.atomic():
+            deleted, per_model = model.objects.filter(pk__in=pks).delete()
+        return per_model.get(model._meta.label, 0)
+    return delete
+
+
+def read_to_delete(now=None):
+    cutoff = _cutoff('delete_read_after_days', now)
+    return (Notification.objects.filter(is_read=True, date_created__lt=cutoff),
+            PrivRepNotification.objects.filter(is_read=True, date_created_PrivNotify__lt=cutoff).exclude(
+                type_of_PrivNotify__in=KEEP_PRIV_TYPES))
+
+
+def delete_read(now=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Returns (notifications, reputation notifications) deleted."""
+    notifications, priv_notifications = read_to_delete(now)
+    return (_in_batches(notifications, _delete(Notification), batch_size, pause),
+            _in_batches(priv_notifications, _delete(PrivRepNotification), batch_size, pause))
+
+
+def compactable(now=None):
+    """(type, target field, groups of more than one unread notification older than the cutoff) per coalesced type."""
+    old = Notification.objects.filter(is_read=False, date_created__lt=_cutoff('compact_unread_after_days', now))
+    for type_of_noti, (target, event) in COALESCED.items():
+        groups = old.filter(type_of_noti=type_of_noti).values('noti_receiver', target).annotate(
+            rows=Count('pk'), events=Sum('count'), newest=Max('pk')).filter(rows__gt=1).order_by()
+        yield type_of_noti, target, old.filter(type_of_noti=type_of_noti), groups
+
+
+def compact_unread(now=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Returns the number of notifications folded into others."""
+    folded = 0
+    for type_of_noti, target, rows, groups in compactable(now):
+        while True:
+            batch = list(groups[:batch_size])
+            for group in batch:
+                with transaction.atomic():
+                    Notification.objects.filter(pk=group['newest']).update(count=group['events'])
+                    deleted, per_model = rows.filter(
+                        noti_receiver=group['noti_receiver'], **{target: group[target]}
+                    ).exclude(pk=group['newest']).delete()
+                    folded += per_model.get(Notification._meta.label, 0)
+            if len(batch) < batch_size:
+                break
+            time.sleep(pause)
+    return folded
+
+
+def to_archive(now=None):
+    return Notification.objects.filter(date_created__lt=_cutoff('archive_after_days', now))
+
+
+def _archive(pks):
+    with transaction.atomic():
+        rows = Notification.objects.filter(pk__in=pks).values('pk', *ARCHIVED_FIELDS)
+        NotificationArchive.objects.bulk_create(
+            [NotificationArchive(original_id=row.pop('pk'), **row) for row in rows], ignore_conflicts=True)
+        deleted, per_model = Notification.objects.filter(pk__in=pks).delete()
+    return per_model.get(Notification._meta.label, 0)
+
+
+def archive_old(now=None, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    """Returns the number of notifications archived."""
+    return _in_batches(to_archive(now), _archive, batch_size, pause)
+
+
+# REPORT
+
+
+def _table_bytes(table):
+    """Size of a table and its indexes on SQLite (dbstat), None elsewhere or without dbstat."""
+    if connection.vendor != 'sqlite':
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)", [table, table])
+            return cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+
+
+def table_report():
+    """{table: (rows, bytes or None)} of the notification tables."""
+    return {model._meta.db_table: (model.objects.count(), _table_bytes(model._meta.db_table))
+            for model in (Notification, PrivRepNotification, NotificationArchive)}
+
+
+def _median_ms(query, user_ids):
+    timings = []
+    for user_id in user_ids:
+        start = time.perf_counter()
+        query(user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings) if timings else None
+
+
+def lookup_latency(samples=20):
+    """
+    Median milliseconds of the dropdown query and of a get_or_create()
+    style PrivRepNotification lookup, over the users with most rows.
+    """
+    user_ids = list(Notification.objects.values_list('noti_receiver').annotate(
+        rows=Count('pk')).order_by('-rows').values_list('noti_receiver', flat=True)[:samples])
+    priv_user_ids = list(PrivRepNotification.objects.values_list('for_user').annotate(
+        rows=Count('pk')).order_by('-rows').values_list('for_user', flat=True)[:samples])
+    return {
+        'dropdown': _median_ms(lambda user_id: list(Notification.objects.filter(
+            noti_receiver_id=user_id).order_by('-date_created', '-id')[:DROPDOWN_SIZE]), user_ids),
+        'award lookup': _median_ms(lambda user_id: PrivRepNotification.objects.filter(
+            for_user_id=user_id, type_of_PrivNotify='BADGE_EARNED', for_if='Autobiographer').first(), priv_user_ids),
+    }
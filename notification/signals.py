@@ -0,0 +1,76 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Notification, PrivRepNotification
+from .counters import bump_notification_counters, priv_unread_of
+from .emails import queue_email
+from .feed import feed_entry, invalidate_feed, label_of
+
+# UNREAD COUNTERS - START
+# Keep NotificationCounter (notification/counters.py) in step with the
+# notifications. The trackers still hold the values from before the save.
+
+
+@receiver(post_save, sender=Notification)
+def counters_notification_saved(sender, instance, created, **kwargs):
+    was_unread = not created and not instance.tracker.previous('is_read')
+    bump_notification_counters(instance.noti_receiver_id, unread=int(not instance.is_read) - int(was_unread))
+
+
+@receiver(post_delete, sender=Notification)
+def counters_notification_deleted(sender, instance, **kwargs):
+    if not instance.is_read:
+        bump_notification_counters(instance.noti_receiver_id, unread=-1)
+
+
+@receiver(post_save, sender=PrivRepNotification)
+def counters_priv_notification_saved(sender, instance, created, **kwargs):
+    count, reputation = priv_unread_of(instance.is_read, instance.missingReputation)
+    if not created:
+        was_count, was_reputation = priv_unread_of(
+            instance.tracker.previous('is_read'), instance.tracker.previous('missingReputation'))
+        count, reputation = count - was_count, reputation - was_reputation
+    bump_notification_counters(instance.for_user_id, priv_unread=count, priv_unread_reputation=reputation)
+
+
+@receiver(post_delete, sender=PrivRepNotification)
+def counters_priv_notification_deleted(sender, instance, **kwargs):
+    count, reputation = priv_unread_of(instance.is_read, instance.missingReputation)
+    bump_notification_counters(instance.for_user_id, priv_unread=-count, priv_unread_reputation=-reputation)
+
+# UNREAD COUNTERS - END
+
+
+# NOTIFICATION FEED - START
+# The cached dropdown of the receiver (notification/feed.py) is dropped
+# whenever one of its notifications changes.
+
+
+@receiver(post_save, sender=Notification)
+def feed_notification_saved(sender, instance, **kwargs):
+    invalidate_feed(instance.noti_receiver_id)
+
+
+@receiver(post_delete, sender=Notification)
+def feed_notification_deleted(sender, instance, **kwargs):
+    invalidate_feed(instance.noti_receiver_id)
+
+# NOTIFICATION FEED - END
+
+
+# EMAIL QUEUE - START
+# New notifications of the users who want emails are queued for their next
+# digest (notification/emails.py), nothing is sent from the request.
+
+
+@receiver(post_save, sender=Notification)
+def email_notification_created(sender, instance, created, **kwargs):
+    if created:
+        queue_email(instance.noti_receiver, label_of(instance), feed_entry(instance)['text'], instance.url)
+
+
+@receiver(post_save, sender=PrivRepNotification)
+def email_priv_notification_created(sender, instance, created, **kwargs):
+    if created:
+        queue_email(instance.for_user, instance.get_type_of_PrivNotify_display(), instance.description, instance.url)
+
+# EMAIL QUEUE - END
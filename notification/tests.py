@@ -1,3 +1,177 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache.backends.base import BaseCache
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from qa.models import Answer, Question, TagStats
+from qa.view_tracking import view_buffer
+from tagbadge.engine import award_badges
+from tagbadge.rules import RULES, Award
+from .emails import MAX_ATTEMPTS, queue_email, send_digests
+from .feed import notify
+from .models import Notification, PrivRepNotification, QueuedEmail
+
+
+class FailingEmailBackend(EmailBackend):
+    """locmem backend whose connection can't be opened."""
+
+    def open(self):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class CountingEmailBackend(EmailBackend):
+    """locmem backend counting the connections opened."""
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return True
+
+
+class BrokenCache(BaseCache):
+    """Cache backend of a cache server which is down."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+
+    def _unavailable(self, *args, **kwargs):
+        raise ConnectionError('Cache server unavailable')
+
+    add = get = set = touch = delete = clear = incr = decr = has_key = _unavailable
+    get_many = set_many = delete_many = get_or_set = _unavailable
+
+
+def make_due():
+    QueuedEmail.objects.update(send_after=timezone.now() - timedelta(seconds=1))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EmailDigestTests(TestCase):
+
+    def setUp(self):
+        self.user = self.make_user('digest_user', emails=True)
+
+    def make_user(self, username, emails):
+        user = User.objects.create_user(username, f'{username}@example.com', 'password')
+        user.profile.send_email_notifications = emails
+        user.profile.email = f'{username}@example.com'
+        user.profile.save()
+        return user
+
+    def test_notifications_are_queued_not_sent(self):
+        Notification.objects.create(noti_receiver=self.user, type_of_noti='question_edit', url='/questions/1/')
+        PrivRepNotification.objects.create(for_user=self.user, type_of_PrivNotify='BADGE_EARNED', description='First up vote')
+        self.assertEqual(QueuedEmail.objects.filter(user=self.user, status='pending').count(), 2)
+        self.assertEqual(mail.outbox, [])
+
+    def test_coalesced_events_are_queued(self):
+        notify(self.user, 'question_comment', '/questions/1/')
+        notify(self.user, 'question_comment', '/questions/1/')
+        self.assertEqual(Notification.objects.get(noti_receiver=self.user).count, 2)
+        self.assertEqual(QueuedEmail.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_awarded_badges_are_queued(self):
+        quiet = self.make_user('quiet_user', emails=False)
+        rule = next(rule for rule in RULES if rule.name == 'Student')
+        award_badges([(rule, Award(self.user.pk, None, None)), (rule, Award(quiet.pk, None, None))])
+        self.assertEqual(list(QueuedEmail.objects.values_list('user_id', 'subject')), [(self.user.pk, 'Badge Earned')])
+
+    def test_users_without_email_notifications_get_nothing_queued(self):
+        quiet = self.make_user('quiet_user', emails=False)
+        Notification.objects.create(noti_receiver=quiet, type_of_noti='question_edit')
+        self.assertIsNone(queue_email(quiet, 'Hello'))
+        self.assertFalse(QueuedEmail.objects.filter(user=quiet).exists())
+
+    def test_nothing_is_sent_before_the_digest_is_due(self):
+        queue_email(self.user, 'Comment on Question')
+        self.assertEqual(send_digests(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+
+    def test_one_digest_per_user(self):
+        other = self.make_user('other_user', emails=True)
+        for subject in ('Comment on Question', 'Comment on Answer', 'New Answer to the Question'):
+            queue_email(self.user, subject, url='/questions/1/')
+        queue_email(other, 'Badge Earned')
+        make_due()
+
+        self.assertEqual(send_digests(), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+        digest = next(message for message in mail.outbox if message.to == ['digest_user@example.com'])
+        self.assertEqual(digest.subject, '3 new notifications')
+        self.assertIn('Comment on Answer', digest.body)
+        self.assertIn('/questions/1/', digest.body)
+        single = next(message for message in mail.outbox if message.to == ['other_user@example.com'])
+        self.assertEqual(single.subject, 'Badge Earned')
+        self.assertFalse(QueuedEmail.objects.exclude(status='sent').exists())
+        # Sent rows aren't sent again.
+        self.assertEqual(send_digests(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='notification.tests.CountingEmailBackend')
+    def test_a_batch_reuses_its_connections(self):
+        CountingEmailBackend.opened = 0
+        for i in range(6):
+            queue_email(self.make_user(f'batch_user_{i}', emails=True), 'Badge Earned')
+        make_due()
+        self.assertEqual(send_digests(max_workers=2), (6, 0))
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(CountingEmailBackend.opened, 2)
+
+    @override_settings(EMAIL_BACKEND='notification.tests.FailingEmailBackend')
+    def test_failed_digests_are_retried_then_given_up(self):
+        queue_email(self.user, 'Comment on Question')
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            make_due()
+            self.assertEqual(send_digests(), (0, 1))
+            email = QueuedEmail.objects.get(user=self.user)
+            self.assertEqual(email.attempts, attempt)
+            self.assertIn('SMTP server unavailable', email.last_error)
+            if attempt < MAX_ATTEMPTS:
+                self.assertEqual(email.status, 'pending')
+                self.assertGreater(email.send_after, timezone.now())
+        self.assertEqual(email.status, 'failed')
+        make_due()
+        self.assertEqual(send_digests(), (0, 0))
+
+    def test_retry_after_failure_succeeds(self):
+        queue_email(self.user, 'Comment on Question')
+        make_due()
+        with override_settings(EMAIL_BACKEND='notification.tests.FailingEmailBackend'):
+            self.assertEqual(send_digests(), (0, 1))
+        make_due()
+        self.assertEqual(send_digests(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(QueuedEmail.objects.get(user=self.user).status, 'sent')
+
+    def test_opting_out_drops_queued_emails(self):
+        queue_email(self.user, 'Comment on Question')
+        self.user.profile.send_email_notifications = False
+        self.user.profile.save()
+        make_due()
+        self.assertEqual(send_digests(), (0, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(QueuedEmail.objects.exists())
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+                   CACHES={'default': {'BACKEND': 'notification.tests.BrokenCache'}})
+class CacheOutageTests(TestCase):
+
+    def test_posting_and_reading_work_without_the_cache(self):
+        owner = User.objects.create_user('outage_owner', 'outage_owner@example.com', 'password')
+        answerer = User.objects.create_user('outage_answerer', 'outage_answerer@example.com', 'password')
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(post_owner=owner, title='Asked while the cache is down', body='Body')
+            question.tags.add('outage')
+            Answer.objects.create(answer_owner=answerer, questionans=question, body='Answered anyway')
+        self.assertEqual(TagStats.objects.get(tag__name='outage').answer_count, 1)
+
+        self.client.force_login(answerer)
+        response = self.client.get(question.get_absolute_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Answered anyway')
+        self.assertEqual(view_buffer.flush(), 1)
@@ -7,6 +7,7 @@ urlpatterns = [
 
 	path('read_All_Notifications/', views.read_All_Notifications, name='read_All_Notifications'),
 	path('mark-all-read/', views.read_All_Notifications, name='mark_all_read'),
+	path('notifications/', views.notification_feed, name='feed'),
 	path('delete/<int:notification_id>/', views.delete_notification, name='delete_notification'),
 	path('delete-all/', views.delete_all_notifications, name='delete_all_notifications'),
 
@@ -1,5 +1,7 @@
 from django.shortcuts import render
 from .models import PrivRepNotification,Notification
+from .counters import mark_all_read, mark_all_priv_read
+from .feed import notifications_before, feed_entry
 from django.http import JsonResponse, HttpResponseRedirect, HttpResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
@@ -9,15 +11,23 @@ from django.views.decorators.http import require_http_methods
 @require_http_methods(["POST"])
 def read_All_Notifications(request):
 
-    notifics = Notification.objects.filter(noti_receiver=request.user).order_by('-date_created')
-
-    for objs in notifics:
-        objs.is_read = True
-        objs.save()
+    # One UPDATE of the unread ones, see notification/counters.py.
+    mark_all_read(request.user)
 
     # return HttpResponse(status=204)
     return JsonResponse({'action': 'readedAll', 'success': True})
 
+@login_required
+@require_http_methods(["GET"])
+def notification_feed(request):
+    """Notifications older than ?before= (a notification id), for the dropdown's "load more"."""
+    try:
+        before_id = int(request.GET['before'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    notifications, has_more = notifications_before(request.user, before_id)
+    return JsonResponse({'notifications': [feed_entry(notification) for notification in notifications], 'has_more': has_more})
+
 @login_required
 @require_http_methods(["POST"])
 def delete_notification(request, notification_id):
@@ -41,13 +51,10 @@ def delete_all_notifications(request):
     except Exception as e:
         return JsonResponse({'success': False, 'message': str(e)}, status=400)
 
+@login_required
 def read_All_Priv_Notifications(request):
 
-    notifications = PrivRepNotification.objects.filter(for_user=request.user)
-
-    for obj in notifications:
-        obj.is_read = True
-        obj.save()
+    mark_all_priv_read(request.user)
 
     return JsonResponse({'action':'readedAllPrivNotifications'})
 
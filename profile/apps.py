@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class profileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profile'
+
+    def ready(self):
+        from . import signals
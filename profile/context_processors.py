@@ -6,7 +6,9 @@ from django.db.models import Avg, Count, Min, Sum, Q
 from qa.models import Question
 from notification.models import PrivRepNotification, Notification
 from chat.models import Message
+from main.lazy_context import lazy_context
 
+@lazy_context('questionsHome')
 def top_questions(request):
 	questionsHome = Question.objects.filter(
 							is_deleted=False, is_bountied=False).order_by(
@@ -15,6 +17,7 @@ def top_questions(request):
 			'questionsHome':questionsHome
 		}
 
+@lazy_context('count_bounty')
 def count_all_bounties(request):
 	bounties = Question.objects.filter(is_bountied=True)
 
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from chat.models import Message
+from main.media import NotAnImage, process_image
+from profile.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Make the missing renditions (thumbnails, WebP) of the profile photos and chat images uploaded before the media pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Also the images which already have renditions')
+
+    def handle(self, *args, **options):
+        default_photo = Profile._meta.get_field('profile_photo').default
+        sources = [
+            (Profile, 'profile_photo', Profile.objects.exclude(profile_photo='').exclude(profile_photo=default_photo)),
+            (Message, 'image', Message.objects.filter(message_type='image').exclude(image='').exclude(image=None)),
+        ]
+        for model, field, rows in sources:
+            if not options['all']:
+                rows = rows.filter(**{f'{field}_variants': {}})
+            processed = failed = 0
+            for pk in rows.values_list('pk', flat=True).iterator():
+                try:
+                    process_image(model, pk, field)
+                    processed += 1
+                except (NotAnImage, OSError) as e:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {pk}: {e}')
+            self.stdout.write(self.style.SUCCESS(
+                f'{model.__name__}.{field}: {processed} images processed, {failed} failed'))
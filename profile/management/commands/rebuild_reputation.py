@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from qa.models import Reputation
+from profile.reputation import rebuild_reputation_totals
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every Profile.reputation total from the reputation ledger'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            changed = rebuild_reputation_totals(Reputation)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt reputation totals, {changed} profiles were out of sync'))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:13
+
+from django.db import migrations, models
+from django.db.models import Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_reputation_totals(apps, schema_editor):
+    # Frozen copy of profile.reputation.rebuild_reputation_totals().
+    Reputation = apps.get_model('qa', 'Reputation')
+    Profile = apps.get_model('profile', 'Profile')
+    totals = dict(
+        Reputation.objects.filter(awarded_to__isnull=False).order_by().values(
+            'awarded_to').annotate(
+                total=Sum(Coalesce('question_rep_C', Value(0)) + Coalesce('answer_rep_C', Value(0)))).values_list(
+                    'awarded_to', 'total'))
+    changed = []
+    for profile in Profile.objects.only('id', 'user_id', 'reputation').iterator():
+        total = totals.get(profile.user_id, 0)
+        if profile.reputation != total:
+            profile.reputation = total
+            changed.append(profile)
+    Profile.objects.bulk_update(changed, ['reputation'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0009_profile_is_student'),
+        ('qa', '0005_question_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='reputation',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_reputation_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile', '0010_reputation_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='profile_photo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
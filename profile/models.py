@@ -4,6 +4,8 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
 from qa.models import Question
+from model_utils import FieldTracker
+from main.media import rendition_url
 import os
 from random import choice
 from os.path import join as path_join
@@ -40,6 +42,8 @@ class Profile(models.Model):
     location = models.CharField(max_length=30, default='', blank=True)
     title = models.CharField(max_length=30, default='', blank=True)
     profile_photo = models.ImageField(upload_to='profile_photos', default='media/isle.jpg')
+    # Smaller renditions of the photo, made in the background, see main/media.py.
+    profile_photo_variants = models.JSONField(default=dict, blank=True)
     about_me = models.CharField(max_length=30, default='', blank=True, null=True)
     website_link = models.URLField(blank=True)
     twitter_link = models.URLField(blank=True)
@@ -47,7 +51,8 @@ class Profile(models.Model):
     bookmark_questions = models.ManyToManyField(Question, related_name='bookmark_questions', blank=True)
     q_edited_counter = models.IntegerField(default=0)
     time = models.DateTimeField(auto_now_add=True)
-    reputation = models.IntegerField(default=1)
+    # Sum of the user's qa.Reputation rows, see profile/reputation.py
+    reputation = models.IntegerField(default=0)
     is_banned = models.BooleanField(default=False)
     post_edit_inactive_for_six_month = models.IntegerField(default=0)
     is_moderator = models.BooleanField(default=False)
@@ -109,12 +114,32 @@ class Profile(models.Model):
     editPostTimeOfUser = models.DateTimeField(auto_now_add=False, blank=True, null=True)
     Refiner_Illuminator_TagPostCounter = models.IntegerField(default=0, blank=True, null=True)
 
+    tracker = FieldTracker(fields=['full_name', 'profile_photo'])
+
+    def save(self, *args, **kwargs):
+        # reputation is only ever changed with UPDATE ... SET reputation = reputation + x,
+        # never write back the (possibly stale) value this instance was loaded with.
+        # The same for the photo renditions, written by the media workers.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('reputation', 'profile_photo_variants')]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.user}'
 
     def get_absolute_url(self):
         return reverse('profile:activityPageTabProfile', kwargs={'user_id': self.user_id,'username': self.user.username})
 
+    @property
+    def profile_photo_thumb_url(self):
+        return rendition_url(self.profile_photo, self.profile_photo_variants, 'thumb')
+
+    @property
+    def profile_photo_medium_url(self):
+        return rendition_url(self.profile_photo, self.profile_photo_variants, 'medium')
+
     @property
     def age(self):
         current_datetime = datetime.datetime.now(timezone.utc)
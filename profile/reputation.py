@@ -0,0 +1,54 @@
+"""
+Materialized reputation totals.
+
+qa.Reputation is the ledger, Profile.reputation holds the sum of a user's
+ledger rows (question_rep_C + answer_rep_C). The total is adjusted with an
+F() update whenever a Reputation row is created, changed or deleted (see
+profile/signals.py), read it instead of aggregating the ledger.
+rebuild_reputation_totals() recomputes every total from the ledger.
+"""
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import Profile
+
+
+def reputation_points(question_rep, answer_rep):
+    return (question_rep or 0) + (answer_rep or 0)
+
+
+def adjust_reputation(user_id, delta):
+    if user_id is None or not delta:
+        return
+    Profile.objects.filter(user_id=user_id).update(reputation=F('reputation') + delta)
+
+
+def reputation_of(user):
+    """Current total of a user, read from the database (not a cached profile instance)."""
+    if not user.is_authenticated:
+        return 0
+    return Profile.objects.filter(user=user).values_list('reputation', flat=True).first() or 0
+
+
+def ledger_totals(Reputation):
+    """{user_id: total} of every user with ledger rows, in one grouped query."""
+    return dict(
+        Reputation.objects.filter(awarded_to__isnull=False).order_by().values(
+            'awarded_to').annotate(
+                total=Sum(Coalesce('question_rep_C', Value(0)) + Coalesce('answer_rep_C', Value(0)))).values_list(
+                    'awarded_to', 'total'))
+
+
+def rebuild_reputation_totals(Reputation, Profile=Profile, batch_size=500):
+    """
+    Set every Profile.reputation to its ledger total. Returns the number of
+    profiles whose total changed.
+    """
+    totals = ledger_totals(Reputation)
+    changed = []
+    for profile in Profile.objects.only('id', 'user_id', 'reputation').iterator():
+        total = totals.get(profile.user_id, 0)
+        if profile.reputation != total:
+            profile.reputation = total
+            changed.append(profile)
+    Profile.objects.bulk_update(changed, ['reputation'], batch_size=batch_size)
+    return len(changed)
@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from qa.models import Reputation
+from .models import Profile
+from .reputation import adjust_reputation, reputation_points
+from .user_directory import record_user_change
+from main.media import process_later
+
+
+@receiver(post_save, sender=Reputation)
+def reputation_saved(sender, instance, created, **kwargs):
+    points = reputation_points(instance.question_rep_C, instance.answer_rep_C)
+    if created:
+        adjust_reputation(instance.awarded_to_id, points)
+        return
+
+    tracker = instance.tracker
+    if not tracker.changed():
+        return
+    previous_points = reputation_points(
+        tracker.previous('question_rep_C'), tracker.previous('answer_rep_C'))
+    previous_user_id = tracker.previous('awarded_to')
+    if previous_user_id == instance.awarded_to_id:
+        adjust_reputation(instance.awarded_to_id, points - previous_points)
+    else:
+        adjust_reputation(previous_user_id, -previous_points)
+        adjust_reputation(instance.awarded_to_id, points)
+
+
+@receiver(post_delete, sender=Reputation)
+def reputation_removed(sender, instance, **kwargs):
+    adjust_reputation(instance.awarded_to_id, -reputation_points(instance.question_rep_C, instance.answer_rep_C))
+
+
+# USER DIRECTORY - START
+# Tell the user directory (profile/user_directory.py) about new, renamed and
+# deleted users.
+
+
+@receiver(post_save, sender=User)
+def directory_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only, nothing the directory shows.
+    if created or update_fields is None or 'username' in update_fields:
+        record_user_change(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+def directory_profile_saved(sender, instance, created, **kwargs):
+    if created or instance.tracker.has_changed('full_name'):
+        record_user_change(instance.user_id)
+
+
+@receiver(post_delete, sender=User)
+def directory_user_removed(sender, instance, **kwargs):
+    record_user_change(instance.pk)
+
+# USER DIRECTORY - END
+
+
+# PROFILE PHOTO - START
+# A new photo gets its renditions made in the background, see main/media.py.
+
+
+@receiver(post_save, sender=Profile)
+def profile_photo_changed(sender, instance, created, **kwargs):
+    if not instance.tracker.has_changed('profile_photo'):
+        return
+    default = sender._meta.get_field('profile_photo').default
+    if not instance.profile_photo or instance.profile_photo.name == default:
+        return
+    Profile.objects.filter(pk=instance.pk).update(profile_photo_variants={})
+    instance.profile_photo_variants = {}
+    process_later(instance, 'profile_photo')
+
+# PROFILE PHOTO - END
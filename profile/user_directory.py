@@ -0,0 +1,223 @@
+"""
+User directory, the lookup behind every "find a user" box.
+
+Usernames and full names are held in memory by every process, in a sorted
+list of lowercased keys (prefix search by binary search) and one joined
+string (substring search with str.find). A lookup never touches the user
+tables, only the photos of the returned users are read, in one query:
+
+    users = search_users('ali', limit=10, exclude_ids=[request.user.id])
+    photos = photo_urls([user.id for user in users])
+
+Results are ranked: exact username, username prefix, full name prefix,
+then anything containing the text.
+
+The index follows the User and Profile saves (profile/signals.py) through
+a change log in the cache: every change takes the next sequence number and
+stores the user id under it. On lookup a process replays the entries it
+hasn't seen yet, reloading only those users; when it is too far behind (or
+an entry expired) it reloads the whole directory. The cache is best
+effort: when it is down, saves still go through and lookups use the
+directory the process holds.
+"""
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+CHANGE_SEQUENCE_KEY = 'user_directory:sequence'
+CHANGE_KEY = 'user_directory:change:{}'
+# Keep the change log for a day, and replay at most this many entries.
+CHANGE_TTL = 60 * 60 * 24
+MAX_REPLAY = 500
+
+DEFAULT_LIMIT = 20
+
+DirectoryUser = namedtuple('DirectoryUser', ['id', 'username', 'full_name'])
+
+
+class UserIndex:
+    """The in-memory index, one instance per process."""
+
+    def __init__(self, users=()):
+        self._users = {}
+        self._keys = []
+        self._text = None
+        for user in users:
+            self._users[user.id] = user
+            self._keys.extend(self._keys_of(user))
+        self._keys.sort()
+
+    def __len__(self):
+        return len(self._users)
+
+    @staticmethod
+    def _keys_of(user):
+        keys = [(user.username.lower(), 0, user.id)]
+        if user.full_name:
+            keys.append((user.full_name.lower(), 1, user.id))
+        return keys
+
+    def put(self, user):
+        self.remove(user.id)
+        self._users[user.id] = user
+        for key in self._keys_of(user):
+            insort(self._keys, key)
+        self._text = None
+
+    def remove(self, user_id):
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        for key in self._keys_of(user):
+            position = bisect_left(self._keys, key)
+            if position < len(self._keys) and self._keys[position] == key:
+                del self._keys[position]
+        self._text = None
+
+    def _substring_text(self):
+        # "\n" separated "username\tfull name" lines, built again after a change.
+        if self._text is None:
+            ids, starts, lines, offset = [], [], [], 0
+            for user in self._users.values():
+                line = f'{user.username}\t{user.full_name}'.lower()
+                ids.append(user.id)
+                starts.append(offset)
+                lines.append(line)
+                offset += len(line) + 1
+            self._text = ('\n'.join(lines), starts, ids)
+        return self._text
+
+    def _prefixed(self, text, kind):
+        position = bisect_left(self._keys, (text, kind))
+        while position < len(self._keys):
+            key, key_kind, user_id = self._keys[position]
+            if not key.startswith(text):
+                break
+            if key_kind == kind:
+                yield user_id
+            position += 1
+
+    def _containing(self, text):
+        joined, starts, ids = self._substring_text()
+        position = joined.find(text)
+        while position != -1:
+            line = bisect_left(starts, position + 1) - 1
+            yield ids[line]
+            # Continue on the next line, one hit per user is enough.
+            next_line = starts[line + 1] if line + 1 < len(starts) else len(joined)
+            position = joined.find(text, next_line)
+
+    def search(self, text, limit=DEFAULT_LIMIT, exclude_ids=()):
+        text = (text or '').strip().lower()
+        if '\n' in text or '\t' in text:
+            return []
+        found = {}
+        excluded = set(exclude_ids)
+
+        def collect(user_ids):
+            for user_id in user_ids:
+                if len(found) >= limit:
+                    return
+                if user_id not in excluded and user_id not in found:
+                    found[user_id] = self._users[user_id]
+
+        exact = [user_id for key, kind, user_id in self._keys[
+            bisect_left(self._keys, (text, 0)):bisect_left(self._keys, (text, 1))]]
+        collect(exact)
+        collect(self._prefixed(text, 0))
+        collect(self._prefixed(text, 1))
+        if text:
+            collect(self._containing(text))
+        return list(found.values())
+
+
+def load_users(user_ids=None):
+    users = User.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    return [DirectoryUser(user_id, username, full_name or '')
+            for user_id, username, full_name in users.values_list('pk', 'username', 'profile__full_name')]
+
+
+def _log_change(user_id):
+    try:
+        try:
+            sequence = cache.incr(CHANGE_SEQUENCE_KEY)
+        except ValueError:
+            cache.add(CHANGE_SEQUENCE_KEY, 0, None)
+            sequence = cache.incr(CHANGE_SEQUENCE_KEY)
+        cache.set(CHANGE_KEY.format(sequence), user_id, CHANGE_TTL)
+    except Exception:
+        # Best effort: the directories of the other processes stay behind
+        # on this user until they reload, the save itself goes through.
+        logger.warning('Recording the directory change of user %s failed', user_id, exc_info=True)
+
+
+def record_user_change(user_id):
+    """Called from the User/Profile signals, see profile/signals.py. Logged once the change is committed."""
+    transaction.on_commit(lambda: _log_change(user_id))
+
+
+_lock = threading.Lock()
+_index = None
+_sequence = None
+
+
+def _current_sequence():
+    return cache.get_or_set(CHANGE_SEQUENCE_KEY, 0, None)
+
+
+def get_user_index():
+    """The UserIndex of this process, brought up to date with the change log."""
+    global _index, _sequence
+    try:
+        sequence = _current_sequence()
+    except Exception:
+        logger.warning('User directory change log unavailable', exc_info=True)
+        with _lock:
+            if _index is None:
+                _index = UserIndex(load_users())
+            # Unknown: reload in full once the cache is back.
+            _sequence = None
+        return _index
+    if _index is not None and _sequence == sequence:
+        return _index
+
+    with _lock:
+        if _index is not None and _sequence is not None and 0 < sequence - _sequence <= MAX_REPLAY:
+            keys = [CHANGE_KEY.format(number) for number in range(_sequence + 1, sequence + 1)]
+            changes = cache.get_many(keys)
+            if len(changes) == len(keys):
+                user_ids = set(changes.values())
+                users = {user.id: user for user in load_users(user_ids)}
+                for user_id in user_ids:
+                    if user_id in users:
+                        _index.put(users[user_id])
+                    else:
+                        _index.remove(user_id)
+                _sequence = sequence
+                return _index
+        if _index is None or _sequence != sequence:
+            _index = UserIndex(load_users())
+            _sequence = sequence
+    return _index
+
+
+def search_users(text, limit=DEFAULT_LIMIT, exclude_ids=()):
+    """Up to `limit` DirectoryUser matching `text`, best first."""
+    return get_user_index().search(text, limit=limit, exclude_ids=exclude_ids)
+
+
+def photo_urls(user_ids):
+    """{user id: profile photo thumbnail url} of the given users, in one query."""
+    return {profile.user_id: profile.profile_photo_thumb_url for profile in Profile.objects.filter(
+        user_id__in=list(user_ids)).only('user_id', 'profile_photo', 'profile_photo_variants')}
@@ -1,5 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import Profile,Position
+from .reputation import reputation_of
+from .user_directory import search_users, photo_urls
+from main.media import NotAnImage, store_image
 import datetime
 from django.utils import timezone
 from datetime import timedelta
@@ -38,6 +41,9 @@ from notification.models import PrivRepNotification
 
 CACHE_TTL = getattr(settings, 'CACHE_TTL', DEFAULT_TIMEOUT)
 
+# Most used tags returned by the tag filter of the tags page.
+TAG_AUTOCOMPLETE_RESULTS = 36
+
 """
 The HttpRequest.is_ajax() method is removed in DJANGO 4, 
 so i used is_ajax function to check if the request is
@@ -59,7 +65,10 @@ def setup_profile_first_time(request):
     if request.method == 'POST':
         # Handle profile photo upload
         if 'profile_photo' in request.FILES:
-            profileData.profile_photo = request.FILES['profile_photo']
+            try:
+                profileData.profile_photo = store_image(request.FILES['profile_photo'], 'profile_photos')
+            except NotAnImage:
+                messages.error(request, 'The profile photo is not a valid image.')
         
         # Update other fields
         profileData.title = request.POST.get('title', '')
@@ -94,65 +103,56 @@ def setup_profile_first_time(request):
 
 def Ajax_searchTag(request):
     from tagbadge.tag_descriptions import get_tag_metadata
-    from django.db.models import Count
-    
+    from qa.tag_stats import get_tag_index
+
     q = request.GET.get('w', '')
-    
-    # Get tags with question counts
-    results = Tag.objects.filter(name__icontains=q).annotate(
-        question_count=Count('taggit_taggeditem_items', 
-                           filter=Q(taggit_taggeditem_items__content_type__model='question'))
-    ).distinct()
-    
+
+    # Tags starting with q, most used first, from the in-memory prefix index.
     serialized_results = []
-    for result in results:
-        # Skip tags with 0 questions
-        if result.question_count == 0:
-            continue
-            
-        metadata = get_tag_metadata(result.name)
+    for tag in get_tag_index().complete(q, limit=TAG_AUTOCOMPLETE_RESULTS):
+        metadata = get_tag_metadata(tag.name)
         serialized_results.append({
-            'id': result.id,
-            'tag_name': result.name,
+            'id': tag.id,
+            'tag_name': tag.name,
             'description': metadata['description'],
             'icon': metadata['icon'],
             'color': metadata['color'],
-            'question_count': result.question_count,
+            'question_count': tag.question_count,
         })
 
     return JsonResponse({'results': serialized_results})
 
 def tagsPage(request):
     from tagbadge.tag_descriptions import get_tag_metadata
-    from django.db.models import Count
-    
+    from qa.models import TagStats
+
     # Get sorting parameter
     tab = request.GET.get('tab', 'popular')
-    
-    # Get all tags with question counts
-    tags_queryset = Tag.objects.annotate(
-        question_count=Count('taggit_taggeditem_items',
-                           filter=Q(taggit_taggeditem_items__content_type__model='question'))
-    ).filter(question_count__gt=0)  # Only show tags with questions
-    
+
+    # Question counts come precomputed from TagStats, see qa/tag_stats.py
+    tag_stats = TagStats.objects.filter(question_count__gt=0).select_related('tag')  # Only show tags with questions
+
     # Apply sorting
     if tab == 'name':
-        tags_queryset = tags_queryset.order_by('name')
+        tag_stats = tag_stats.order_by('tag__name')
     elif tab == 'new':
-        tags_queryset = tags_queryset.order_by('-id')  # Newest first
+        tag_stats = tag_stats.order_by('-tag_id')  # Newest first
     else:  # popular (default)
-        tags_queryset = tags_queryset.order_by('-question_count')
-    
+        tag_stats = tag_stats.order_by('-question_count', 'tag_id')
+
     # Add metadata to each tag
     tags_with_metadata = []
-    for tag in tags_queryset:
+    for stats in tag_stats:
+        tag = stats.tag
         metadata = get_tag_metadata(tag.name)
         tag.description = metadata['description']
         tag.icon = metadata['icon']
         tag.color = metadata['color']
-        tag.question_count = tag.question_count
+        tag.question_count = stats.question_count
+        tag.answer_count = stats.answer_count
+        tag.last_activity = stats.last_activity
         tags_with_metadata.append(tag)
-    
+
     context = {
         'All_tags': tags_with_metadata,
         'tab': tab,
@@ -167,20 +167,16 @@ def usersPage(request):
 
 def Ajax_searchUser(request):
     q = request.GET.get('w')
-    results = User.objects.filter(username__icontains=q).distinct()
+    results = search_users(q)
+    photos = photo_urls(result.id for result in results)
     serialized_results = []
     for result in results:
-        if result.profile.profile_photo:
-            photo = result.profile.profile_photo.url
-        else:
-            photo = ''
         serialized_results.append({
             'id': result.id,
-            'photo': photo,
+            'photo': photos.get(result.id, ''),
             'user_name': result.username,
             # 'user_location': result.profile.location,
             })
-    print(serialized_results)
 
     return JsonResponse({'results': serialized_results})
 
@@ -2443,13 +2439,7 @@ def ActivityTabSummary(request, user_id, username):
 
 
 
-    getAlltheReputation = Reputation.objects.filter(awarded_to=profileData.user).aggregate(Sum('answer_rep_C'),Sum('question_rep_C'))
-    d = getAlltheReputation['question_rep_C__sum']
-    total_Question_Rep = getAlltheReputation['question_rep_C__sum'] if d else 0
-    s = getAlltheReputation['answer_rep_C__sum']
-    total_answer_Rep = getAlltheReputation['answer_rep_C__sum'] if s else 0
-
-    finalReputation = total_answer_Rep + total_Question_Rep
+    finalReputation = reputation_of(profileData.user)
 
 
 # To Show Last Seen in Profile. You'll see as "Last seen"
@@ -2790,7 +2780,10 @@ def EditProfileAjaxForm(request, user_id):
 
         
         if request.FILES != {}:
-            request.user.profile.profile_photo = request.FILES["image"]
+            try:
+                request.user.profile.profile_photo = store_image(request.FILES["image"], 'profile_photos')
+            except NotAnImage:
+                return JsonResponse({"error": "The profile photo is not a valid image"}, status=400)
 
         request.user.profile.save()
 
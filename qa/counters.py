@@ -0,0 +1,44 @@
+"""
+Denormalized Question counters.
+
+Question.vote_score, answers_count, views_count, bookmarks_count and
+comments_count are adjusted with a single UPDATE ... SET x = x + 1 whenever
+one of their source rows is written (see qa/signals.py). Call the writes
+inside transaction.atomic() so the counter moves in the same transaction.
+
+recompute_question_counters() rebuilds every counter from the source
+tables in one UPDATE, it is used by the repair_question_counters command.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from qa.models import Question, QUESTION_COUNTER_FIELDS as COUNTER_FIELDS
+
+
+def bump_question_counters(question_id, **deltas):
+    """bump_question_counters(question.id, vote_score=1, answers_count=-1)"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if question_id is None or not deltas:
+        return
+    Question.objects.filter(pk=question_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def _count_of(queryset, question_field):
+    counted = queryset.filter(**{question_field: OuterRef('pk')}).order_by().values(
+        question_field).annotate(counted=Count('pk')).values('counted')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def recompute_question_counters(Question, QUpvote, QDownvote, Answer, BookmarkQuestion, CommentQ, queryset=None):
+    """Recompute the counters from the source tables. Returns the number of questions updated."""
+    if queryset is None:
+        queryset = Question.objects.all()
+    Viewers = Question.viewers.through
+    return queryset.update(
+        vote_score=_count_of(QUpvote.objects.all(), 'upvote_question_of') - _count_of(
+            QDownvote.objects.all(), 'downvote_question_of'),
+        answers_count=_count_of(Answer.objects.filter(is_deleted=False), 'questionans'),
+        views_count=_count_of(Viewers.objects.all(), 'question'),
+        bookmarks_count=_count_of(BookmarkQuestion.objects.all(), 'bookmarked_question'),
+        comments_count=_count_of(CommentQ.objects.filter(deleted=False), 'question_comment'),
+    )
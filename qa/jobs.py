@@ -0,0 +1,137 @@
+"""
+Scheduled jobs.
+
+Things which have to happen at a given time, like lifting a ban or ending
+a bounty, are rows of ScheduledJob (kind, object id, run_at) written in the
+same transaction as what they follow up on:
+
+    schedule_ban_end(ban)       # lifts the suspension when its time is up
+
+A single worker, `python manage.py run_scheduled_jobs`, claims the due jobs
+in batches and runs the function registered for their kind:
+
+    @job_type('end_ban')
+    def end_ban(ban_id):
+        ...
+
+Job functions get the object id and have to be idempotent: a job whose
+worker died is claimed again once its lease runs out, and a failing job is
+retried with backoff up to MAX_ATTEMPTS times. Jobs survive restarts, they
+are only rows until they are due.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BAN_DURATIONS, BannedUser, Bounty, ScheduledJob
+
+logger = logging.getLogger(__name__)
+
+# Jobs claimed per batch.
+BATCH_SIZE = 50
+# A claimed job nobody finished within this is claimed again.
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 5
+# Delay before the first retry, doubled after each failure.
+RETRY_DELAY = timedelta(minutes=1)
+
+BOUNTY_DURATION = timedelta(days=7)
+
+JOB_TYPES = {}
+
+
+def job_type(kind):
+    """Register the decorated function as the runner of the jobs of `kind`."""
+    def register(function):
+        JOB_TYPES[kind] = function
+        return function
+    return register
+
+
+def schedule(kind, object_id, run_at):
+    """Run the `kind` job of the object at `run_at`, replacing the one scheduled before."""
+    job, created = ScheduledJob.objects.update_or_create(
+        kind=kind, object_id=object_id,
+        defaults={'run_at': run_at, 'status': 'pending', 'attempts': 0, 'claimed_by': '',
+                  'locked_until': None, 'last_error': '', 'finished_at': None})
+    return job
+
+
+def claim_due(batch_size=BATCH_SIZE, now=None):
+    """Mark up to `batch_size` due jobs as running for this caller and return them."""
+    now = now or timezone.now()
+    due = ScheduledJob.objects.filter(
+        Q(status='pending') | Q(status='running', locked_until__lt=now), run_at__lte=now)
+    job_ids = list(due.order_by('run_at').values_list('pk', flat=True)[:batch_size])
+    if not job_ids:
+        return []
+    token = uuid.uuid4().hex
+    # Conditional UPDATE: of two workers claiming the same job only one matches it.
+    due.filter(pk__in=job_ids).update(
+        status='running', claimed_by=token, locked_until=now + LEASE, attempts=F('attempts') + 1)
+    return list(ScheduledJob.objects.filter(claimed_by=token, status='running').order_by('run_at'))
+
+
+def run_job(job):
+    """Run a claimed job and record how it went. Returns True if it succeeded."""
+    mine = ScheduledJob.objects.filter(pk=job.pk, claimed_by=job.claimed_by)
+    try:
+        function = JOB_TYPES.get(job.kind)
+        if function is None:
+            raise LookupError(f'No job type {job.kind}')
+        with transaction.atomic():
+            function(job.object_id)
+            mine.update(status='done', finished_at=timezone.now(), locked_until=None, last_error='')
+        return True
+    except Exception as e:
+        logger.exception(f'Job {job} failed')
+        if job.attempts >= MAX_ATTEMPTS:
+            mine.update(status='failed', finished_at=timezone.now(), locked_until=None, last_error=str(e))
+        else:
+            mine.update(status='pending', locked_until=None, last_error=str(e),
+                        run_at=timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1))
+        return False
+
+
+def run_due(batch_size=BATCH_SIZE):
+    """Claim and run one batch of due jobs. Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    for job in claim_due(batch_size):
+        if run_job(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
+
+
+# JOB TYPES
+
+
+@job_type('end_ban')
+def end_ban(ban_id):
+    # BannedUser.is_banned is True once the suspension is over.
+    BannedUser.objects.filter(pk=ban_id, is_banned=False).update(is_banned=True)
+
+
+def schedule_ban_end(ban):
+    return schedule('end_ban', ban.pk, ban.baned_at + BAN_DURATIONS[ban.ban_till])
+
+
+@job_type('end_bounty')
+def end_bounty(bounty_id):
+    bounty = Bounty.objects.select_related('question_bounty').filter(pk=bounty_id).first()
+    if bounty is None:
+        return
+    question = bounty.question_bounty
+    # A bounty set on the question since then runs on.
+    if question.is_bountied and not Bounty.objects.filter(question_bounty=question, pk__gt=bounty.pk).exists():
+        question.is_bountied = False
+        question.save()
+
+
+def schedule_bounty_end(bounty):
+    return schedule('end_bounty', bounty.pk, bounty.date + BOUNTY_DURATION)
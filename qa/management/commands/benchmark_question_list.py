@@ -0,0 +1,120 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from taggit.models import Tag
+
+from qa.models import Question, Answer
+from qa.question_query import QuestionQuery, PAGE_SIZE, encode_cursor
+
+TAGS = ['python', 'django', 'javascript', 'sql', 'css']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compare the old /questions querysets (Paginator, COUNT, JOIN + GROUP BY) with '
+            'qa.question_query (keyset pages) on a seeded dataset. Everything is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=20000)
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 1000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['questions'])
+                self.run(options['pages'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        owner, created = User.objects.get_or_create(username='question_list_benchmark')
+        now = timezone.now()
+        questions = Question.objects.bulk_create([
+            Question(post_owner=owner, title=f'Benchmark question {i}', body='Benchmark',
+                     is_bountied=i % 17 == 0, vote_score=random.randint(-5, 50))
+            for i in range(count)], batch_size=1000)
+        for i, question in enumerate(questions):
+            question.date = now - timedelta(minutes=count - i)
+            question.active_date = question.date + timedelta(minutes=random.randint(0, 600))
+            question.bounty_date_announced = question.date
+        Question.objects.bulk_update(questions, ['date', 'active_date', 'bounty_date_announced'], batch_size=1000)
+
+        answered = [question for question in questions if random.random() < 0.6]
+        answers = Answer.objects.bulk_create([
+            Answer(answer_owner=owner, questionans=question, body='Benchmark', accepted=random.random() < 0.4)
+            for question in answered], batch_size=1000)
+        accepted = {answer.questionans_id for answer in answers if answer.accepted}
+        Question.objects.filter(pk__in=[question.pk for question in answered]).update(answers_count=1)
+        Question.objects.filter(pk__in=accepted).update(is_answer_accepted=True)
+
+        tags = [Tag.objects.get_or_create(name=name)[0] for name in TAGS]
+        content_type = ContentType.objects.get_for_model(Question)
+        Question.tags.through.objects.bulk_create([
+            Question.tags.through(object_id=question.pk, content_type=content_type, tag=tag)
+            for question in questions for tag in random.sample(tags, 2)], batch_size=1000)
+        self.stdout.write(f'Seeded {count} questions, {len(answers)} answers')
+
+    def scenarios(self):
+        """(name, old queryset, equivalent QuestionQuery)"""
+        return [
+            ('default list',
+             Question.objects.filter(is_deleted=False, is_bountied=False).order_by('-date'),
+             QuestionQuery()),
+            ('Newest + tag + NoAnswers',
+             Question.objects.filter(tags__name__icontains='py', is_deleted=False).annotate(
+                 answers=Count('answer')).filter(answers=0).order_by('-date'),
+             QuestionQuery('Newest', ['NoAnswers'], 'py')),
+            ('RecentActivity + NoAcceptedAnswer',
+             Question.objects.filter(answer__accepted=False, is_deleted=False).distinct().order_by('-active_date'),
+             QuestionQuery('RecentActivity', ['NoAcceptedAnswer'])),
+            ('MostVotes',
+             Question.objects.exclude(is_bountied=True, is_deleted=True).annotate(
+                 mostVotes=Count('qupvote')).order_by('-mostVotes'),
+             QuestionQuery('MostVotes')),
+        ]
+
+    def measure(self, repeat, function):
+        best = None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                function()
+                elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(queries)
+
+    def run(self, pages, repeat):
+        self.stdout.write(f"{'scenario':36} {'page':>6} {'paginator ms':>14} {'keyset ms':>11}")
+        for name, old_queryset, query in self.scenarios():
+            ordered = query._ordered(query.queryset(), None, False)
+            field = query.sort_field[0]
+            for number in pages:
+                if number > Paginator(old_queryset, PAGE_SIZE).num_pages:
+                    continue
+                old_ms, old_queries = self.measure(
+                    repeat, lambda: list(Paginator(old_queryset, PAGE_SIZE).page(number)))
+
+                # The cursor a visitor following "Next" would hold on this page.
+                after = None
+                if number > 1:
+                    row = ordered[(number - 1) * PAGE_SIZE - 1]
+                    after = encode_cursor(getattr(row, field), row.pk)
+                new_ms, new_queries = self.measure(repeat, lambda: list(query.page(after=after)))
+
+                self.stdout.write(
+                    f'{name:36} {number:>6} {old_ms:>9.1f} ({old_queries}q) {new_ms:>6.1f} ({new_queries}q)')
+        self.stdout.write(self.style.SUCCESS('Done, the seeded rows were rolled back'))
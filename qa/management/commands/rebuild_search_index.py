@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from qa.models import Question, Answer, CommentQ
+from qa.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of questions, answers and comments'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = rebuild_index(Question, Answer, CommentQ)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} posts'))
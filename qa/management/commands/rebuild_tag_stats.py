@@ -0,0 +1,20 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from taggit.models import Tag, TaggedItem
+from qa.models import Question, TagStats
+from qa.tag_stats import recompute_tag_stats, invalidate_tag_index
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per tag question/answer counts and last activity (TagStats) from the tagged questions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tag_ids', nargs='*', type=int, help='Only rebuild these tags')
+
+    def handle(self, *args, **options):
+        tag_ids = options['tag_ids'] or None
+        with transaction.atomic():
+            rebuilt = recompute_tag_stats(Tag, TaggedItem, Question, TagStats, ContentType, tag_ids)
+        invalidate_tag_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the statistics of {rebuilt} tags'))
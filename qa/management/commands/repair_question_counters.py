@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from qa.models import Question, Answer, QUpvote, QDownvote, BookmarkQuestion, CommentQ
+from qa.counters import recompute_question_counters, COUNTER_FIELDS
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized Question counters (score, answers, views, bookmarks, comments) from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('question_ids', nargs='*', type=int, help='Only repair these questions')
+
+    def handle(self, *args, **options):
+        questions = Question.objects.all()
+        if options['question_ids']:
+            questions = questions.filter(pk__in=options['question_ids'])
+
+        with transaction.atomic():
+            before = set(questions.values_list('pk', *COUNTER_FIELDS))
+            updated = recompute_question_counters(
+                Question, QUpvote, QDownvote, Answer, BookmarkQuestion, CommentQ, questions)
+            after = set(questions.values_list('pk', *COUNTER_FIELDS))
+
+        drifted = len(after - before)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed counters of {updated} questions, {drifted} were out of sync'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from qa.jobs import BATCH_SIZE, run_due
+
+
+class Command(BaseCommand):
+    help = 'Run the due scheduled jobs (ban and bounty ends), polling for new ones until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run what is due now and exit')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Jobs claimed at a time')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between polls when nothing is due')
+
+    def handle(self, *args, **options):
+        total_succeeded = total_failed = 0
+        while True:
+            succeeded, failed = run_due(options['batch_size'])
+            total_succeeded += succeeded
+            total_failed += failed
+            if succeeded or failed:
+                self.stdout.write(f'{succeeded} jobs done, {failed} failed')
+            if options['once']:
+                if not (succeeded or failed):
+                    break
+                continue
+            if not (succeeded or failed):
+                close_old_connections()
+                time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'{total_succeeded} jobs done, {total_failed} failed'))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:11
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, question_field):
+    counted = queryset.filter(**{question_field: OuterRef('pk')}).order_by().values(
+        question_field).annotate(counted=Count('pk')).values('counted')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def fill_question_counters(apps, schema_editor):
+    # Frozen copy of qa.counters.recompute_question_counters().
+    Question = apps.get_model('qa', 'Question')
+    QUpvote = apps.get_model('qa', 'QUpvote')
+    QDownvote = apps.get_model('qa', 'QDownvote')
+    Answer = apps.get_model('qa', 'Answer')
+    BookmarkQuestion = apps.get_model('qa', 'BookmarkQuestion')
+    CommentQ = apps.get_model('qa', 'CommentQ')
+    Question.objects.update(
+        vote_score=_count_of(QUpvote.objects.all(), 'upvote_question_of') - _count_of(
+            QDownvote.objects.all(), 'downvote_question_of'),
+        answers_count=_count_of(Answer.objects.filter(is_deleted=False), 'questionans'),
+        views_count=_count_of(Question.viewers.through.objects.all(), 'question'),
+        bookmarks_count=_count_of(BookmarkQuestion.objects.all(), 'bookmarked_question'),
+        comments_count=_count_of(CommentQ.objects.filter(deleted=False), 'question_comment'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0004_historicalquestion_community_question_community'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='bookmarks_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='views_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='vote_score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_question_counters, migrations.RunPython.noop),
+    ]
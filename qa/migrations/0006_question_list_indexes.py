@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_communityjoinrequest'),
+        ('qa', '0005_question_counters'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-date', '-id'], name='question_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-active_date', '-id'], name='question_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['-vote_score', '-id'], name='question_votes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['is_bountied', 'bounty_date_announced', 'id'], name='question_bounty_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Frozen copy of the SQLite FTS5 table of qa.search.sqlite, filled the way
+# its rebuild() does. The PostgreSQL backend has no table of its own.
+TABLE = 'qa_search_index'
+QUESTION, ANSWER, COMMENT = 1, 2, 3
+
+
+def _documents(apps):
+    """(rowid, question_id, title, body) of every searchable post."""
+    Question = apps.get_model('qa', 'Question')
+    Answer = apps.get_model('qa', 'Answer')
+    CommentQ = apps.get_model('qa', 'CommentQ')
+    for question in Question.objects.filter(is_deleted=False).only('title', 'body').iterator():
+        yield question.pk * 4 + QUESTION, question.pk, question.title or '', question.body or ''
+    for answer in Answer.objects.filter(is_deleted=False).only('questionans', 'body').iterator():
+        yield answer.pk * 4 + ANSWER, answer.questionans_id, '', answer.body or ''
+    for comment in CommentQ.objects.filter(deleted=False).select_related('answer_comment').only(
+            'question_comment', 'answer_comment__questionans', 'comment').iterator():
+        if comment.question_comment_id or comment.answer_comment_id:
+            question_id = comment.question_comment_id or comment.answer_comment.questionans_id
+            yield comment.pk * 4 + COMMENT, question_id, '', comment.comment or ''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "question_id UNINDEXED, title, body, tokenize='porter unicode61')")
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, question_id, title, body) VALUES (%s, %s, %s, %s)',
+            list(_documents(apps)))
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0006_question_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_tag_stats(apps, schema_editor):
+    # Frozen copy of qa.tag_stats.recompute_tag_stats() for every tag.
+    Tag = apps.get_model('taggit', 'Tag')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Question = apps.get_model('qa', 'Question')
+    TagStats = apps.get_model('qa', 'TagStats')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    totals = {tag_id: [0, 0, None] for tag_id in Tag.objects.values_list('pk', flat=True)}
+
+    content_type = ContentType.objects.filter(app_label='qa', model='question').first()
+    if content_type is not None and totals:
+        questions = {pk: (answers, active) for pk, answers, active in Question.objects.filter(
+            is_deleted=False).values_list('pk', 'answers_count', 'active_date')}
+        for tag_id, object_id in TaggedItem.objects.filter(content_type=content_type).values_list('tag_id', 'object_id'):
+            if object_id not in questions:
+                continue
+            answers, active = questions[object_id]
+            total = totals[tag_id]
+            total[0] += 1
+            total[1] += answers
+            if total[2] is None or active > total[2]:
+                total[2] = active
+
+    TagStats.objects.all().delete()
+    TagStats.objects.bulk_create([
+        TagStats(tag_id=tag_id, question_count=question_count, answer_count=answer_count, last_activity=active)
+        for tag_id, (question_count, answer_count, active) in totals.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0007_search_index'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='taggit.tag')),
+                ('question_count', models.IntegerField(default=0)),
+                ('answer_count', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-question_count', 'tag'], name='tag_stats_popular_idx')],
+            },
+        ),
+        migrations.RunPython(fill_tag_stats, migrations.RunPython.noop),
+    ]
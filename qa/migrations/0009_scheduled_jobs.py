@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:46
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Frozen copies of qa.models.BAN_DURATIONS and qa.jobs.BOUNTY_DURATION.
+BAN_DURATIONS = {
+    '3_DAYS': timedelta(days=3),
+    '7_DAYS': timedelta(days=7),
+    '15_DAYS': timedelta(days=15),
+    '30_DAYS': timedelta(days=30),
+    '2_MONTHS': timedelta(days=60),
+    '6_MONTHS': timedelta(days=180),
+    '1_YEAR': timedelta(days=365),
+    '4_YEARS': timedelta(days=4 * 365),
+}
+BOUNTY_DURATION = timedelta(days=7)
+
+
+def schedule_pending_jobs(apps, schema_editor):
+    """Jobs for the bans and bounties running now, which had a thread each before."""
+    BannedUser = apps.get_model('qa', 'BannedUser')
+    Bounty = apps.get_model('qa', 'Bounty')
+    Question = apps.get_model('qa', 'Question')
+    ScheduledJob = apps.get_model('qa', 'ScheduledJob')
+    jobs = [
+        ScheduledJob(kind='end_ban', object_id=ban.pk, run_at=ban.baned_at + BAN_DURATIONS.get(ban.ban_till, timedelta(0)))
+        for ban in BannedUser.objects.filter(is_banned=False)
+    ]
+    bountied = Question.objects.filter(is_bountied=True).values('pk')
+    latest = {}
+    for bounty in Bounty.objects.filter(question_bounty__in=bountied).order_by('pk'):
+        latest[bounty.question_bounty_id] = bounty
+    jobs += [ScheduledJob(kind='end_bounty', object_id=bounty.pk, run_at=bounty.date + BOUNTY_DURATION)
+             for bounty in latest.values()]
+    ScheduledJob.objects.bulk_create(jobs, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0008_tag_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('run_at', models.DateTimeField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=32)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_at'], name='scheduled_job_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='scheduled_job_unique')],
+            },
+        ),
+        migrations.RunPython(schedule_pending_jobs, migrations.RunPython.noop),
+    ]
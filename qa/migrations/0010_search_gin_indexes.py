@@ -0,0 +1,43 @@
+from django.db import migrations
+
+# GIN expression indexes on the tsvectors qa.search.postgres searches, only
+# on PostgreSQL: the SQLite backend has its own FTS5 table. The vectors are
+# a frozen copy of qa.search.postgres.vectors(), the indexes are only used
+# while the two match.
+
+
+def _indexes(apps):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+    vectors = {
+        'question': SearchVector('title', weight='A', config='english') + SearchVector('body', weight='B', config='english'),
+        'answer': SearchVector('body', weight='B', config='english'),
+        'commentq': SearchVector('comment', weight='C', config='english'),
+    }
+    for model_name, vector in vectors.items():
+        yield apps.get_model('qa', model_name), GinIndex(vector, name=f'{model_name}_search_gin_idx')
+
+
+def create_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _indexes(apps):
+        schema_editor.add_index(model, index)
+
+
+def drop_gin_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for model, index in _indexes(apps):
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('qa', '0009_scheduled_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_gin_indexes, drop_gin_indexes),
+    ]
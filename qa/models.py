@@ -27,6 +27,9 @@ ACTIVE_FOR_CHOICES = [
 ]
 
 
+QUESTION_COUNTER_FIELDS = ['vote_score', 'answers_count', 'views_count', 'bookmarks_count', 'comments_count']
+
+
 class Question(models.Model):
     post_owner = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=5000, default='')
@@ -46,7 +49,7 @@ class Question(models.Model):
     is_protected = models.BooleanField(default=False)
     why_editing_question = models.CharField(max_length=5000, default='')
     is_deleted = models.BooleanField(default=False)
-    history = HistoricalRecords(related_name='his')
+    history = HistoricalRecords(related_name='his', excluded_fields=QUESTION_COUNTER_FIELDS)
     answeredOnMinusTwo_Downvote = models.DateTimeField(auto_now_add=True)
     is_closed = models.BooleanField(default=False)
     closed_at = models.DateTimeField(auto_now_add=True, blank=True)
@@ -60,10 +63,36 @@ class Question(models.Model):
 
     deleted_time = models.DateTimeField(auto_now_add=True, blank=True)
 
+    # Denormalized counters, kept up to date by qa/signals.py on every vote,
+    # answer, view, bookmark and comment write. Rebuild them with
+    # `python manage.py repair_question_counters`.
+    vote_score = models.IntegerField(default=0)
+    answers_count = models.IntegerField(default=0)
+    views_count = models.IntegerField(default=0)
+    bookmarks_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+
+    tracker = FieldTracker(fields=['is_deleted'])
 
 
     class Meta:
         ordering = ["-date"]
+        # Keyset pagination of the question list, see qa/question_query.py
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='question_newest_idx'),
+            models.Index(fields=['-active_date', '-id'], name='question_active_idx'),
+            models.Index(fields=['-vote_score', '-id'], name='question_votes_idx'),
+            models.Index(fields=['is_bountied', 'bounty_date_announced', 'id'], name='question_bounty_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The counters are only ever changed with UPDATE ... SET x = x + 1, never
+        # write back the (possibly stale) values this instance was loaded with.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in QUESTION_COUNTER_FIELDS]
+        super().save(*args, **kwargs)
 
     # def save(self, *args, **kwargs):
     #     if not self.slug:
@@ -80,21 +109,23 @@ class Question(models.Model):
 
     @property
     def count_answers(self):
-        return Answer.objects.filter(questionans=self).exclude(is_deleted=True).count()
+        return self.answers_count
 
     @property
     def calculate_UpVote_DownVote(self):
-        get_Upvotes = self.qupvote_set.count()
-        get_DownVotes = self.qdownvote_set.count()
-        return get_Upvotes - get_DownVotes
+        return self.vote_score
 
     @property
     def calculate_viewers(self):
-        return self.viewers.all().count()
+        return self.views_count
 
     @property
     def count_all_bookmarkers(self):
-        return self.bookmarkquestion_set.all().count()
+        return self.bookmarks_count
+
+    @property
+    def count_comments(self):
+        return self.comments_count
 
     @property
     def lastEdited_by(self):
@@ -190,6 +221,7 @@ class Answer(models.Model):
     is_wiki_answer = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
     deleted_time = models.DateTimeField(auto_now_add=True, blank=True)
+    tracker = FieldTracker(fields=['is_deleted', 'accepted'])
     # @property
     # def allVoteCal(self):
     #     return self.a_vote_ups.count.all() + self.a_vote_downs.count.all()
@@ -207,7 +239,7 @@ class Answer(models.Model):
 
     @property
     def count_ViewsOf_Q(self):
-        return self.questionans.viewers.all().count()
+        return self.questionans.views_count
 
     # @property
     # def get_prev_record_diff(self):   
@@ -232,6 +264,7 @@ class CommentQ(models.Model):
     com_upvote = models.ManyToManyField(User, related_name='comm_upvote', blank=True)
     com_upvote_time = models.DateTimeField(auto_now_add=True)
     history = HistoricalRecords(related_name='commentHis')
+    tracker = FieldTracker(fields=['deleted'])
 
     def __str__(self):
         if self.question_comment:
@@ -331,6 +364,8 @@ class Reputation(models.Model):
     reputation_on_what = models.CharField(max_length=30, choices=REPUTATION_CHOICES, default='')
     date_earned = models.DateTimeField(auto_now_add=True)
 
+    tracker = FieldTracker(fields=['awarded_to', 'question_rep_C', 'answer_rep_C'])
+
     def __str__(self):
         if self.question_rep_C != 0 and self.answer_rep_C == 0:
             return f'[REPUTATION] - {self.question_rep_C} = {self.question_O.title}'
@@ -372,6 +407,52 @@ class BannedUser(models.Model):
         return f"{self.user} - {self.banned_reasons} - {self.ban_till}"
 
 
+# How long each BAN_TILL_CHOICES suspension lasts.
+BAN_DURATIONS = {
+    '3_DAYS': timedelta(days=3),
+    '7_DAYS': timedelta(days=7),
+    '15_DAYS': timedelta(days=15),
+    '30_DAYS': timedelta(days=30),
+    '2_MONTHS': timedelta(days=60),
+    '6_MONTHS': timedelta(days=180),
+    '1_YEAR': timedelta(days=365),
+    '4_YEARS': timedelta(days=4 * 365),
+}
+
+
+class ScheduledJob(models.Model):
+    """
+    Something to do to a row at a given time (end a ban, end a bounty),
+    one job per kind and row. Run by the run_scheduled_jobs command, see
+    qa/jobs.py.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    run_at = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    # Worker run holding the job and until when, a crashed run's jobs are claimed again after.
+    claimed_by = models.CharField(max_length=32, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='scheduled_job_unique')]
+        indexes = [models.Index(fields=['status', 'run_at'], name='scheduled_job_due_idx')]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} at {self.run_at} - {self.status}"
+
+
 # Post Sharing Models
 class PostShare(models.Model):
     """Model for sharing posts with followers"""
@@ -410,3 +491,21 @@ class PostLike(models.Model):
     def __str__(self):
         post_type = 'Question' if self.question else 'Answer'
         return f"{self.user.username} liked a {post_type}"
+
+
+class TagStats(models.Model):
+    """
+    Per tag totals over the live (not deleted) questions, kept up to date by
+    qa/signals.py when questions are tagged, retagged, answered or deleted.
+    Rebuild them with `python manage.py rebuild_tag_stats`.
+    """
+    tag = models.OneToOneField('taggit.Tag', on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    question_count = models.IntegerField(default=0)
+    answer_count = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-question_count', 'tag'], name='tag_stats_popular_idx')]
+
+    def __str__(self):
+        return f'{self.tag_id} - {self.question_count} questions - {self.answer_count} answers'
@@ -0,0 +1,174 @@
+"""
+Question list query builder.
+
+The /questions page combines a sort (sortId), any number of filters
+(filterId) and a tag query (tagQuery). QuestionQuery turns those request
+parameters into one queryset, the filters use the denormalized columns
+(answers_count, is_answer_accepted, is_bountied) so no JOIN, GROUP BY or
+DISTINCT is needed:
+
+    query = QuestionQuery.from_request(request)
+    page = query.page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+Pages are keyset (cursor) paginated on (sort key, id): the next page is
+"rows after the last row of this one", which costs the same on page 1000 as
+on page 1, and no COUNT(*) is run.
+"""
+import base64
+import json
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Question
+
+# sortId -> (field, descending)
+SORTS = {
+    'Newest': ('date', True),
+    'RecentActivity': ('active_date', True),
+    'MostVotes': ('vote_score', True),
+    'BountyEndingSoon': ('bounty_date_announced', False),
+}
+
+FILTERS = {
+    'NoAnswers': Q(answers_count=0),
+    'NoAcceptedAnswer': Q(is_answer_accepted=False),
+    'Bounty': Q(is_bountied=True),
+}
+
+# Bounties run for a day, "ending soon" are the ones announced 23 hours ago.
+BOUNTY_ENDING_AFTER = timedelta(hours=23)
+
+PAGE_SIZE = 5
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, field):
+    """Return (value, pk) of a cursor, None if it can't be read."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, pk = json.loads(raw)
+        return field.to_python(value), int(pk)
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+class KeysetPage:
+    """One page of a keyset paginated queryset."""
+
+    def __init__(self, object_list, has_next, has_previous, first_query, next_query, previous_query):
+        self.object_list = object_list
+        self.first_query = first_query
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_query = next_query
+        self.previous_query = previous_query
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class QuestionQuery:
+
+    def __init__(self, sort=None, filters=(), tag_query=''):
+        self.sort = sort if sort in SORTS else None
+        self.filters = [name for name in FILTERS if name in filters]
+        self.tag_query = (tag_query or '').strip()
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.POST if request.method == 'POST' else request.GET
+        return cls(
+            sort=params.get('sortId'),
+            filters=params.getlist('filterId'),
+            tag_query=params.get('tagQuery'))
+
+    @property
+    def sort_field(self):
+        return SORTS[self.sort or 'Newest']
+
+    def params(self):
+        """The request parameters which rebuild this query, for page links."""
+        params = []
+        if self.sort:
+            params.append(('sortId', self.sort))
+        params.extend(('filterId', name) for name in self.filters)
+        if self.tag_query:
+            params.append(('tagQuery', self.tag_query))
+        return params
+
+    def queryset(self):
+        questions = Question.objects.filter(is_deleted=False)
+        if self.sort is None and not self.filters:
+            # The plain question list leaves the bountied questions to their own tab.
+            questions = questions.filter(is_bountied=False)
+        if self.sort == 'BountyEndingSoon':
+            questions = questions.filter(
+                is_bountied=True, bounty_date_announced__lt=timezone.now() - BOUNTY_ENDING_AFTER)
+        for name in self.filters:
+            questions = questions.filter(FILTERS[name])
+        if self.tag_query:
+            # EXISTS instead of a JOIN on the tags, a question matching
+            # several tags must not be listed several times.
+            tagged = Question.tags.through.objects.filter(
+                content_type=ContentType.objects.get_for_model(Question),
+                object_id=OuterRef('pk'),
+                tag__name__icontains=self.tag_query)
+            questions = questions.filter(Exists(tagged))
+        return questions
+
+    def _ordered(self, questions, cursor, backwards):
+        field, descending = self.sort_field
+        if backwards:
+            descending = not descending
+        prefix = '-' if descending else ''
+        if cursor is not None:
+            value, pk = cursor
+            lookup = 'lt' if descending else 'gt'
+            questions = questions.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': pk}))
+        return questions.order_by(f'{prefix}{field}', f'{prefix}pk')
+
+    def _link(self, row, direction):
+        field, descending = self.sort_field
+        return urlencode(self.params() + [(direction, encode_cursor(getattr(row, field), row.pk))])
+
+    def page(self, after=None, before=None, size=PAGE_SIZE):
+        """
+        The page following the `after` cursor, or preceding the `before`
+        cursor, the first page without either.
+        """
+        field = Question._meta.get_field(self.sort_field[0])
+        backwards = bool(before) and not after
+        cursor = decode_cursor(before if backwards else after, field) if (after or before) else None
+
+        rows = list(self._ordered(self.queryset(), cursor, backwards)[:size + 1])
+        more = len(rows) > size
+        rows = rows[:size]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = cursor is not None, more
+        else:
+            has_next, has_previous = more, cursor is not None
+
+        return KeysetPage(
+            rows,
+            has_next=has_next,
+            has_previous=has_previous,
+            first_query=urlencode(self.params()),
+            next_query=self._link(rows[-1], 'after') if has_next and rows else '',
+            previous_query=self._link(rows[0], 'before') if has_previous and rows else '')
@@ -0,0 +1,100 @@
+"""
+Full-text search over questions, answers and comments.
+
+Every post is a document of the search index, kept in sync by the signals
+in qa/signals.py (create, edit, soft delete and delete). The backend is
+picked from the database engine:
+
+    sqlite      qa.search.sqlite.SQLiteFTS5Backend  (FTS5 table, BM25 ranking)
+    postgresql  qa.search.postgres.PostgresBackend  (tsvector, ts_rank)
+
+Both implement the same methods, so callers only use the functions below:
+
+    hits, has_more = search_posts('python decorators', offset=0, limit=10)
+
+A hit is the best matching document of a question, results are ranked
+and come with a highlighted snippet. `python manage.py rebuild_search_index`
+rebuilds the whole index from the post tables.
+"""
+from collections import namedtuple
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+QUESTION = 'question'
+ANSWER = 'answer'
+COMMENT = 'comment'
+
+# Snippet highlight markers, replaced by <mark> once the snippet is escaped.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SearchDocument = namedtuple('SearchDocument', ['kind', 'object_id', 'question_id', 'title', 'body'])
+SearchHit = namedtuple('SearchHit', ['question_id', 'kind', 'object_id', 'score', 'snippet'])
+
+
+def highlight(snippet):
+    """Escape a backend snippet and turn its markers into <mark> tags."""
+    return mark_safe(escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def question_document(question):
+    return SearchDocument(QUESTION, question.pk, question.pk, question.title, question.body)
+
+
+def answer_document(answer):
+    return SearchDocument(ANSWER, answer.pk, answer.questionans_id, '', answer.body)
+
+
+def comment_document(comment, question_id=None):
+    if question_id is None:
+        question_id = comment.question_comment_id or comment.answer_comment.questionans_id
+    return SearchDocument(COMMENT, comment.pk, question_id, '', comment.comment)
+
+
+def all_documents(Question, Answer, CommentQ):
+    """Every searchable post, for rebuilding the index."""
+    for question in Question.objects.filter(is_deleted=False).only('title', 'body').iterator():
+        yield question_document(question)
+    for answer in Answer.objects.filter(is_deleted=False).only('questionans', 'body').iterator():
+        yield answer_document(answer)
+    for comment in CommentQ.objects.filter(deleted=False).select_related('answer_comment').only(
+            'question_comment', 'answer_comment__questionans', 'comment').iterator():
+        if comment.question_comment_id or comment.answer_comment_id:
+            yield comment_document(comment)
+
+
+_backends = {}
+
+
+def get_backend():
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'postgresql':
+            from .postgres import PostgresBackend
+            _backends[vendor] = PostgresBackend()
+        else:
+            from .sqlite import SQLiteFTS5Backend
+            _backends[vendor] = SQLiteFTS5Backend()
+    return _backends[vendor]
+
+
+def index_documents(documents):
+    get_backend().index(documents)
+
+
+def remove_document(kind, object_id):
+    get_backend().remove(kind, object_id)
+
+
+def search_posts(query, offset=0, limit=10):
+    """Return ([SearchHit], has_more), one hit per question, best first."""
+    if not query or not query.strip():
+        return [], False
+    hits = get_backend().search(query, offset, limit + 1)
+    return hits[:limit], len(hits) > limit
+
+
+def rebuild_index(Question, Answer, CommentQ):
+    return get_backend().rebuild(all_documents(Question, Answer, CommentQ))
@@ -0,0 +1,80 @@
+"""
+PostgreSQL search backend.
+
+Plug-compatible with the SQLite FTS5 backend. The tsvectors are computed
+from the post tables at query time, so index()/remove() have nothing to
+keep in sync; the GIN expression indexes of migration qa 0010_search_gin_indexes
+are built on a copy of vectors(), the planner only uses them while the two
+match.
+"""
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import OuterRef, Subquery
+
+from . import QUESTION, ANSWER, COMMENT, MARK_START, MARK_END, SearchHit, highlight
+
+# A fixed text search configuration: to_tsvector() is only indexable with one.
+CONFIG = 'english'
+
+
+def vectors():
+    """{(app label, model name): tsvector expression} of the searchable tables."""
+    return {
+        ('qa', 'question'): SearchVector('title', weight='A', config=CONFIG) + SearchVector('body', weight='B', config=CONFIG),
+        ('qa', 'answer'): SearchVector('body', weight='B', config=CONFIG),
+        ('qa', 'commentq'): SearchVector('comment', weight='C', config=CONFIG),
+    }
+
+
+class PostgresBackend:
+
+    def create(self):
+        pass
+
+    def drop(self):
+        pass
+
+    def index(self, documents):
+        pass
+
+    def remove(self, kind, object_id):
+        pass
+
+    def rebuild(self, documents, batch_size=1000):
+        return sum(1 for document in documents)
+
+    def _ranked(self, queryset, vector, text_field, search_query, question_field, count):
+        """The `count` best matching questions of the queryset, each with its best matching row."""
+        matching = queryset.annotate(search=vector, rank=SearchRank(vector, search_query)).filter(search=search_query)
+        best_of_question = matching.filter(**{question_field: OuterRef(question_field)}).order_by('-rank', 'pk')
+        return matching.filter(pk=Subquery(best_of_question.values('pk')[:1])).annotate(
+            snippet=SearchHeadline(text_field, search_query, config=CONFIG, start_sel=MARK_START, stop_sel=MARK_END),
+        ).order_by('-rank', 'pk').values_list('pk', question_field, 'rank', 'snippet')[:count]
+
+    def search(self, query, offset, limit):
+        from qa.models import Question, Answer, CommentQ
+
+        search_query = SearchQuery(query, search_type='websearch', config=CONFIG)
+        count = offset + limit
+        table_vectors = vectors()
+        found = []
+        for kind, queryset, vector, text_field, question_field in (
+                (QUESTION, Question.objects.filter(is_deleted=False),
+                 table_vectors[('qa', 'question')], 'body', 'pk'),
+                (ANSWER, Answer.objects.filter(is_deleted=False, questionans__is_deleted=False),
+                 table_vectors[('qa', 'answer')], 'body', 'questionans_id'),
+                (COMMENT, CommentQ.objects.filter(deleted=False, question_comment__is_deleted=False),
+                 table_vectors[('qa', 'commentq')], 'comment', 'question_comment_id'),
+                (COMMENT, CommentQ.objects.filter(deleted=False, answer_comment__is_deleted=False,
+                                                  answer_comment__questionans__is_deleted=False),
+                 table_vectors[('qa', 'commentq')], 'comment', 'answer_comment__questionans_id')):
+            found.extend(
+                SearchHit(question_id, kind, pk, rank, highlight(snippet))
+                for pk, question_id, rank, snippet in self._ranked(
+                    queryset, vector, text_field, search_query, question_field, count))
+
+        # Every list holds distinct questions, so the `count` best of them all
+        # are among the `count` best of each: the page is never short.
+        best = {}
+        for hit in sorted(found, key=lambda hit: -hit.score):
+            best.setdefault(hit.question_id, hit)
+        return list(best.values())[offset:offset + limit]
@@ -0,0 +1,114 @@
+"""
+SQLite FTS5 search backend.
+
+One FTS5 table holds every document. The rowid encodes the document
+(object_id * 4 + kind), so a document is replaced or removed by rowid
+without scanning the table. Ranking is BM25 with the title weighted
+above the body.
+"""
+import re
+
+from django.db import connection
+
+from . import QUESTION, ANSWER, COMMENT, MARK_START, MARK_END, SearchHit, highlight
+
+TABLE = 'qa_search_index'
+KINDS = {QUESTION: 1, ANSWER: 2, COMMENT: 3}
+KIND_NAMES = {code: kind for kind, code in KINDS.items()}
+
+# bm25() weights of the question_id, title and body columns.
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "question_id UNINDEXED, title, body, tokenize='porter unicode61')")
+DROP_TABLE = f'DROP TABLE IF EXISTS {TABLE}'
+
+# bm25()/snippet() can't be used inside a window function, the ranking
+# happens in the innermost query. Answers and comments of deleted questions
+# stay indexed, they are filtered out there too, before the page is cut.
+SEARCH = f"""
+    SELECT rowid, question_id, score, snip FROM (
+        SELECT rowid, question_id, score, snip,
+               ROW_NUMBER() OVER (PARTITION BY question_id ORDER BY score) AS position
+        FROM (
+            SELECT rowid, question_id,
+                   bm25({TABLE}, 0.0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score,
+                   snippet({TABLE}, -1, %s, %s, '…', 24) AS snip
+            FROM {TABLE} WHERE {TABLE} MATCH %s
+            AND question_id IN (SELECT id FROM qa_question WHERE is_deleted = 0)))
+    WHERE position = 1
+    ORDER BY score
+    LIMIT %s OFFSET %s
+"""
+
+
+def document_rowid(kind, object_id):
+    return object_id * 4 + KINDS[kind]
+
+
+def match_expression(text):
+    """
+    Turn what the user typed into an FTS5 query: every word must match,
+    the last one as a prefix (the user may still be typing it).
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+class SQLiteFTS5Backend:
+
+    def create(self):
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_TABLE)
+
+    def drop(self):
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_TABLE)
+
+    def _insert(self, cursor, documents):
+        rows = [(document_rowid(document.kind, document.object_id), document.question_id,
+                 document.title or '', document.body or '') for document in documents]
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, question_id, title, body) VALUES (%s, %s, %s, %s)', rows)
+        return len(rows)
+
+    def index(self, documents):
+        with connection.cursor() as cursor:
+            self._insert(cursor, documents)
+
+    def remove(self, kind, object_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [document_rowid(kind, object_id)])
+
+    def rebuild(self, documents, batch_size=1000):
+        """Replace the whole index, returns the number of documents indexed."""
+        indexed = 0
+        with connection.cursor() as cursor:
+            cursor.execute(DROP_TABLE)
+            cursor.execute(CREATE_TABLE)
+            batch = []
+            for document in documents:
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    indexed += self._insert(cursor, batch)
+                    batch = []
+            indexed += self._insert(cursor, batch)
+            cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        return indexed
+
+    def search(self, query, offset, limit):
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(SEARCH, [MARK_START, MARK_END, expression, limit, offset])
+            rows = cursor.fetchall()
+        # bm25() is lower for better matches, hits carry "higher is better" scores.
+        return [SearchHit(int(question_id), KIND_NAMES[rowid % 4], rowid // 4, -score, highlight(snippet))
+                for rowid, question_id, score, snippet in rows]
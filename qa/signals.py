@@ -0,0 +1,205 @@
+from django.db.models.signals import post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.contrib.contenttypes.models import ContentType
+from taggit.models import Tag
+from .models import Question, Answer, QUpvote, QDownvote, BookmarkQuestion, CommentQ, TagStats
+from .counters import bump_question_counters, recompute_question_counters
+from .search import QUESTION, ANSWER, COMMENT, index_documents, remove_document
+from .search import question_document, answer_document, comment_document
+from .tag_stats import bump_tag_stats, question_tag_ids, recompute_tag_stats, invalidate_tag_index
+
+# QUESTION COUNTERS - START
+# Keep Question.vote_score/answers_count/views_count/bookmarks_count/comments_count
+# in step with their source tables.
+
+
+@receiver(post_save, sender=QUpvote)
+def question_upvoted(sender, instance, created, **kwargs):
+    if created:
+        bump_question_counters(instance.upvote_question_of_id, vote_score=1)
+
+
+@receiver(post_delete, sender=QUpvote)
+def question_upvote_removed(sender, instance, **kwargs):
+    bump_question_counters(instance.upvote_question_of_id, vote_score=-1)
+
+
+@receiver(post_save, sender=QDownvote)
+def question_downvoted(sender, instance, created, **kwargs):
+    if created:
+        bump_question_counters(instance.downvote_question_of_id, vote_score=-1)
+
+
+@receiver(post_delete, sender=QDownvote)
+def question_downvote_removed(sender, instance, **kwargs):
+    bump_question_counters(instance.downvote_question_of_id, vote_score=1)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_deleted:
+            bump_question_counters(instance.questionans_id, answers_count=1)
+    elif instance.tracker.has_changed('is_deleted'):
+        bump_question_counters(instance.questionans_id, answers_count=-1 if instance.is_deleted else 1)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_removed(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        bump_question_counters(instance.questionans_id, answers_count=-1)
+
+
+@receiver(post_save, sender=BookmarkQuestion)
+def question_bookmarked(sender, instance, created, **kwargs):
+    if created:
+        bump_question_counters(instance.bookmarked_question_id, bookmarks_count=1)
+
+
+@receiver(post_delete, sender=BookmarkQuestion)
+def question_bookmark_removed(sender, instance, **kwargs):
+    bump_question_counters(instance.bookmarked_question_id, bookmarks_count=-1)
+
+
+@receiver(post_save, sender=CommentQ)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        if not instance.deleted:
+            bump_question_counters(instance.question_comment_id, comments_count=1)
+    elif instance.tracker.has_changed('deleted'):
+        bump_question_counters(instance.question_comment_id, comments_count=-1 if instance.deleted else 1)
+
+
+@receiver(post_delete, sender=CommentQ)
+def comment_removed(sender, instance, **kwargs):
+    if not instance.deleted:
+        bump_question_counters(instance.question_comment_id, comments_count=-1)
+
+
+@receiver(m2m_changed, sender=Question.viewers.through)
+def question_viewers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # question.viewers.add(...) / user.viewed_posts.add(...)
+    if action in ('post_add', 'post_remove'):
+        delta = 1 if action == 'post_add' else -1
+        if reverse:
+            for question_id in pk_set:
+                bump_question_counters(question_id, views_count=delta)
+        else:
+            bump_question_counters(instance.pk, views_count=delta * len(pk_set))
+    elif action == 'post_clear':
+        # We don't know which rows were cleared, count them again.
+        questions = Question.objects.all() if reverse else Question.objects.filter(pk=instance.pk)
+        recompute_question_counters(Question, QUpvote, QDownvote, Answer, BookmarkQuestion, CommentQ, questions)
+
+# QUESTION COUNTERS - END
+
+
+# SEARCH INDEX - START
+# Keep the full-text search index (qa/search) in step with the posts,
+# soft deleted posts are taken out of the index.
+
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, **kwargs):
+    if instance.is_deleted:
+        remove_document(QUESTION, instance.pk)
+    else:
+        index_documents([question_document(instance)])
+
+
+@receiver(post_save, sender=Answer)
+def index_answer(sender, instance, **kwargs):
+    if instance.is_deleted:
+        remove_document(ANSWER, instance.pk)
+    else:
+        index_documents([answer_document(instance)])
+
+
+@receiver(post_save, sender=CommentQ)
+def index_comment(sender, instance, **kwargs):
+    if instance.deleted or not (instance.question_comment_id or instance.answer_comment_id):
+        remove_document(COMMENT, instance.pk)
+    else:
+        index_documents([comment_document(instance)])
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, **kwargs):
+    remove_document(QUESTION, instance.pk)
+
+
+@receiver(post_delete, sender=Answer)
+def unindex_answer(sender, instance, **kwargs):
+    remove_document(ANSWER, instance.pk)
+
+
+@receiver(post_delete, sender=CommentQ)
+def unindex_comment(sender, instance, **kwargs):
+    remove_document(COMMENT, instance.pk)
+
+# SEARCH INDEX - END
+
+
+# TAG STATS - START
+# Keep TagStats (qa/tag_stats.py) in step with the tags of the live questions.
+
+
+def _live_answers_count(question_id):
+    return Question.objects.filter(pk=question_id).values_list('answers_count', flat=True).first() or 0
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def question_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # question.tags.add/remove/set/clear(), also InlineTagEditForm.save_m2m()
+    if reverse or not isinstance(instance, Question):
+        return
+    if action == 'pre_clear':
+        instance._cleared_tag_ids = question_tag_ids(instance.pk)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear') or instance.is_deleted:
+        return
+    tag_ids = instance.__dict__.pop('_cleared_tag_ids', []) if action == 'post_clear' else pk_set
+    sign = 1 if action == 'post_add' else -1
+    bump_tag_stats(tag_ids, question_count=sign, answer_count=sign * _live_answers_count(instance.pk),
+                   touch=action == 'post_add')
+
+
+@receiver(post_save, sender=Question)
+def question_tag_stats(sender, instance, created, **kwargs):
+    if not created and instance.tracker.has_changed('is_deleted'):
+        sign = -1 if instance.is_deleted else 1
+        bump_tag_stats(question_tag_ids(instance.pk), question_count=sign,
+                       answer_count=sign * _live_answers_count(instance.pk))
+
+
+@receiver(pre_delete, sender=Question)
+def question_tags_before_delete(sender, instance, **kwargs):
+    instance._deleted_tag_ids = question_tag_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Question)
+def question_tags_deleted(sender, instance, **kwargs):
+    # The answers and tags went with the question in the same cascade, in no
+    # particular order, count its tags again rather than untangling the bumps.
+    tag_ids = instance.__dict__.pop('_deleted_tag_ids', [])
+    if tag_ids:
+        recompute_tag_stats(Tag, Question.tags.through, Question, TagStats, ContentType, tag_ids)
+        invalidate_tag_index()
+
+
+@receiver(post_save, sender=Answer)
+def answer_tag_stats(sender, instance, created, **kwargs):
+    if created:
+        if not instance.is_deleted:
+            bump_tag_stats(question_tag_ids(instance.questionans_id, live_only=True), answer_count=1, touch=True)
+    elif instance.tracker.has_changed('is_deleted'):
+        bump_tag_stats(question_tag_ids(instance.questionans_id, live_only=True),
+                       answer_count=-1 if instance.is_deleted else 1)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_tag_stats_removed(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        bump_tag_stats(question_tag_ids(instance.questionans_id, live_only=True), answer_count=-1)
+
+# TAG STATS - END
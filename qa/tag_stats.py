@@ -0,0 +1,170 @@
+"""
+Tag statistics and the tag autocomplete index.
+
+TagStats holds, per tag, the number of live questions carrying it, the
+number of live answers on those questions and when one of them was last
+tagged or answered. The rows are moved with UPDATE ... SET x = x + n by the
+signals in qa/signals.py, so the tag pages never count TaggedItem rows:
+
+    TagStats.objects.filter(question_count__gt=0).order_by('-question_count')
+
+recompute_tag_stats() rebuilds the rows from the source tables, it is used
+by the rebuild_tag_stats command.
+
+The autocomplete is served from TagPrefixIndex, a sorted in-memory list of
+the tag names. Every process keeps its own copy and reloads it (one query)
+when the generation number in the cache moves, which happens whenever a
+question count changes:
+
+    get_tag_index().complete('dja', limit=10)
+
+When the cache is unavailable the index is loaded for every lookup.
+"""
+import heapq
+import logging
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Question, TagStats
+
+logger = logging.getLogger(__name__)
+
+TAG_INDEX_GENERATION_KEY = 'tag_index:generation'
+
+TagEntry = namedtuple('TagEntry', ['id', 'name', 'question_count'])
+
+
+def question_tag_ids(question_id, live_only=False):
+    """Ids of the tags of a question, none if live_only and it is deleted."""
+    tagged = Question.tags.through.objects.filter(
+        content_type=ContentType.objects.get_for_model(Question), object_id=question_id)
+    if live_only:
+        tagged = tagged.filter(object_id__in=Question.objects.filter(pk=question_id, is_deleted=False).values('pk'))
+    return list(tagged.values_list('tag_id', flat=True))
+
+
+def bump_tag_stats(tag_ids, question_count=0, answer_count=0, touch=False):
+    """bump_tag_stats(tag_ids, question_count=1, answer_count=3, touch=True)"""
+    tag_ids = set(tag_ids or ())
+    updates = {field: F(field) + delta for field, delta in
+               (('question_count', question_count), ('answer_count', answer_count)) if delta}
+    if touch:
+        updates['last_activity'] = timezone.now()
+    if not tag_ids or not updates:
+        return
+
+    updated = TagStats.objects.filter(tag_id__in=tag_ids).update(**updates)
+    if updated < len(tag_ids):
+        # First use of a tag, its row doesn't exist yet.
+        existing = set(TagStats.objects.filter(tag_id__in=tag_ids).values_list('tag_id', flat=True))
+        missing = tag_ids - existing
+        TagStats.objects.bulk_create([TagStats(tag_id=tag_id) for tag_id in missing], ignore_conflicts=True)
+        TagStats.objects.filter(tag_id__in=missing).update(**updates)
+    if question_count:
+        invalidate_tag_index()
+
+
+def recompute_tag_stats(Tag, TaggedItem, Question, TagStats, ContentType, tag_ids=None):
+    """
+    Recompute the statistics of `tag_ids` (every tag if None) from the source
+    tables. Returns the number of tags written.
+    """
+    tags = Tag.objects.all() if tag_ids is None else Tag.objects.filter(pk__in=tag_ids)
+    totals = {tag_id: [0, 0, None] for tag_id in tags.values_list('pk', flat=True)}
+
+    content_type = ContentType.objects.filter(app_label='qa', model='question').first()
+    if content_type is not None and totals:
+        tagged = TaggedItem.objects.filter(content_type=content_type)
+        if tag_ids is not None:
+            tagged = tagged.filter(tag_id__in=totals)
+        tagged = list(tagged.values_list('tag_id', 'object_id'))
+        live = Question.objects.filter(is_deleted=False)
+        if tag_ids is not None:
+            live = live.filter(pk__in={object_id for tag_id, object_id in tagged})
+        questions = {pk: (answers, active) for pk, answers, active in live.values_list(
+            'pk', 'answers_count', 'active_date')}
+        for tag_id, object_id in tagged:
+            if object_id not in questions:
+                continue
+            answers, active = questions[object_id]
+            total = totals[tag_id]
+            total[0] += 1
+            total[1] += answers
+            if total[2] is None or active > total[2]:
+                total[2] = active
+
+    TagStats.objects.filter(tag_id__in=list(totals)).delete()
+    TagStats.objects.bulk_create([
+        TagStats(tag_id=tag_id, question_count=question_count, answer_count=answer_count, last_activity=active)
+        for tag_id, (question_count, answer_count, active) in totals.items()], batch_size=1000)
+    return len(totals)
+
+
+class TagPrefixIndex:
+    """Tag names sorted case-insensitively, completed by binary search."""
+
+    def __init__(self, entries):
+        entries = sorted((entry.name.lower(), entry) for entry in entries)
+        self._keys = [key for key, entry in entries]
+        self._entries = [entry for key, entry in entries]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def complete(self, prefix, limit=10):
+        """The `limit` most used tags starting with `prefix`, most used first."""
+        prefix = (prefix or '').strip().lower()
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\U0010ffff', lo=start)
+        return heapq.nsmallest(
+            limit, self._entries[start:end], key=lambda entry: (-entry.question_count, entry.name.lower()))
+
+
+def load_tag_index():
+    return TagPrefixIndex(
+        TagEntry(*row) for row in TagStats.objects.filter(question_count__gt=0).values_list(
+            'tag_id', 'tag__name', 'question_count'))
+
+
+_index_lock = threading.Lock()
+_index = None
+_index_generation = None
+
+
+def _generation():
+    return cache.get_or_set(TAG_INDEX_GENERATION_KEY, 1, None)
+
+
+def invalidate_tag_index():
+    """Make every process reload its index on its next lookup."""
+    try:
+        try:
+            cache.incr(TAG_INDEX_GENERATION_KEY)
+        except ValueError:
+            cache.set(TAG_INDEX_GENERATION_KEY, 1, None)
+    except Exception:
+        # Best effort, the tag statistics are written either way.
+        logger.warning('Invalidating the tag index failed', exc_info=True)
+
+
+def get_tag_index():
+    """The TagPrefixIndex of this process, reloaded if it is out of date."""
+    global _index, _index_generation
+    try:
+        generation = _generation()
+    except Exception:
+        # Without the generation the copy of this process can't be trusted.
+        logger.warning('Tag index generation unavailable', exc_info=True)
+        return load_tag_index()
+    if _index is None or _index_generation != generation:
+        with _index_lock:
+            if _index is None or _index_generation != generation:
+                _index = load_tag_index()
+                _index_generation = generation
+    return _index
@@ -44,14 +44,7 @@ Working -- Fine
 @register.filter
 def calculate_reputation(user_id):
     if user_id.is_authenticated:
-        getAlltheReputation = Reputation.objects.filter(
-                                awarded_to=user_id).aggregate(
-                                    Sum('answer_rep_C'),Sum('question_rep_C'))
-        Q_rep = getAlltheReputation['question_rep_C__sum']
-        final_Q_Rep = getAlltheReputation['question_rep_C__sum'] if Q_rep else 0
-        A_rep = getAlltheReputation['answer_rep_C__sum']
-        final_A_Rep = getAlltheReputation['answer_rep_C__sum'] if A_rep else 0
-        return final_Q_Rep + final_A_Rep
+        return user_id.profile.reputation
 
 
 # It will count and show all "Gold Badges" on profile right corner.
@@ -50,13 +50,11 @@ urlpatterns = [
 
 	path('answerTimeline/<int:answer_id>/', views.answerTimeline, name='answerTimeline'),
 
-	path('end_bounty_thread/<int:id>/', views.end_bounty_thread, name='end_bounty_thread'),
 
 	path('banUser/<int:user_id>/', views.banUser, name='banUser'),
 
 	path('allActiveThreads/', views.allActiveThreads, name='allActiveThreads'),
 
-	path('UnBanUser/<int:id>/', views.UnBanUser, name='UnBanUser'),
 
 	path('bookmarkQuestion/<int:question_id>/', views.bookmarkQuestion, name='bookmarkQuestion'),
 
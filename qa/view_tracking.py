@@ -0,0 +1,169 @@
+"""
+Buffered question view tracking.
+
+questionDetailView used to write the (question, user) viewer row on every
+hit. Views are now collected in a per-process buffer instead:
+
+    record_view(question.pk, request.user.pk)
+
+The buffer dedupes the pairs and flushes them with one bulk INSERT once it
+holds VIEW_BUFFER_SIZE views or VIEW_BUFFER_FLUSH_INTERVAL seconds after the
+first buffered view (and when the process exits). The flush moves
+Question.views_count and records a VIEW_RECORDED badge event for the
+questions which crossed a view badge threshold.
+
+question_view_count() is the unique view count used for display, it is
+cached per question and moved by the flush, so views still waiting in a
+buffer are the only ones it can miss.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Question
+from .counters import bump_question_counters
+
+logger = logging.getLogger(__name__)
+
+# Question views at which a view badge (Popular/Notable/Famous Question) is earned.
+VIEW_BADGE_THRESHOLDS = (1000, 2500, 10000)
+
+
+def _count_key(question_id):
+    return f'question_views:{question_id}'
+
+
+def _stored_count(question_id):
+    return Question.objects.filter(pk=question_id).values_list('views_count', flat=True).first() or 0
+
+
+def question_view_count(question_id):
+    """Unique views of a question, from cache or from Question.views_count without one."""
+    key = _count_key(question_id)
+    try:
+        count = cache.get(key)
+    except Exception:
+        logger.warning('Question view count cache unavailable', exc_info=True)
+        return _stored_count(question_id)
+    if count is None:
+        count = _stored_count(question_id)
+        try:
+            cache.add(key, count, settings.CACHE_TTL)
+        except Exception:
+            logger.warning('Question view count cache unavailable', exc_info=True)
+    return count
+
+
+def _bump_cached_count(question_id, delta):
+    try:
+        cache.incr(_count_key(question_id), delta)
+    except ValueError:
+        # Not cached, the next read loads the updated column.
+        pass
+    except Exception:
+        # The column is written, the cached copy expires after CACHE_TTL.
+        logger.warning('Moving the cached view count failed', exc_info=True)
+
+
+def _crossed_threshold(before, after):
+    return any(before < threshold <= after for threshold in VIEW_BADGE_THRESHOLDS)
+
+
+def flush_views(pairs):
+    """
+    Write a set of (question_id, user_id) views. Pairs which are already
+    stored are skipped. Returns the number of new viewer rows.
+    """
+    if not pairs:
+        return 0
+    from tagbadge.events import record_badge_events, VIEW_RECORDED
+
+    Viewers = Question.viewers.through
+    question_ids = {question_id for question_id, user_id in pairs}
+    with transaction.atomic():
+        stored = set(Viewers.objects.filter(
+            question_id__in=question_ids, user_id__in={user_id for question_id, user_id in pairs}).values_list(
+                'question_id', 'user_id'))
+        new = [pair for pair in pairs if pair not in stored]
+        Viewers.objects.bulk_create(
+            [Viewers(question_id=question_id, user_id=user_id) for question_id, user_id in new],
+            ignore_conflicts=True)
+
+        new_views = Counter(question_id for question_id, user_id in new)
+        counts = dict(Question.objects.filter(pk__in=new_views).values_list('pk', 'views_count'))
+        for question_id, views in new_views.items():
+            bump_question_counters(question_id, views_count=views)
+        crossed = [question_id for question_id, views in new_views.items()
+                   if _crossed_threshold(counts.get(question_id, 0), counts.get(question_id, 0) + views)]
+        record_badge_events(VIEW_RECORDED, questions=crossed)
+
+    for question_id, views in new_views.items():
+        _bump_cached_count(question_id, views)
+    return len(new)
+
+
+class ViewBuffer:
+    """Deduping buffer of (question_id, user_id) views, flushed in batches."""
+
+    def __init__(self, size=None, interval=None):
+        self.size = size or settings.VIEW_BUFFER_SIZE
+        self.interval = interval or settings.VIEW_BUFFER_FLUSH_INTERVAL
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, question_id, user_id):
+        with self.lock:
+            self.pending.add((question_id, user_id))
+            full = len(self.pending) >= self.size
+            if not full and self.timer is None:
+                self._start_timer()
+        if full:
+            self.flush()
+
+    def _start_timer(self):
+        self.timer = threading.Timer(self.interval, self._flush_on_timer)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread got its own database connection.
+            connection.close()
+
+    def flush(self):
+        with self.lock:
+            pairs, self.pending = self.pending, set()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        try:
+            return flush_views(pairs)
+        except Exception:
+            logger.exception('Flushing %s question views failed', len(pairs))
+            with self.lock:
+                self.pending |= pairs
+            return 0
+        finally:
+            # Views put back by a failed flush, or buffered during it, get flushed on time too.
+            with self.lock:
+                if self.pending and self.timer is None:
+                    self._start_timer()
+
+
+view_buffer = ViewBuffer()
+atexit.register(view_buffer.flush)
+
+
+def record_view(question_id, user_id):
+    view_buffer.add(question_id, user_id)
@@ -3,9 +3,15 @@ from .models import Question, Answer, Bounty, Reputation, ProtectQuestion, PostS
 from .forms import QuestionForm, AnswerForm, UpdateQuestion
 from django.http import JsonResponse, HttpResponse
 from django.db.models import Count, Q, Sum, F
+from django.db import transaction
 from profile.models import Profile
+from profile.reputation import reputation_of
+from profile.user_directory import search_users, photo_urls
+from .view_tracking import record_view, question_view_count
+from .question_query import QuestionQuery
 from django.contrib import messages
 from notification.models import Notification, PrivRepNotification
+from notification.feed import notify
 from django.core.mail import send_mail
 from .forms import BountyForm, BanUser_Form, InlineTagEditForm
 from taggit.models import Tag
@@ -18,13 +24,12 @@ from .forms import ProtectForm, EditAnswerForm
 from .models import CommentQ, QUpvote, QDownvote
 from django.contrib.auth.models import User
 from tagbadge.models import TagBadge
+from tagbadge.events import record_badge_event, EDIT_APPROVED
 from simple_history.utils import update_change_reason
 from itertools import chain
-from .models import BannedUser, BookmarkQuestion
+from .models import BannedUser, BookmarkQuestion, ScheduledJob
+from .jobs import schedule_ban_end, schedule_bounty_end
 from django.contrib.auth.decorators import login_required
-import threading
-import time
-from time import sleep
 from django.conf import settings
 from django.core.cache.backends.base import DEFAULT_TIMEOUT
 from django.views.decorators.cache import cache_page
@@ -79,45 +84,6 @@ def listTOString(word):
     return emptyString.join(word)
 
 
-def UnBanUser(id):
-    """
-    I used threading for automatic removal of the User's Ban Suspension, But
-    the only problem in "threading" is that if server goes down for any reason
-    than all the threads will stop and lost, all the background tasks will stop.
-    """
-
-    saveToFalse = BannedUser.objects.get(pk=id)
-    if saveToFalse.ban_till == "3_DAYS":
-        seconds = 10
-        time.sleep(seconds)
-    elif saveToFalse.ban_till == "7_DAYS":
-        seconds_2 = 604800
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "15_DAYS":
-        seconds_2 = 1296000
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "30_DAYS":
-        seconds_2 = 2592000
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "2_MONTHS":
-        seconds_2 = 5184000
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "6_MONTHS":
-        seconds_2 = 15552000
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "1_YEAR":
-        seconds_2 = 31104000
-        time.sleep(seconds_2)
-    elif saveToFalse.ban_till == "4_YEARS":
-        seconds_2 = 62208000
-        time.sleep(seconds_2)
-
-    saveToFalse.is_banned = True
-    saveToFalse.save()
-
-    print("Banned Suspension is Successfully Removed")
-
-
 """
 Ajax form of inline tag editing.
 
@@ -161,9 +127,8 @@ def InlineTagEditingForm(request, question_id):
 def banUser(request, user_id):
     """
     Ordinary form for Ban the user, When user submits form
-    then it will start and save a thread with unique id,
-    to keep track of Ban time and with choosen ban days limit
-    thread will remove the ban suspension.
+    the ban is saved with a scheduled job (qa/jobs.py) which
+    removes the suspension once the choosen ban days are over.
     """
     user = get_object_or_404(User, id=user_id)
     userBanHistory = BannedUser.objects.filter(user=user_id)
@@ -174,12 +139,9 @@ def banUser(request, user_id):
             post = ban_form.save(commit=False)
             post.user = user
             post.banned_by = request.user
-            post.save()
-
-            # Begin Thread and send to "UnBanUser" view to track the time.
-            t = threading.Thread(target=UnBanUser, args=[post.id])
-            t.setDaemon(True)
-            t.start()
+            with transaction.atomic():
+                post.save()
+                schedule_ban_end(post)
 
             return redirect('profile:home')
 
@@ -192,15 +154,22 @@ def banUser(request, user_id):
 
 
 # TRANSFER
+@superuser_only
 def allActiveThreads(request):
     """
-    It will show all the threads currently running.
-    Made this to check the active threads.
+    Status of the scheduled jobs queue (qa/jobs.py): jobs per kind
+    and status, the next ones due, the ones late and the failed ones.
     """
-
-    allThreads = threading.enumerate()
-
-    context = {'allThreads': allThreads}
+    now = timezone.now()
+    jobs = ScheduledJob.objects.all()
+    counts = jobs.values('kind', 'status').annotate(total=Count('id')).order_by('kind', 'status')
+    context = {
+        'counts': counts,
+        'upcoming': jobs.filter(status='pending', run_at__gt=now).order_by('run_at')[:50],
+        'overdue': jobs.filter(Q(status='pending') | Q(status='running', locked_until__lt=now), run_at__lte=now).order_by('run_at')[:50],
+        'failed': jobs.filter(status='failed').order_by('-finished_at')[:50],
+        'now': now,
+    }
     return render(request, 'qa/allActiveThreads.html', context)
 
 # Decorator of post_owner or moderator or gold tag badge earned user required
@@ -267,6 +236,7 @@ def undeleteQuestion(request, question_id):
         return redirect('qa:questionDetailView', pk=question_id)
 
 
+@transaction.atomic
 def delete_answer(request, answer_id):
     """
     view to delete Answer permanently
@@ -283,6 +253,7 @@ def delete_answer(request, answer_id):
         return redirect('qa:questionDetailView', pk=answer.questionans.id)
 
 
+@transaction.atomic
 def undelete_answer(request, answer_id):
     """
     view to undelete Answer
@@ -325,6 +296,7 @@ def rewardPrivielege(request, which_user):
 
 
 
+@transaction.atomic
 def save_comment(request, question_id):
     """
     For save the comment on question through Ajax
@@ -357,11 +329,7 @@ def save_comment(request, question_id):
             createdComment = CommentQ.objects.create(
                 question_comment=que, comment=comment, commented_by=commented_by)
             if request.user != que.post_owner:
-                Notification.objects.create(
-                    noti_receiver=que.post_owner,
-                    type_of_noti="question_comment",
-                    url=question_URL,
-                    question_noti=que)
+                notify(que.post_owner, "question_comment", question_URL, question=que)
 
             # It is getting comment's body then it is finding "@" in the comment-
             # body and splitting all the other spaces, commas, brackets, etc.
@@ -391,11 +359,8 @@ def save_comment(request, question_id):
                         username=newWord)
                     question_URL = request.build_absolute_uri(
                         que.get_absolute_url())
-                    send_BLANK_notification = Notification.objects.create(
-                        noti_receiver=getUserIdByUsername,
-                        type_of_noti="BLANK_NOTIFICATION",
-                        url=question_URL,
-                        question_noti=que)
+                    send_BLANK_notification = notify(
+                        getUserIdByUsername, "BLANK_NOTIFICATION", question_URL, question=que)
                     print(getUserIdByUsername)
 
                 except User.DoesNotExist:
@@ -435,16 +400,13 @@ def load_answer_upvotes_downvotes(request, answer_id):
 
 def Ajax_searchUser_Moderators(request):
     q = request.GET.get('q')
-    results = User.objects.filter(username__icontains=q).distinct()
+    results = search_users(q)
+    photos = photo_urls(result.id for result in results)
     serialized_results = []
     for result in results:
-        if result.profile.profile_photo:
-            photo = result.profile.profile_photo.url
-        else:
-            photo = ''
         serialized_results.append({
             'id': result.id,
-            'photo': photo,
+            'photo': photos.get(result.id, ''),
             'user_name': result.username,
         })
 
@@ -562,16 +524,6 @@ def answerTimeline(request, answer_id):
     return render(request, 'qa/TimeLineAnswer.html', context)
 
 
-def end_bounty_thread(id):
-    time.sleep(10000)
-    createInstance = Bounty.objects.get(pk=id)
-    createInstance.question_bounty.is_bountied = False
-    createInstance.question_bounty.save()
-    print(createInstance.question_bounty.is_bountied)
-    print("Task Successfully Completed " +
-          " Bounty of a Question is Successfully Removed")
-
-
 def AjaxFlagForm(request, question_id):
     """
     Ajax form to submit Question's Flag
@@ -1075,14 +1027,10 @@ def AjaxBountyForm(request, question_id):
                             awarded_to=request.user,
                             reputation_on_what='Applied_Bounty')
 
-                # Save the thread with its ID.
+                # The bounty ends with its scheduled job.
                 new_post.save()
                 data.save()
-                t = threading.Thread(
-                    target=end_bounty_thread, args=[
-                        new_post.id])
-                t.setDaemon(True)
-                t.start()
+                schedule_bounty_end(new_post)
 
                 # messages.success(request, "Successfully Applied Bounty")
                 # return redirect('qa:questionDetailView', pk=data.id,)  #
@@ -1364,15 +1312,8 @@ def questionDetailView(request, pk,):  # slug):
     bookmarks = Profile.objects.filter(bookmark_questions=data).count()
     # voted_time = data.date
 
-    is_it_first = data.answer_set.first()
-    if is_it_first:
-        if is_it_first.a_vote_ups.all().count() >= 1 and is_it_first.accepted:
-            TagBadge.objects.get_or_create(
-                awarded_to_user=is_it_first.answer_owner,
-                badge_type="SILVER",
-                tag_name="Enlightened",
-                bade_position="BADGE",
-                answerIf_TagOf_A=is_it_first)
+    # Badges (Enlightened, Popular Question, Lifejacket, ...) are awarded by
+    # the process_badge_events worker, see tagbadge/rules.py.
 
     countingActiveBounties = Question.objects.filter(limit_exced=True,
                                                      is_bountied=True).count()
@@ -1397,29 +1338,95 @@ def questionDetailView(request, pk,):  # slug):
     if request.method == 'POST':
         form = AnswerForm(data=request.POST)
         if form.is_valid():
-            gettingBody = form.cleaned_data['body']
-            gettingWiki = form.cleaned_data['is_wiki_answer']
-
-            if data.is_protected:
-                if request.user.profile.remove_new_user_restrictions:
+            # The answer and the question's answers_count change together.
+            with transaction.atomic():
+                gettingBody = form.cleaned_data['body']
+                gettingWiki = form.cleaned_data['is_wiki_answer']
+
+                if data.is_protected:
+                    if request.user.profile.remove_new_user_restrictions:
+                        new_post = form.save(commit=False)
+                        new_post.answer_owner = request.user
+                        new_post.questionans = data
+                        new_post.save()
+                        data.active_date = timezone.now()
+
+                        data.save()
+                        question_URL = request.build_absolute_uri(
+                            data.get_absolute_url())
+
+                        # if request.user != new_post.answer_owner:
+                        notify(data.post_owner, "NEW_ANSWER", question_URL,
+                                question=data, answer=new_post)
+
+                        if len(gettingBody) <= 200:
+                            # print("Second Last Statement")
+                            create_Low_Quality_Post_Instance, cre = LowQualityPostsCheck.objects.get_or_create(
+                                suggested_through="Automatic", low_ans_is=new_post, why_low_quality="Answer_Less_Than_200", is_completed=False)
+                            ReviewLowQualityPosts.objects.get_or_create(
+                                review_of=create_Low_Quality_Post_Instance, is_answer=new_post, is_reviewed=False)
+                        return redirect(
+                            'qa:questionDetailView',
+                            pk=data.id,
+                        )  # slug=slug)
+                    else:
+                        messages.error(
+                            request,
+                            'This Question is Protected and You need atleast 10 reputation to Answer it')
+                else:
                     new_post = form.save(commit=False)
                     new_post.answer_owner = request.user
                     new_post.questionans = data
                     data.active_date = timezone.now()
-
                     data.save()
+
+                    if data.qdownvote_set.all().count() >= 2:
+                        new_post.monitor_it = True
+                        new_post.save()
+
+                    # WORKED
+                    # Revival Tag - START
+                    is_olderThan_nintyMinutes = timezone.now() - timedelta(days=30)
+                    # Can make a view to count all the Answers in Model
+                    # getAnswering = data.answer_set.all().count()
+                    if data.date <= is_olderThan_nintyMinutes:  # and getAnswering <= 0:
+                        # print("Revival")
+                        new_post.revival_stage_one = True
+                        new_post.save()
+                    # Revival Tag - START
+
+                    # WORKED
+                    is_older_sixty_days = timezone.now() - timedelta(days=60)
+                    if data.date <= is_older_sixty_days:
+                        new_post.necromancer_check = True
+                        new_post.save()
+                    if gettingWiki and request.user.profile.create_wiki_posts == False:
+                        new_post.is_wiki_answer = False
+                        new_post.save()
+                        messages.error(
+                            request, 'You need atleast 10 Reputation to this Answer into Wiki Posts')
+                    else:
+                        # print("Main saving answer Statement is Excecuting")
+                        new_post.save()
+
+                    # One notification per answer, whichever of the checks above ran.
                     question_URL = request.build_absolute_uri(
                         data.get_absolute_url())
-
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
+                    notify(data.post_owner, "NEW_ANSWER", question_URL,
+                            question=data, answer=new_post)
+
+                    getEditingTime = request.user.profile.editPostTimeOfUser
+                    getRecentAnswer = Answer.objects.filter(
+                        answer_owner=request.user).last()
+                    if getRecentAnswer and request.user.profile.editPostTimeOfUser:
+                        if getEditingTime >= timezone.now() - \
+                                timedelta(minutes=5) and getRecentAnswer.date >= timezone.now() - timedelta(minutes=5):
+                            # Explainer/Refiner/Illuminator are awarded from this counter
+                            # by the badge worker (ANSWER_POSTED event).
+                            request.user.profile.Refiner_Illuminator_TagPostCounter += 1
+                            request.user.profile.save()
 
                     if len(gettingBody) <= 200:
-                        # print("Second Last Statement")
                         create_Low_Quality_Post_Instance, cre = LowQualityPostsCheck.objects.get_or_create(
                             suggested_through="Automatic", low_ans_is=new_post, why_low_quality="Answer_Less_Than_200", is_completed=False)
                         ReviewLowQualityPosts.objects.get_or_create(
@@ -1428,128 +1435,6 @@ def questionDetailView(request, pk,):  # slug):
                         'qa:questionDetailView',
                         pk=data.id,
                     )  # slug=slug)
-                else:
-                    messages.error(
-                        request,
-                        'This Question is Protected and You need atleast 10 reputation to Answer it')
-            else:
-                new_post = form.save(commit=False)
-                new_post.answer_owner = request.user
-                new_post.questionans = data
-                data.active_date = timezone.now()
-                data.save()
-
-                if data.qdownvote_set.all().count() >= 2:
-                    new_post.monitor_it = True
-                    new_post.save()
-                    question_URL = request.build_absolute_uri(
-                        data.get_absolute_url())
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
-                else:
-                    print("Not Working")
-
-                # WORKED
-                # Revival Tag - START
-                is_olderThan_nintyMinutes = timezone.now() - timedelta(days=30)
-                # Can make a view to count all the Answers in Model
-                # getAnswering = data.answer_set.all().count()
-                if data.date <= is_olderThan_nintyMinutes:  # and getAnswering <= 0:
-                    # print("Revival")
-                    new_post.revival_stage_one = True
-                    new_post.save()
-                    question_URL = request.build_absolute_uri(
-                        data.get_absolute_url())
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
-                # Revival Tag - START
-
-                # WORKED
-                is_older_sixty_days = timezone.now() - timedelta(days=60)
-                if data.date <= is_older_sixty_days:
-                    new_post.necromancer_check = True
-                    new_post.save()
-                    question_URL = request.build_absolute_uri(
-                        data.get_absolute_url())
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
-                if gettingWiki and request.user.profile.create_wiki_posts == False:
-                    new_post.is_wiki_answer = False
-                    new_post.save()
-                    question_URL = request.build_absolute_uri(
-                        data.get_absolute_url())
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
-                    messages.error(
-                        request, 'You need atleast 10 Reputation to this Answer into Wiki Posts')
-                else:
-                    # print("Main saving answer Statement is Excecuting")
-                    new_post.save()
-                    question_URL = request.build_absolute_uri(
-                        data.get_absolute_url())
-                    # if request.user != new_post.answer_owner:
-                    Notification.objects.create(
-                            noti_receiver=data.post_owner,
-                            type_of_noti="NEW_ANSWER",
-                            url=question_URL,
-                            answer_noti=new_post)
-
-                getEditingTime = request.user.profile.editPostTimeOfUser
-                getRecentAnswer = Answer.objects.filter(
-                    answer_owner=request.user).last()
-                if getRecentAnswer and request.user.profile.editPostTimeOfUser:
-                    if getEditingTime >= timezone.now() - \
-                            timedelta(minutes=5) and getRecentAnswer.date >= timezone.now() - timedelta(minutes=5):
-                        request.user.profile.Refiner_Illuminator_TagPostCounter += 1
-                        request.user.profile.save()
-                        TagBadge.objects.get_or_create(
-                            awarded_to_user=request.user,
-                            badge_type="BRONZE",
-                            tag_name="Explainer",
-                            bade_position="BADGE",
-                            questionIf_TagOf_Q=data)
-                        print("Explainer Awarded")
-                        if request.user.profile.Refiner_Illuminator_TagPostCounter >= 50:
-                            TagBadge.objects.get_or_create(
-                                awarded_to_user=request.user,
-                                badge_type="SILVER",
-                                tag_name="Refiner",
-                                bade_position="BADGE",
-                                questionIf_TagOf_Q=data)
-
-                        if request.user.profile.Refiner_Illuminator_TagPostCounter >= 500:
-                            TagBadge.objects.get_or_create(
-                                awarded_to_user=request.user,
-                                badge_type="GOLD",
-                                tag_name="Illuminator",
-                                bade_position="BADGE",
-                                questionIf_TagOf_Q=data)
-
-                if len(gettingBody) <= 200:
-                    create_Low_Quality_Post_Instance, cre = LowQualityPostsCheck.objects.get_or_create(
-                        suggested_through="Automatic", low_ans_is=new_post, why_low_quality="Answer_Less_Than_200", is_completed=False)
-                    ReviewLowQualityPosts.objects.get_or_create(
-                        review_of=create_Low_Quality_Post_Instance, is_answer=new_post, is_reviewed=False)
-                return redirect(
-                    'qa:questionDetailView',
-                    pk=data.id,
-                )  # slug=slug)
     else:
         form = AnswerForm()
     # Answer Form - END
@@ -1565,38 +1450,10 @@ def questionDetailView(request, pk,):  # slug):
 
 
 # Question Views
-    queryset = Question.objects.annotate(
-        num_views=Count('viewers')).order_by('-num_views')
-    datas = get_object_or_404(queryset, pk=pk)
+    datas = data
     if request.user.is_authenticated:
-        created = Question.viewers.through.objects.get_or_create(
-            question=datas, user=request.user)
-
-        if created:
-            datas.num_views += 0
-# BADGE - POPULAR QUESTION - MORE THAN 1000 VIEWS.
-        if datas.viewers.count() >= 1000:
-            TagBadge.objects.get_or_create(
-                awarded_to_user=data.post_owner,
-                badge_type="BRONZE",
-                tag_name="Popular Question",
-                bade_position="BADGE")
-
-# BADGE - POPULAR QUESTION - MORE THAN 2500 VIEWS.
-        if datas.viewers.count() >= 2500:
-            TagBadge.objects.get_or_create(
-                awarded_to_user=data.post_owner,
-                badge_type="SILVER",
-                tag_name="Notable Question",
-                bade_position="BADGE")
-
-# BADGE - POPULAR QUESTION - MORE THAN 10000 VIEWS.
-        if datas.viewers.count() >= 10000:
-            TagBadge.objects.get_or_create(
-                awarded_to_user=data.post_owner,
-                badge_type="GOLD",
-                tag_name="Famous Question",
-                bade_position="BADGE")
+        record_view(data.pk, request.user.pk)
+    view_count = question_view_count(data.pk)
 
 # -------------
 
@@ -1664,51 +1521,7 @@ def questionDetailView(request, pk,):  # slug):
         likepost = ''
         likeDownpost = ''
 
-# -------------TAG- LifeJacket---------------------- START - WORKING -----
-
-    getAnswers = data.answer_set.filter(monitor_it=True)
-    for ans in getAnswers:
-        if ans.a_vote_ups.count() >= 1 and data.qupvote_set.all().count() >= 2:
-            # awardTheTag
-            TagBadge.objects.get_or_create(
-                awarded_to_user=data.post_owner,
-                badge_type="SILVER",
-                tag_name="Lifejacket",
-                bade_position="BADGE",
-                answerIf_TagOf_A=ans)
-
-        if ans.a_vote_ups.count() >= 20 and data.qupvote_set.all().count() >= 3:
-            TagBadge.objects.get_or_create(
-                awarded_to_user=data.post_owner,
-                badge_type="GOLD",
-                tag_name="Lifeboat",
-                bade_position="BADGE",
-                answerIf_TagOf_A=ans)
-
-# -------------TAG- LifeJacket---------------------- END - WORKING -------
-
-
-# -------------TAG- Populist---------------------- START - WORKING --------------------- Needs Improvement
-
-    getAcceptedAnswer = data.answer_set.filter(accepted=True).first()
-
-    if getAcceptedAnswer is not None:
-        getAcceptedAnswerCorrected = getAcceptedAnswer.a_vote_ups.count()
-    else:
-        getAcceptedAnswerCorrected = ''
-
-    if getAcceptedAnswer is not None:
-        multiplied = getAcceptedAnswerCorrected * 2 + 1
-        print(multiplied)
-        getAllTheAnswers_ofQuestion = data.answer_set.filter(
-            a_vote_ups__gt=multiplied).exclude(accepted=True)
-    else:
-        getAllTheAnswers_ofQuestion = ''
-
-    for s in getAllTheAnswers_ofQuestion:
-        print(s.answer_owner)
-
-# -------------TAG- Populist---------------------- END - WORKING --------------------- Needs Improvement
+    # Populist is awarded from the vote and accept events, see tagbadge/rules.py.
 
     # getHow_many_vote_on_close = CloseQuestionVotes.objects.filter(question_to_closing=data).annotate(num_count=Count('how_many_votes_on_Close'))
 
@@ -1732,8 +1545,7 @@ def questionDetailView(request, pk,):  # slug):
         question_to_closing=data).last()
     # # QUESTION - ALGORITHM
     if getClose_votes_on_this_question:
-        if datas.viewers.all().count(
-        ) >= 20 and getClose_votes_on_this_question.date <= timezone.now() - timedelta(days=5):
+        if view_count >= 20 and getClose_votes_on_this_question.date <= timezone.now() - timedelta(days=5):
             print("Delete the Last Close Vote")
             CloseQuestionVotes.objects.filter(
                 question_to_closing=data).last().delete()
@@ -2038,6 +1850,7 @@ def questionDetailView(request, pk,):  # slug):
         'data': data,
         'form': form,
         'datas': datas,
+        'view_count': view_count,
         'bounty_form': bounty_form,
         'is_it_acc': is_it_acc,
         'cannot_create': cannot_create,
@@ -2047,9 +1860,6 @@ def questionDetailView(request, pk,):  # slug):
         'protectedQuestion': protectedQuestion,
         'likepost': likepost,
         'likeDownpost': likeDownpost,
-        'getAnswers': getAnswers,
-        'getAcceptedAnswer': getAcceptedAnswer,
-        'getAcceptedAnswerCorrected': getAcceptedAnswerCorrected,
         're_open_form': re_open_form,
         'answers': answers,
     }
@@ -2209,6 +2019,7 @@ If user voted on "Harrassment" and "Something else" then it will save review ins
 '''
 
 
+@transaction.atomic
 def flagComment(request, commentq_id):
     commentID = get_object_or_404(CommentQ, pk=commentq_id)
     createTrackRecord = FlagComment.objects.filter(
@@ -2301,11 +2112,7 @@ def save_comment_answer(request, answer_id):
                                              commented_by=request.user
                                              )
             if request.user != ans.answer_owner:
-                Notification.objects.create(
-                    noti_receiver=ans.answer_owner,
-                    type_of_noti="comment_answer",
-                    url=question_URL,
-                    answer_noti=ans)
+                notify(ans.answer_owner, "comment_answer", question_URL, answer=ans)
 
             getComments = CommentQ.objects.filter(
                 commented_by=request.user).count()
@@ -2904,6 +2711,7 @@ def mark_accepted(request, answer_id, question_id):
         return redirect('profile:posts')
 
 
+@transaction.atomic
 def bookmarkQuestion(request, question_id):
     post = get_object_or_404(Question, pk=question_id)
 
@@ -2980,6 +2788,7 @@ def award_InformedBadge_OnScroll(request):
 
 
 # @awardReputation
+@transaction.atomic
 def question_upvote_downvote(request, question_id):
     post = get_object_or_404(Question, pk=question_id)
     likepost = post.qupvote_set.filter(upvote_by_q=request.user).first()
@@ -2994,66 +2803,8 @@ def question_upvote_downvote(request, question_id):
 
     # minused = edited_time - voted_time
 
-    if post.post_owner == request.user and post.qupvote_set.all().count() >= 1:
-        question_URL = request.build_absolute_uri(post.get_absolute_url())
-        # createTag = Tag.objects.get_or_create(name="Student")
-        TagBadge.objects.get_or_create(
-            awarded_to_user=post.post_owner,
-            badge_type="BRONZE",
-            tag_name="Student",
-            bade_position="BADGE",
-            questionIf_TagOf_Q=post)
-        PrivRepNotification.objects.get_or_create(
-            for_user=post.post_owner,
-            type_of_PrivNotify="BADGE_EARNED",
-            url=question_URL,
-            for_if="Student",
-            description="First question with score of 1 or more"
-        )
-
-    last_24_hours = timezone.now() - timedelta(hours=24)
-    getQ_Votes_in_24_Hours = QUpvote.objects.filter(
-        date__gt=last_24_hours).count()
-    getQ_DownVotes_in_24_Hours = QDownvote.objects.filter(
-        downvote_by_q=request.user, date__gt=last_24_hours).count()
-    getA_Votes_in_24_Hours = Answer.objects.filter(
-        a_vote_ups=request.user, date__gt=last_24_hours).count()
-    getA_DownVotes_in_24_Hours = Answer.objects.filter(
-        a_vote_downs=request.user, date__gt=last_24_hours).count()
-    totalIs = getQ_Votes_in_24_Hours + getQ_DownVotes_in_24_Hours + \
-        getA_Votes_in_24_Hours + getA_DownVotes_in_24_Hours
-
-    if totalIs >= 30:
-        TagBadge.objects.get_or_create(
-            awarded_to_user=request.user,
-            badge_type="BRONZE",
-            tag_name="Suffrage",
-            bade_position="BADGE")
-        PrivRepNotification.objects.get_or_create(
-            for_user=request.user,
-            privilegeURL=question_URL,
-            type_of_PrivNotify="BADGE_EARNED")
-        PrivRepNotification.objects.get_or_create(
-            for_user=request.user,
-            type_of_PrivNotify="BADGE_EARNED",
-            url=question_URL,
-            for_if="Suffrage",
-            description="Use 30 votes in a day"
-        )
-
-    if totalIs >= 40:
-        TagBadge.objects.get_or_create(
-            awarded_to_user=request.user,
-            badge_type="BRONZE",
-            tag_name="Vox Populi",
-            bade_position="BADGE")
-        PrivRepNotification.objects.get_or_create(
-            for_user=request.user,
-            type_of_PrivNotify="BADGE_EARNED",
-            url=question_URL,
-            for_if="Vox Populi",
-            description="Use the maximum 40 votes in a day"
-        )
+    # Student, Suffrage and Vox Populi are awarded by the badge worker from the
+    # VOTE_CAST event the vote records, see tagbadge/rules.py.
 
     user_url = request.build_absolute_uri(post.get_absolute_url())
     sent = False
@@ -3167,18 +2918,7 @@ def question_upvote_downvote(request, question_id):
                     description="",
                     question_priv_noti=post,
                 )
-                getReputationEarnedInLast_24Hours = Reputation.objects.filter(
-                    awarded_to=post.post_owner).aggregate(
-                    Sum('answer_rep_C'), Sum('question_rep_C'))
-                # if getReputationEarnedInLast_24Hours
-                d1 = getReputationEarnedInLast_24Hours['question_rep_C__sum']
-                total_question_rep = getReputationEarnedInLast_24Hours[
-                    'question_rep_C__sum'] if d1 else 0
-                s2 = getReputationEarnedInLast_24Hours['answer_rep_C__sum']
-                total_answer_rep = getReputationEarnedInLast_24Hours[
-                    'answer_rep_C__sum'] if s2 else 0
-
-                finalReputation = total_question_rep + total_answer_rep
+                finalReputation = reputation_of(post.post_owner)
 
                 # if finalReputation >= 10:
                 #     print("Awarded the Create Wiki Posts")
@@ -3201,18 +2941,8 @@ def question_upvote_downvote(request, question_id):
                             description="First up vote"
                         )
 
-    # UNCOMMENT FOR SEND MAIL TO USER - START
-                # if request.user.profile.send_email_notifications == True:
-                #     subject = f" is reporting a PROFILE"
-
-                #     message = f" \n Why Reporting PROFILE :- {user_url}  \n"\
-                #               f" \n Reporting PROFILE Url :- \n"\
-                #               f" \n Reported by :-  \n"\
-
-                #     send_mail(subject, message, 'yawanspace@gmail.com',
-                #               [request.user.profile.email])
-                #     sent = True
-    # UNCOMMENT FOR SEND MAIL TO USER - END
+                # Users who turned on email notifications get this one in their next
+                # digest, see notification/emails.py.
 
                     if post.qupvote_set.all().count() >= 10:
                         TagBadge.objects.get_or_create(
@@ -3277,14 +3007,7 @@ def question_upvote_downvote(request, question_id):
                     upvote_by_q=request.user,
                     upvote_question_of=post).delete()
                 # if Reputation.objects.filter()
-                getAlltheReputation = Reputation.objects.filter(
-                    awarded_to=request.user).aggregate(
-                    Sum('answer_rep_C'), Sum('question_rep_C'))
-                d = getAlltheReputation['question_rep_C__sum']
-                total_question_rep = getAlltheReputation['question_rep_C__sum'] if d else 0
-                s = getAlltheReputation['answer_rep_C__sum']
-                total_answer_rep = getAlltheReputation['answer_rep_C__sum'] if s else 0
-                totalReputation = total_question_rep + total_answer_rep
+                totalReputation = reputation_of(request.user)
                 if post.qdownvote_set.all().count() >= 5:
                     post.reversal_monitor = True
                     post.save()
@@ -3374,14 +3097,7 @@ def question_upvote_downvote(request, question_id):
                         description="First down vote"
                     )
 
-                getAlltheReputation = Reputation.objects.filter(
-                    awarded_to=request.user).aggregate(
-                    Sum('answer_rep_C'), Sum('question_rep_C'))
-                d = getAlltheReputation['question_rep_C__sum']
-                total_question_rep = getAlltheReputation['question_rep_C__sum'] if d else 0
-                s = getAlltheReputation['answer_rep_C__sum']
-                total_answer_rep = getAlltheReputation['answer_rep_C__sum'] if s else 0
-                totalReputation = total_question_rep + total_answer_rep
+                totalReputation = reputation_of(request.user)
                 if totalReputation > 2:
                     decRep = Reputation.objects.get_or_create(
                         awarded_to=post.post_owner,
@@ -3436,46 +3152,9 @@ def answer_upvote_downvote(request, answer_id):
     if getRecentAnswer and getEditingTime:
         if getEditingTime >= timezone.now() - \
                 timedelta(minutes=5) and getRecentAnswer.date >= timezone.now() - timedelta(minutes=5):
+            # Explainer/Refiner/Illuminator are awarded from this counter by the badge worker.
             request.user.profile.Refiner_Illuminator_TagPostCounter += 1
             request.user.profile.save()
-            TagBadge.objects.get_or_create(
-                awarded_to_user=request.user,
-                badge_type="BRONZE",
-                tag_name="Explainer",
-                bade_position="BADGE")
-            PrivRepNotification.objects.get_or_create(
-                for_user=request.user,
-                type_of_PrivNotify="BADGE_EARNED",
-                url=question_URL,
-                for_if="Explainer",
-                description="Edit and answer 1 question (both actions within 12 hours, answer score > 0)"
-            )
-            if request.user.profile.Refiner_Illuminator_TagPostCounter >= 50:
-                TagBadge.objects.get_or_create(
-                    awarded_to_user=request.user,
-                    badge_type="SILVER",
-                    tag_name="Refiner",
-                    bade_position="BADGE")
-                PrivRepNotification.objects.get_or_create(
-                    for_user=request.user,
-                    type_of_PrivNotify="BADGE_EARNED",
-                    url=question_URL,
-                    for_if="Refiner",
-                    description="Edit and answer 50 questions (both actions within 12 hours, answer score > 0)"
-                )
-            if request.user.profile.Refiner_Illuminator_TagPostCounter >= 500:
-                TagBadge.objects.get_or_create(
-                    awarded_to_user=request.user,
-                    badge_type="GOLD",
-                    tag_name="Illuminator",
-                    bade_position="BADGE")
-                PrivRepNotification.objects.get_or_create(
-                    for_user=request.user,
-                    type_of_PrivNotify="BADGE_EARNED",
-                    url=question_URL,
-                    for_if="Illuminator",
-                    description="Edit and answer 500 questions (both actions within 12 hours, answer score > 0)"
-                )
 
     if post.revival_stage_one and post.a_vote_ups.all().count() >= 2:
         TagBadge.objects.get_or_create(
@@ -3997,6 +3676,8 @@ def edit_answer(request, answer_id):
                     request.user.profile.Refiner_Illuminator_TagPostCounter += 1
                     request.user.profile.save()
             form.save()
+            # Owner edits are applied without review.
+            record_badge_event(EDIT_APPROVED, user=request.user, answer=post, question=post.questionans_id)
 
             update_change_reason(post, formWhyEditing)
             # sendForReview = QuestionEditVotes.objects.create(edit_suggested_by=request.user, edited_answer=post)
@@ -4157,6 +3838,7 @@ def edit_question(request, question_id):
                     for_if="Copy Editor",
                     description="Edit 500 posts (excluding own or deleted posts and tag edits)")
             update_change_reason(post, formWhyEditing)
+            record_badge_event(EDIT_APPROVED, user=request.user, question=post)
             print(form.errors)
 
             return redirect('profile:home')
@@ -4270,742 +3952,27 @@ def activeQuestions(request, query=None):
 
 # @loggedOutFromAllDevices
 def questions(request):
-    
-    questions = Question.objects.all().exclude(
-        is_bountied=True, is_deleted=True).order_by('-date')
-
-# Damn so use lot of logics But I don't care, I will build this UP !
-
-    if request.method == "POST":
-        this = request.POST.getlist('sortId')
-        getCheckBoxes = request.POST.getlist('filterId')
-        print(getCheckBoxes)
-
-        query = request.POST.get('tagQuery')
-
-        if "RecentActivity" in this:
-            selected = "RecentActivity"
-            if query:
-                relatedTags = Tag.objects.filter(name__icontains=query)
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=False).order_by('-active_date')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).filter(
-                        answer__accepted=False,
-                        is_deleted=False).distinct().order_by('-active_date')
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False).order_by('-active_date')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-active_date')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-active_date')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        answer__accepted=False,
-                        is_deleted=False).order_by('-active_date')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0).order_by('-active_date')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_deleted=False).order_by('-active_date')
-
-            else:
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True, Without Query")
-                    questions = Question.objects.all().annotate(
-                        answers=Count('answer')).filter(
-                        answers=0, is_deleted=False).order_by('-active_date')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.all().filter(
-                        answer__accepted=False, is_deleted=False).distinct().order_by('-active_date')
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False, is_deleted=True).order_by('-active_date')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        answer__accepted=True,
-                        is_deleted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-active_date')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        is_deleted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-active_date')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        answer__accepted=True,
-                        is_deleted=True).order_by('-active_date')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        answer__accepted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0,
-                        is_deleted=False).order_by('-active_date')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=True, is_deleted=True).order_by('-active_date')
-
-        elif "Newest" in this:
-            selected = "Newest"
-            if query:
-                relatedTags = Tag.objects.filter(name__icontains=query)
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-date')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_deleted=False).filter(
-                        answer__accepted=False).distinct().order_by('-date')
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_deleted=False,
-                        is_bountied=True).order_by('-date')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-date')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).order_by('-date')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False,
-                        answer__accepted=False).order_by('-date')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False,
-                        answer__accepted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0).order_by('-date')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_deleted=False).order_by('-date')
-
-            else:
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True, Without Query")
-                    questions = Question.objects.all().annotate(
-                        answers=Count('answer')).filter(
-                        answers=0, is_deleted=False).order_by('-date')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.all().filter(
-                        answer__accepted=False, is_deleted=False).distinct().order_by('-date')
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False, is_deleted=True).order_by('-date')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        answer__accepted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=True).order_by('-date')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=True).order_by('-date')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False, answer__accepted=True, is_deleted=True).order_by('-date')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        answer__accepted=True,
-                        is_deleted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0).order_by('-date')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=True, is_deleted=True).order_by('-date')
-
-        elif "MostVotes" in this:
-            selected = "MostVotes"
-
-            if query:
-                relatedTags = Tag.objects.filter(name__icontains=query)
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).filter(
-                        answer__accepted=False,
-                        is_deleted=False).distinct().annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_bountied=True, is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        answer__accepted=False,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-
-            else:
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True, Without Query")
-                    questions = Question.objects.all().annotate(
-                        answers=Count('answer')).filter(
-                        answers=0, is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.all().exclude(
-                        answer__accepted=True, is_deleted=True).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes').distinct()
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False, is_deleted=True).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        answer__accepted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        is_deleted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False, is_deleted=True, answer__accepted=True).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=False,
-                        answer__accepted=True,
-                        is_deleted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.all().exclude(
-                        is_bountied=True, is_deleted=True).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-
-        # elif "MostFrequent" in this:
-            # selected = "MostFrequent"
-        else:
-            selected = "BountyEndingSoon"
-            if query:
-                relatedTags = Tag.objects.filter(name__icontains=query)
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-
-                minutes_10 = timezone.now() - timedelta(hours=23)
-                # questions = Question.objects.filter(bounty_date_announced__lt=minutes_10, is_bountied=True)
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).filter(
-                        bounty_date_announced__lt=minutes_10, is_bountied=True, is_deleted=False)
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True, In Bounty Ending Soon")
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query).filter(
-                        answer__accepted=False).filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False).distinct()
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_bountied=True, is_deleted=False).filter(
-                        bounty_date_announced__lt=minutes_10)
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, answer__accepted=False).annotate(
-                        answers=Count('answer')).filter(answers=0).filter(
-                        bounty_date_announced__lt=minutes_10, is_bountied=True, is_deleted=False)
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False)
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query, is_bountied=True, answer__accepted=False).filter(
-                        bounty_date_announced__lt=minutes_10, is_bountied=True, is_deleted=False)
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.filter(
-                        tags__name__icontains=query,
-                        is_bountied=True,
-                        answer__accepted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0,
-                        is_deleted=False).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.filter(tags__name__icontains=query).filter(
-                        bounty_date_announced__lt=minutes_10, is_deleted=False, is_bountied=True)
-
-            else:
-                if "NoAnswers" in getCheckBoxes:
-                    bool_1 = True
-                else:
-                    bool_1 = False
-                if "NoAcceptedAnswer" in getCheckBoxes:
-                    bool_2 = True
-                else:
-                    bool_2 = False
-                if "Bounty" in getCheckBoxes:
-                    bool_3 = True
-                else:
-                    bool_3 = False
-                minutes_10 = timezone.now() - timedelta(hours=23)
-
-                # No Answers
-                if bool_1 and bool_2 == False and bool_3 == False:
-                    print("Only First is True, Without Query")
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0)
-
-                # No Accepted Answer
-                if bool_2 and bool_1 == False and bool_3 == False:
-                    print("Only Second is True")
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False).exclude(
-                        answer__accepted=True).distinct()
-
-                # Has Bounty
-                if bool_3 and bool_1 == False and bool_2 == False:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10, is_bountied=True, is_deleted=False)
-                    print("Only Third is True")
-
-                # No Answers and No Accepted Answer
-                if bool_1 and bool_2 and bool_3 == False:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True).exclude(
-                        answer__accepted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0,
-                        is_deleted=False)
-                    print("First and Second is True")
-
-                # No Answers and Bounty
-                if bool_1 and bool_3 and bool_2 == False:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False).annotate(
-                        answers=Count('answer')).filter(
-                        answers=0).annotate(
-                        mostVotes=Count('qupvote')).order_by('-mostVotes')
-                    print("First and Third is True")
-
-                # No Accepted Answers and Bounty
-                if bool_2 and bool_3 and bool_1 == False:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True,
-                        is_deleted=False).exclude(
-                        answer__accepted=True)
-                    print("Second and Third is True")
-
-                # ALl Filters are True
-                if bool_1 and bool_2 and bool_3:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10,
-                        is_bountied=True).exclude(
-                        answer__accepted=True).annotate(
-                        answers=Count('answer')).filter(
-                        answer=0,
-                        is_deleted=False)
-                    print("All Are True")
-
-                # Clear Filters
-                if bool_1 == False and bool_2 == False and bool_3 == False:
-                    questions = Question.objects.filter(
-                        bounty_date_announced__lt=minutes_10, is_bountied=True, is_deleted=False)
+    # Sort, filters and tag query are composed by qa.question_query, the list
+    # is keyset paginated (?after=/?before= cursors) instead of page numbers.
+    questionQuery = QuestionQuery.from_request(request)
+    questions = questionQuery.page(
+        after=request.GET.get('after'), before=request.GET.get('before'))
 
+    query = questionQuery.tag_query
+    if query:
+        relatedTags = Tag.objects.filter(name__icontains=query)
     else:
-        selected = False
-        questions = Question.objects.filter(
-            is_deleted=False, is_bountied=False).order_by('-date')
-        query = ''
-        bool_1 = ''
-        bool_2 = ''
-        bool_3 = ''
         relatedTags = ''
 
-    # EXCLUDED QUESTIONS WHICH HAVE BOUNTY
-    objs = Question.objects.all()  # .exclude(is_bountied=True)
-    if request.user.is_authenticated:
-        notifics = Notification.objects.filter(
-            noti_receiver=request.user).order_by('-date_created')
-    else:
-        notifics = ''
-    minutes_10 = timezone.now() - timedelta(hours=23)
-# POSTS BEFORE 4 HOURS
-    bount_older = Question.objects.filter(
-        bounty_date_announced__lt=minutes_10, is_bountied=True)
-
-    bountied = ''
-    object_list = ''
-
-    page = request.GET.get('page', 1)
-
-    paginator = Paginator(questions, 5)
-    try:
-        questions = paginator.page(page)
-    except PageNotAnInteger:
-        questions = paginator.page(1)
-    except EmptyPage:
-        questions = paginator.page(paginator.num_pages)
-
     countQuestions = Question.objects.count()
-    # print("Printing Query")
-    # print(query)
     context = {
-        'bool_1': bool_1,
+        'bool_1': "NoAnswers" in questionQuery.filters,
         'countQuestions': countQuestions,
-        'bool_2': bool_2,
-        'bool_3': bool_3,
-        'bountied': bountied,
+        'bool_2': "NoAcceptedAnswer" in questionQuery.filters,
+        'bool_3': "Bounty" in questionQuery.filters,
         'query': query,
-        'object_list': object_list,
         'questions': questions,
-        'selected': selected,
-        'notifics': notifics,
-        'objs': objs,
-        'bount_older': bount_older,
+        'selected': questionQuery.sort or False,
         'relatedTags': relatedTags,
     }
 
@@ -5013,6 +3980,9 @@ def questions(request):
 
 
 from .forms import SearchForm
+from .search import search_posts
+
+SEARCH_RESULTS_PER_PAGE = 10
 
 def search_questions(request):
     query = request.GET.get("q", "")
@@ -5020,6 +3990,11 @@ def search_questions(request):
 
     results = None
     result_type = 'questions'
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    has_next = False
 
     if query:
         if search_type == 'tags':
@@ -5035,23 +4010,27 @@ def search_questions(request):
             ).distinct()
             result_type = 'users'
         else:
-            # Default: search questions by title, body, and answers
-            question_matches = Question.objects.filter(
-                Q(title__icontains=query) |
-                Q(body__icontains=query)
-            )
-            answer_qs = Answer.objects.filter(body__icontains=query)
-            answer_question_ids = answer_qs.values_list('questionans_id', flat=True)
-            results = Question.objects.filter(
-                Q(id__in=answer_question_ids) |
-                Q(id__in=question_matches.values_list('id', flat=True))
-            )
+            # Default: full-text search of questions, answers and comments,
+            # ranked, one result per question (see qa/search).
+            hits, has_next = search_posts(
+                query, offset=(page - 1) * SEARCH_RESULTS_PER_PAGE, limit=SEARCH_RESULTS_PER_PAGE)
+            questions = Question.objects.filter(is_deleted=False).in_bulk(
+                [hit.question_id for hit in hits])
+            results = []
+            for hit in hits:
+                question = questions.get(hit.question_id)
+                if question is not None:
+                    question.search_snippet = hit.snippet
+                    question.search_match = hit.kind
+                    results.append(question)
             result_type = 'questions'
 
     context = {
         'query': query,
         'results': results,
         'result_type': result_type,
+        'page': page,
+        'has_next': has_next,
     }
     return render(request, "qa/search_results.html", context)
 
@@ -5099,12 +4078,12 @@ def share_post(request):
             
             post_owner = post.post_owner if post_type == 'question' else post.answer_owner
             if request.user != post_owner:
-                Notification.objects.create(
-                    noti_receiver=post_owner,
-                    type_of_noti=notification_type,
-                    url=post.get_absolute_url() if post_type == 'question' else post.questionans.get_absolute_url(),
-                    question_noti=post if post_type == 'question' else post.questionans,
-                    answer_noti=post if post_type == 'answer' else None
+                notify(
+                    post_owner,
+                    notification_type,
+                    post.get_absolute_url() if post_type == 'question' else post.questionans.get_absolute_url(),
+                    question=post if post_type == 'question' else post.questionans,
+                    answer=post if post_type == 'answer' else None,
                 )
             
             return JsonResponse({
@@ -5226,12 +4205,23 @@ def martor_upload_image(request):
                     'error': f'File type .{file_ext} not allowed. Allowed: {", ".join(allowed_extensions)}'
                 })
             
-            # Save file to media directory
+            # Save file to media directory, named after its content so a
+            # re-upload is stored once; images lose their metadata
             from django.core.files.storage import default_storage
+            from main.media import NotAnImage, make_variants, store_file, store_image
             
-            # Create unique filename
-            filename = f"martor_uploads/{timezone.now().strftime('%Y%m%d_%H%M%S')}_{image.name}"
-            path = default_storage.save(filename, image)
+            if file_ext in ('jpg', 'jpeg', 'png', 'gif', 'webp'):
+                try:
+                    path = store_image(image, 'martor_uploads')
+                except NotAnImage:
+                    return JsonResponse({
+                        'status': 400,
+                        'error': 'The file is not a valid image'
+                    })
+                # Post bodies show the large rendition, the original if it is smaller
+                path = make_variants(path).get('large', path)
+            else:
+                path = store_file(image, 'martor_uploads')
             
             # Get the full URL
             file_url = default_storage.url(path)
@@ -6,6 +6,7 @@ from django.utils import timezone
 from datetime import timedelta
 from qa.models import Answer,Question
 from simple_history.models import HistoricalRecords
+from model_utils import FieldTracker
 from qa.models import CommentQ
 
 REVIEW_ANSWER_ACTION_CHOICES = [
@@ -87,6 +88,8 @@ class QuestionEditVotes(models.Model):
     rev_Action = models.CharField(max_length=30, blank=True, null=True)
     is_completed = models.BooleanField(default=False)
 
+    tracker = FieldTracker(fields=['is_completed'])
+
     def __str__(self):
         if self.edited_question:
             return f"[Question] = {self.edited_question.title} = {self.rev_Action} = {self.is_completed}"
@@ -0,0 +1,199 @@
+"""
+Review queue availability.
+
+The review inbox on profile and review pages needs, for every queue, the
+next item the user can review and whether anything is waiting at all.
+All of that is computed here with a single query and cached per user for
+a short time. The cache is invalidated (by bumping a generation number)
+whenever a review object changes, see review/signals.py. The cache is best
+effort: without it the snapshot is computed on every read.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Exists, Min, Subquery
+from django.utils import timezone
+
+from qa.models import Question, Answer
+from .models import ReviewCloseVotes, ReviewQuestionReOpenVotes, ReviewQuestionEdit
+from .models import ReviewLowQualityPosts, ReviewFlagPost, ReviewFlagComment
+
+logger = logging.getLogger(__name__)
+
+REVIEW_QUEUES_GENERATION_KEY = 'review_queues:generation'
+
+# Queue name -> (name of the "next item" template variable, name of the
+# "has items" template variable). The template variable names are the ones
+# the old per-queue context processors used.
+QUEUES = {
+    'first_answer': ('next_blog', 'can_show'),
+    'first_question': ('next_question', 'can_review'),
+    'late_answer': ('questionIDS', 'cal_LateRev'),
+    'close_votes': ('reviewCloseQuestionID', 'areClosedQuestions_Available'),
+    'reopen_votes': ('reviewTo_ReOpenQuestionID', 'questionToReOpen_available'),
+    'suggested_edits': ('reviewEditedPts', 'editQuestions_review_Available'),
+    'low_quality': ('reviewLowPts', 'reviewLowPosts'),
+    'flag_posts': ('reviewFlagPts', 'is_available_FlagPosts'),
+    'flag_comments': ('reviewFlagCmnts', 'is_available_FlagComments'),
+}
+
+
+def _first_id(queryset):
+    return Subquery(queryset.order_by('id').values('id')[:1])
+
+
+def _late_answers():
+    now = timezone.now()
+    return Answer.objects.filter(
+        lateanswerreview__L_AnswerActions__isnull=True).filter(
+            questionans__date__gt=now - timedelta(hours=100))
+
+
+def _queue_subqueries(user):
+    time = timezone.now() - timedelta(minutes=200)
+    first_answers = Answer.objects.filter(
+        date__gt=time).values('answer_owner').annotate(
+            min_id=Min('id')).values('min_id')
+    first_questions = Question.objects.filter(
+        date__gt=time).values('post_owner').annotate(
+            min_id=Min('id')).values('min_id')
+    late_answers = _late_answers()
+
+    return {
+        'first_answer': _first_id(
+            Answer.objects.filter(firstanswerreview__actions__isnull=True).exclude(
+                answer_owner=user).filter(id__in=first_answers)),
+        'first_question': _first_id(
+            Question.objects.filter(firstquestionreview__QuestionReviewBy__isnull=True).exclude(
+                post_owner=user).filter(id__in=first_questions)),
+        'late_answer': _first_id(
+            late_answers.filter(date__gt=timezone.now() - timedelta(minutes=100))),
+        # The late answer link points into a 100 minute window while the
+        # "available" flag only looks at the last 10 minutes.
+        'late_answer_recent': Exists(
+            late_answers.filter(date__gt=timezone.now() - timedelta(minutes=10))),
+        # Exclude questions which were closed on the spot (In Question Detail)
+        # without waiting in review queue.
+        'close_votes': _first_id(
+            ReviewCloseVotes.objects.filter(is_completed=False).exclude(
+                question_to_closed__is_closed=True).exclude(reviewed_by=user)),
+        'reopen_votes': _first_id(
+            ReviewQuestionReOpenVotes.objects.filter(is_completed=False).exclude(
+                reopen_reviewed_by=user)),
+        'suggested_edits': _first_id(
+            ReviewQuestionEdit.objects.filter(is_reviewed=False).exclude(
+                edit_reviewed_by=user)),
+        'low_quality': _first_id(
+            ReviewLowQualityPosts.objects.filter(is_reviewed=False).exclude(
+                reviewers=user)),
+        'flag_posts': _first_id(
+            ReviewFlagPost.objects.filter(flag_is_reviewed=False).exclude(
+                flag_reviewed_by=user)),
+        'flag_comments': _first_id(
+            ReviewFlagComment.objects.filter(c_is_reviewed=False).exclude(
+                c_flag_reviewed_by=user)),
+    }
+
+
+def compute_review_queues(user):
+    """
+    Return {queue: next item id or None} for every queue, plus the
+    'late_answer_recent' flag, in one query.
+    """
+    if not user.is_authenticated:
+        # Anonymous visitors only ever saw the late answer queue.
+        late_answers = _late_answers()
+        return {
+            'late_answer': late_answers.filter(
+                date__gt=timezone.now() - timedelta(minutes=100)).order_by(
+                    'id').values_list('id', flat=True).first(),
+            'late_answer_recent': late_answers.filter(
+                date__gt=timezone.now() - timedelta(minutes=10)).exists(),
+        }
+
+    row = User.objects.filter(pk=user.pk).annotate(
+        **_queue_subqueries(user)).values(*QUEUES, 'late_answer_recent').first()
+    return row or {}
+
+
+def _generation():
+    return cache.get_or_set(REVIEW_QUEUES_GENERATION_KEY, 1, None)
+
+
+def invalidate_review_queues():
+    """Drop every cached snapshot by moving to a new generation."""
+    try:
+        try:
+            cache.incr(REVIEW_QUEUES_GENERATION_KEY)
+        except ValueError:
+            cache.set(REVIEW_QUEUES_GENERATION_KEY, 1, None)
+    except Exception:
+        # Best effort, the review object change goes through; snapshots
+        # expire after REVIEW_QUEUES_CACHE_TTL anyway.
+        logger.warning('Invalidating the review queues failed', exc_info=True)
+
+
+def get_review_queues(user):
+    """Return the cached ReviewQueues snapshot of a user."""
+    user_key = user.pk if user.is_authenticated else 'anonymous'
+    try:
+        key = f'review_queues:{_generation()}:{user_key}'
+        next_ids = cache.get(key)
+    except Exception:
+        logger.warning('Review queue cache unavailable', exc_info=True)
+        return ReviewQueues(compute_review_queues(user))
+    if next_ids is None:
+        next_ids = compute_review_queues(user)
+        try:
+            cache.set(key, next_ids, settings.REVIEW_QUEUES_CACHE_TTL)
+        except Exception:
+            logger.warning('Review queue cache unavailable', exc_info=True)
+    return ReviewQueues(next_ids)
+
+
+class QueueItem:
+    """Stands in for the next review object, templates only need its id."""
+
+    def __init__(self, pk):
+        self.id = self.pk = pk
+
+    def __str__(self):
+        return str(self.id)
+
+
+class ReviewQueues:
+    """
+    Snapshot of every review queue. Templates can read a queue either by
+    queue name (review_queues.first_answer / review_queues.has_first_answer)
+    or by the variable names of the old context processors
+    (review_queues.next_blog / review_queues.can_show).
+    """
+
+    def __init__(self, next_ids):
+        self.next_ids = next_ids
+
+    def next_item(self, queue):
+        pk = self.next_ids.get(queue)
+        if pk is None:
+            return ''
+        return QueueItem(pk)
+
+    def has_items(self, queue):
+        if queue == 'late_answer':
+            return bool(self.next_ids.get('late_answer_recent'))
+        return self.next_ids.get(queue) is not None
+
+    def __getattr__(self, name):
+        if name.startswith('has_') and name[4:] in QUEUES:
+            return self.has_items(name[4:])
+        if name in QUEUES:
+            return self.next_item(name)
+        for queue, (next_name, has_name) in QUEUES.items():
+            if name == next_name:
+                return self.next_item(queue)
+            if name == has_name:
+                return self.has_items(queue)
+        raise AttributeError(name)
@@ -0,0 +1,45 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from qa.models import Question, Answer
+from .models import FirstAnswerReview, FirstQuestionReview, LateAnswerReview
+from .models import ReviewCloseVotes, ReviewQuestionReOpenVotes, ReviewQuestionEdit
+from .models import ReviewLowQualityPosts, ReviewFlagPost, ReviewFlagComment
+from .queues import invalidate_review_queues
+
+REVIEW_MODELS = [
+    FirstAnswerReview,
+    FirstQuestionReview,
+    LateAnswerReview,
+    ReviewCloseVotes,
+    ReviewQuestionReOpenVotes,
+    ReviewQuestionEdit,
+    ReviewLowQualityPosts,
+    ReviewFlagPost,
+    ReviewFlagComment,
+]
+
+
+def review_object_changed(sender, **kwargs):
+    invalidate_review_queues()
+
+
+for model in REVIEW_MODELS:
+    post_save.connect(review_object_changed, sender=model, dispatch_uid=f'review_queues_save_{model.__name__}')
+    post_delete.connect(review_object_changed, sender=model, dispatch_uid=f'review_queues_delete_{model.__name__}')
+
+# The reviewers of a queue item decide whether a user still sees it.
+for through in [
+    ReviewCloseVotes.reviewed_by.through,
+    ReviewQuestionReOpenVotes.reopen_reviewed_by.through,
+    ReviewQuestionEdit.edit_reviewed_by.through,
+    ReviewLowQualityPosts.reviewers.through,
+]:
+    m2m_changed.connect(review_object_changed, sender=through, dispatch_uid=f'review_queues_m2m_{through.__name__}')
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+def new_post_enters_review(sender, instance, created, **kwargs):
+    # New questions and answers land in the First Posts / Late Answers queues.
+    if created:
+        invalidate_review_queues()
@@ -16,6 +16,7 @@ from .models import CloseQuestionVotes, ReOpenQuestionVotes, ReviewQuestionReOpe
 from .models import ReviewCloseVotes, QuestionEditVotes, ReviewQuestionEdit, ReviewLowQualityPosts, FlagPost, ReviewFlagPost, FlagComment
 from .decorators import required_3000_RepToReview, required_2000_RepToReview, required_500_RepToReview
 from qa.models import Reputation, CommentQ
+from profile.reputation import reputation_of
 from qa.decorators import highModRequired
 from notification.models import PrivRepNotification
 from tagbadge.models import TagBadge
@@ -1730,14 +1731,7 @@ def rewardPrivielege(request, which_user):
     This view will reward privilege to user when called
     within a view with "user" argument to award
     """
-    getAlltheReputation = Reputation.objects.filter(
-        awarded_to=which_user).aggregate(
-        Sum('answer_rep_C'), Sum('question_rep_C'))
-    Q_rep = getAlltheReputation['question_rep_C__sum']
-    final_Q_Rep = getAlltheReputation['question_rep_C__sum'] if Q_rep else 0
-    A_rep = getAlltheReputation['answer_rep_C__sum']
-    final_A_Rep = getAlltheReputation['answer_rep_C__sum'] if A_rep else 0
-    totalReputation = final_Q_Rep + final_A_Rep
+    totalReputation = reputation_of(which_user)
 
     if totalReputation >= 10:
         # Create Wiki Posts - DONE
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import TagBadge
+from .models import TagBadge, BadgeEvent
 
-admin.site.register(TagBadge)
\ No newline at end of file
+admin.site.register(TagBadge)
+admin.site.register(BadgeEvent)
\ No newline at end of file
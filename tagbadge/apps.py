@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TagbadgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tagbadge'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,111 @@
+"""
+Badge engine.
+
+process_pending_events() takes a batch of unprocessed BadgeEvent rows,
+runs only the rules (tagbadge/rules.py) those events can affect and
+awards the new badges, TagBadge and PrivRepNotification rows, with one
+bulk INSERT each. It is run by the process_badge_events command:
+
+    python manage.py process_badge_events          # keep polling
+    python manage.py process_badge_events --once   # drain and exit
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from notification.counters import notifications_created
+from notification.emails import queue_emails
+from notification.models import PrivRepNotification
+from .models import BadgeEvent, TagBadge
+from .rules import USER, QUESTION, rules_for, EventBatch
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+
+def _award_key(rule, user_id, question_id, answer_id):
+    if rule.scope == USER:
+        return (rule.name, user_id)
+    if rule.scope == QUESTION:
+        return (rule.name, user_id, question_id)
+    return (rule.name, user_id, answer_id)
+
+
+def evaluate(batch):
+    """Return [(rule, award)] of the badges the batch earned which aren't awarded yet."""
+    found = []
+    for rule in rules_for({event.event_type for event in batch.events}):
+        found.extend((rule, award) for award in rule.find(batch.only(rule.events)) if award.user_id)
+    if not found:
+        return []
+
+    rules = {rule.name: rule for rule, award in found}
+    awarded = {
+        _award_key(rules[name], user_id, question_id, answer_id)
+        for user_id, name, question_id, answer_id in TagBadge.objects.filter(
+            tag_name__in=rules, awarded_to_user__in={award.user_id for rule, award in found}).values_list(
+                'awarded_to_user', 'tag_name', 'questionIf_TagOf_Q', 'answerIf_TagOf_A')}
+
+    new = {}
+    for rule, award in found:
+        key = _award_key(rule, *award)
+        if key not in awarded and key not in new:
+            new[key] = (rule, award)
+    return list(new.values())
+
+
+def award_badges(awards):
+    """Create the TagBadge and PrivRepNotification rows of [(rule, award)]."""
+    badges = []
+    notifications = []
+    for rule, award in awards:
+        url = reverse('qa:questionDetailView', kwargs={'pk': award.question_id}) if award.question_id else '#'
+        badges.append(TagBadge(
+            awarded_to_user_id=award.user_id,
+            badge_type=rule.badge_type,
+            tag_name=rule.name,
+            bade_position="BADGE",
+            questionIf_TagOf_Q_id=award.question_id,
+            answerIf_TagOf_A_id=award.answer_id))
+        notifications.append(PrivRepNotification(
+            for_user_id=award.user_id,
+            type_of_PrivNotify="BADGE_EARNED",
+            url=url,
+            for_if=rule.name,
+            description=rule.description,
+            question_priv_noti_id=award.question_id,
+            answer_priv_noti_id=award.answer_id))
+    TagBadge.objects.bulk_create(badges)
+    PrivRepNotification.objects.bulk_create(notifications)
+    notifications_created(notifications)
+    # bulk_create() sends no post_save, queue the emails here.
+    queue_emails([(notification.for_user_id, notification.get_type_of_PrivNotify_display(),
+                   notification.description, notification.url) for notification in notifications])
+    return len(badges)
+
+
+def process_pending_events(batch_size=500):
+    """
+    Process one batch of pending events. Returns (events processed, badges
+    awarded), (0, 0) once the queue is empty. A batch which fails is retried
+    until its events reach MAX_ATTEMPTS, the error is kept on the rows.
+    """
+    with transaction.atomic():
+        events = list(BadgeEvent.objects.select_for_update(skip_locked=True).filter(
+            processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS).order_by('id')[:batch_size])
+        if not events:
+            return 0, 0
+        pending = BadgeEvent.objects.filter(pk__in=[event.pk for event in events])
+        try:
+            with transaction.atomic():
+                awarded = award_badges(evaluate(EventBatch(events)))
+        except Exception as error:
+            logger.exception('Badge events %s..%s failed', events[0].pk, events[-1].pk)
+            pending.update(attempts=F('attempts') + 1, last_error=repr(error))
+            return len(events), 0
+        pending.update(processed_at=timezone.now(), attempts=F('attempts') + 1)
+    return len(events), awarded
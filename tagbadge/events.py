@@ -0,0 +1,32 @@
+"""
+Badge events.
+
+Views and signals only record what happened, awarding the badges is left
+to the process_badge_events worker (see tagbadge/engine.py). The event row
+is written in the caller's transaction, so it is only seen by the worker
+once the vote/answer/view it describes is committed.
+"""
+from .models import BadgeEvent
+
+VOTE_CAST = 'VOTE_CAST'
+ANSWER_POSTED = 'ANSWER_POSTED'
+ANSWER_ACCEPTED = 'ANSWER_ACCEPTED'
+VIEW_RECORDED = 'VIEW_RECORDED'
+EDIT_APPROVED = 'EDIT_APPROVED'
+
+
+def record_badge_event(event_type, user=None, question=None, answer=None):
+    """record_badge_event(VOTE_CAST, user=request.user, answer=answer)"""
+    return BadgeEvent.objects.create(
+        event_type=event_type,
+        user_id=getattr(user, 'pk', user),
+        question_id=getattr(question, 'pk', question),
+        answer_id=getattr(answer, 'pk', answer))
+
+
+def record_badge_events(event_type, user=None, questions=(), answers=()):
+    """Record one event per question/answer id with a single INSERT."""
+    user_id = getattr(user, 'pk', user)
+    BadgeEvent.objects.bulk_create(
+        [BadgeEvent(event_type=event_type, user_id=user_id, question_id=pk) for pk in questions] + [
+            BadgeEvent(event_type=event_type, user_id=user_id, answer_id=pk) for pk in answers])
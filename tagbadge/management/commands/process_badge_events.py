@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+from tagbadge.engine import process_pending_events
+
+
+class Command(BaseCommand):
+    help = 'Award badges for the recorded badge events, keeps polling the queue unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the queue is empty')
+
+    def handle(self, *args, **options):
+        processed = awarded = 0
+        while True:
+            events, badges = process_pending_events(options['batch_size'])
+            processed += events
+            awarded += badges
+            if events:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} badge events, awarded {awarded} badges'))
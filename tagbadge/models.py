@@ -37,3 +37,36 @@ class TagBadge(models.Model):
 
 	def __str__(self):
 		return f"{self.awarded_to_user} - {self.badge_type} - {self.tag_name} - {self.bade_position} - {self.tag_name}"
+
+
+BADGE_EVENT_CHOICES = [
+
+	('VOTE_CAST', 'Vote Cast'),
+	('ANSWER_POSTED', 'Answer Posted'),
+	('ANSWER_ACCEPTED', 'Answer Accepted'),
+	('VIEW_RECORDED', 'View Recorded'),
+	('EDIT_APPROVED', 'Edit Approved'),
+
+]
+
+
+class BadgeEvent(models.Model):
+	"""
+	Something happened which can earn a badge. Rows are written by the
+	signals in tagbadge/signals.py and consumed by the process_badge_events
+	worker, see tagbadge/engine.py.
+	"""
+	event_type = models.CharField(max_length=30, choices=BADGE_EVENT_CHOICES)
+	user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='badge_events')
+	question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True)
+	answer = models.ForeignKey(Answer, on_delete=models.CASCADE, null=True, blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	processed_at = models.DateTimeField(null=True, blank=True)
+	attempts = models.IntegerField(default=0)
+	last_error = models.TextField(blank=True, default='')
+
+	class Meta:
+		indexes = [models.Index(fields=['processed_at', 'id'], name='badge_event_pending_idx')]
+
+	def __str__(self):
+		return f"{self.event_type} - {self.user_id} - Q {self.question_id} - A {self.answer_id} - {self.processed_at}"
@@ -0,0 +1,189 @@
+"""
+Badge rules.
+
+Every rule names the badge it awards, the events which can make a user
+earn it and a finder. The finder gets an EventBatch holding only the events
+the rule listens to and returns the (user, question, answer) triples which
+qualify now, with as few queries as it can. Whether the badge was already
+awarded is checked by the engine, rules don't have to care.
+
+    @badge_rule('Student', 'BRONZE', 'First question with score of 1 or more', [VOTE_CAST])
+    def student(batch):
+        ...
+
+scope decides what "already awarded" means: USER badges are earned once per
+user, QUESTION/ANSWER badges once per post.
+"""
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.db.models import Count, F, Min, OuterRef, Subquery
+from django.utils import timezone
+
+from profile.models import Profile
+from qa.models import Question, Answer, QUpvote, QDownvote
+from qa.view_tracking import VIEW_BADGE_THRESHOLDS
+from .events import VOTE_CAST, ANSWER_POSTED, ANSWER_ACCEPTED, VIEW_RECORDED, EDIT_APPROVED
+
+USER = 'user'
+QUESTION = 'question'
+ANSWER = 'answer'
+
+Award = namedtuple('Award', ['user_id', 'question_id', 'answer_id'])
+BadgeRule = namedtuple('BadgeRule', ['name', 'badge_type', 'description', 'events', 'scope', 'find'])
+
+RULES = []
+
+
+def badge_rule(name, badge_type, description, events, scope=USER):
+    def decorator(find):
+        RULES.append(BadgeRule(name, badge_type, description, frozenset(events), scope, find))
+        return find
+    return decorator
+
+
+def rules_for(event_types):
+    """The rules which at least one of the event types can affect."""
+    event_types = set(event_types)
+    return [rule for rule in RULES if rule.events & event_types]
+
+
+class EventBatch:
+    """The ids a set of BadgeEvent rows refer to."""
+
+    def __init__(self, events):
+        self.events = list(events)
+        self.user_ids = {event.user_id for event in self.events if event.user_id}
+        self.answer_ids = {event.answer_id for event in self.events if event.answer_id}
+        self.question_ids = {event.question_id for event in self.events if event.question_id}
+
+    def __bool__(self):
+        return bool(self.events)
+
+    def only(self, event_types):
+        return EventBatch(event for event in self.events if event.event_type in event_types)
+
+    def all_question_ids(self):
+        """Questions of the batch, including the questions of its answers."""
+        return self.question_ids | set(
+            Answer.objects.filter(pk__in=self.answer_ids).values_list('questionans_id', flat=True))
+
+
+# POPULAR / NOTABLE / FAMOUS QUESTION
+
+def _question_views(views):
+    def find(batch):
+        return [Award(owner_id, pk, None) for pk, owner_id in Question.objects.filter(
+            pk__in=batch.question_ids, views_count__gte=views).values_list('pk', 'post_owner_id')]
+    return find
+
+
+for _name, _badge_type, _views in zip(
+        ('Popular Question', 'Notable Question', 'Famous Question'),
+        ('BRONZE', 'SILVER', 'GOLD'),
+        VIEW_BADGE_THRESHOLDS):
+    badge_rule(_name, _badge_type, f'Question with {_views} views', [VIEW_RECORDED])(_question_views(_views))
+
+
+# ENLIGHTENED
+
+@badge_rule('Enlightened', 'SILVER', 'First to answer and accepted with score of 1 or more',
+            [VOTE_CAST, ANSWER_ACCEPTED], scope=ANSWER)
+def enlightened(batch):
+    first_answer = Answer.objects.filter(questionans=OuterRef('questionans')).order_by().values(
+        'questionans').annotate(first=Min('pk')).values('first')
+    answers = Answer.objects.filter(pk__in=batch.answer_ids, accepted=True).annotate(
+        first=Subquery(first_answer), upvotes=Count('a_vote_ups')).filter(upvotes__gte=1)
+    return [Award(owner_id, question_id, pk) for pk, owner_id, question_id, first in answers.values_list(
+        'pk', 'answer_owner_id', 'questionans_id', 'first') if pk == first]
+
+
+# POPULIST
+
+@badge_rule('Populist', 'GOLD', 'Answer that outscored an accepted answer with score of 10 or more by 2x',
+            [VOTE_CAST, ANSWER_ACCEPTED], scope=ANSWER)
+def populist(batch):
+    accepted_upvotes = Answer.objects.filter(questionans=OuterRef('questionans'), accepted=True).annotate(
+        upvotes=Count('a_vote_ups')).values('upvotes')[:1]
+    answers = Answer.objects.filter(questionans__in=batch.all_question_ids(), accepted=False).annotate(
+        upvotes=Count('a_vote_ups'), accepted_upvotes=Subquery(accepted_upvotes)).filter(
+            accepted_upvotes__gte=10, upvotes__gt=F('accepted_upvotes') * 2)
+    return [Award(owner_id, question_id, pk) for pk, owner_id, question_id in answers.values_list(
+        'pk', 'answer_owner_id', 'questionans_id')]
+
+
+# LIFEJACKET / LIFEBOAT
+
+def _monitored_answers(answer_upvotes, question_upvotes):
+    def find(batch):
+        answers = Answer.objects.filter(
+            questionans__in=batch.all_question_ids(), monitor_it=True).annotate(
+                upvotes=Count('a_vote_ups', distinct=True),
+                question_upvotes=Count('questionans__qupvote', distinct=True)).filter(
+                    upvotes__gte=answer_upvotes, question_upvotes__gte=question_upvotes)
+        return [Award(owner_id, question_id, pk) for pk, question_id, owner_id in answers.values_list(
+            'pk', 'questionans_id', 'questionans__post_owner_id')]
+    return find
+
+
+badge_rule('Lifejacket', 'SILVER', 'Answer to a question in need which was upvoted',
+           [VOTE_CAST], scope=ANSWER)(_monitored_answers(1, 2))
+badge_rule('Lifeboat', 'GOLD', 'Answer to a question in need with 20 upvotes',
+           [VOTE_CAST], scope=ANSWER)(_monitored_answers(20, 3))
+
+
+# STUDENT
+
+@badge_rule('Student', 'BRONZE', 'First question with score of 1 or more', [VOTE_CAST])
+def student(batch):
+    return [Award(owner_id, pk, None) for pk, owner_id in Question.objects.filter(
+        pk__in=batch.question_ids, vote_score__gte=1).values_list('pk', 'post_owner_id')]
+
+
+# SUFFRAGE / VOX POPULI
+
+def votes_in_last_day(user_ids):
+    """{user_id: votes cast in the last 24 hours}"""
+    since = timezone.now() - timedelta(hours=24)
+    votes = Counter()
+    for user_field, queryset in (
+            ('upvote_by_q', QUpvote.objects.filter(date__gt=since)),
+            ('downvote_by_q', QDownvote.objects.filter(date__gt=since)),
+            # Answer votes carry no date, count the votes on answers of the last 24 hours.
+            ('user', Answer.a_vote_ups.through.objects.filter(answer__date__gt=since)),
+            ('user', Answer.a_vote_downs.through.objects.filter(answer__date__gt=since))):
+        votes.update(dict(queryset.filter(**{f'{user_field}__in': user_ids}).order_by().values(
+            user_field).annotate(votes=Count('pk')).values_list(user_field, 'votes')))
+    return votes
+
+
+def _daily_votes(minimum):
+    def find(batch):
+        return [Award(user_id, None, None) for user_id, votes in votes_in_last_day(batch.user_ids).items()
+                if votes >= minimum]
+    return find
+
+
+badge_rule('Suffrage', 'BRONZE', 'Use 30 votes in a day', [VOTE_CAST])(_daily_votes(30))
+badge_rule('Vox Populi', 'BRONZE', 'Use the maximum 40 votes in a day', [VOTE_CAST])(_daily_votes(40))
+
+
+# EXPLAINER / REFINER / ILLUMINATOR
+# Profile.Refiner_Illuminator_TagPostCounter counts the answers posted right after an edit.
+
+def _edited_and_answered(posts):
+    def find(batch):
+        return [Award(user_id, None, None) for user_id in Profile.objects.filter(
+            user__in=batch.user_ids, Refiner_Illuminator_TagPostCounter__gte=posts).values_list(
+                'user_id', flat=True)]
+    return find
+
+
+for _name, _badge_type, _posts in (
+        ('Explainer', 'BRONZE', 1),
+        ('Refiner', 'SILVER', 50),
+        ('Illuminator', 'GOLD', 500)):
+    badge_rule(
+        _name, _badge_type,
+        f"Edit and answer {_posts} question{'s' if _posts > 1 else ''} (both actions within 12 hours, answer score > 0)",
+        [ANSWER_POSTED, EDIT_APPROVED, VOTE_CAST])(_edited_and_answered(_posts))
@@ -0,0 +1,65 @@
+from django.db.models.signals import post_save, m2m_changed
+from django.dispatch import receiver
+from qa.models import Question, Answer, QUpvote, QDownvote
+from review.models import QuestionEditVotes
+from .events import record_badge_event, record_badge_events
+from .events import VOTE_CAST, ANSWER_POSTED, ANSWER_ACCEPTED, VIEW_RECORDED, EDIT_APPROVED
+
+# BADGE EVENTS - START
+# Only record what happened, the badges are awarded by the process_badge_events worker.
+
+
+@receiver(post_save, sender=QUpvote)
+def question_upvote_event(sender, instance, created, **kwargs):
+    if created:
+        record_badge_event(VOTE_CAST, user=instance.upvote_by_q_id, question=instance.upvote_question_of_id)
+
+
+@receiver(post_save, sender=QDownvote)
+def question_downvote_event(sender, instance, created, **kwargs):
+    if created:
+        record_badge_event(VOTE_CAST, user=instance.downvote_by_q_id, question=instance.downvote_question_of_id)
+
+
+@receiver(m2m_changed, sender=Answer.a_vote_ups.through)
+@receiver(m2m_changed, sender=Answer.a_vote_downs.through)
+def answer_vote_event(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # user.a_vote_up.add(answer)
+        record_badge_events(VOTE_CAST, user=instance, answers=pk_set)
+    else:
+        for user_id in pk_set:
+            record_badge_event(VOTE_CAST, user=user_id, answer=instance)
+
+
+@receiver(post_save, sender=Answer)
+def answer_event(sender, instance, created, **kwargs):
+    if created:
+        record_badge_event(ANSWER_POSTED, user=instance.answer_owner_id, answer=instance,
+                           question=instance.questionans_id)
+    elif instance.accepted and instance.tracker.has_changed('accepted'):
+        record_badge_event(ANSWER_ACCEPTED, user=instance.answer_owner_id, answer=instance,
+                           question=instance.questionans_id)
+
+
+@receiver(m2m_changed, sender=Question.viewers.through)
+def question_viewers_event(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        record_badge_events(VIEW_RECORDED, user=instance, questions=pk_set)
+    else:
+        record_badge_events(VIEW_RECORDED, questions=[instance.pk])
+
+
+@receiver(post_save, sender=QuestionEditVotes)
+def edit_approved_event(sender, instance, **kwargs):
+    approved = (instance.rev_Action or '').startswith('Approve') or (
+        instance.how_many_votes_on_approve > instance.how_many_votes_on_reject)
+    if instance.is_completed and approved and instance.tracker.has_changed('is_completed'):
+        record_badge_event(EDIT_APPROVED, user=instance.edit_suggested_by_id,
+                           question=instance.edited_question_id, answer=instance.edited_answer_id)
+
+# BADGE EVENTS - END